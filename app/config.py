@@ -51,6 +51,19 @@ class Config:
     ALLOWED_EXTENSIONS = set(os.environ.get('ALLOWED_EXTENSIONS', 'json,xlsx,xls,csv').split(','))
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', './sessions')
 
+    # Payloads générés (JSON compact, gzip optionnel)
+    PAYLOAD_GZIP = os.environ.get('PAYLOAD_GZIP', 'False').lower() == 'true'
+
+    # DHIS2 Push
+    PUSH_BATCH_SIZE = int(os.environ.get('PUSH_BATCH_SIZE', '1000'))
+    PREFLIGHT_WORKERS = int(os.environ.get('PREFLIGHT_WORKERS', '4'))
+
+    # DHIS2 Push Throttling (partagé entre workers, par instance DHIS2)
+    PUSH_THROTTLE_DB = os.environ.get('PUSH_THROTTLE_DB', './instance/push_throttle.sqlite3')
+    PUSH_MAX_CONCURRENT = int(os.environ.get('PUSH_MAX_CONCURRENT', '2'))
+    PUSH_VALUES_PER_SECOND = float(os.environ.get('PUSH_VALUES_PER_SECOND', '0'))  # 0 = illimité
+    PUSH_QUEUE_TIMEOUT = int(os.environ.get('PUSH_QUEUE_TIMEOUT', '600'))
+
     # Session Cleanup
     SESSION_CLEANUP_HOURS = int(os.environ.get('SESSION_CLEANUP_HOURS', '2'))
 
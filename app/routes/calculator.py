@@ -2,12 +2,13 @@
 Routes pour le calculateur automatique
 """
 
-from flask import Blueprint, render_template, session, flash, redirect, url_for, jsonify, request, send_file, current_app
+from flask import Blueprint, render_template, session, flash, redirect, url_for, jsonify, request, send_file, current_app, Response
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import logging
 import json
 import csv
+import io
 import base64
 import os
 from datetime import datetime
@@ -15,14 +16,28 @@ import pandas as pd
 
 from app.services.metadata_manager import MetadataManager
 from app.services.data_calculator import DataCalculator
+from app.services.data_values import save_payload, open_payload
+from app.services.payload_index import PayloadIndex, write_payload_index, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.services.file_handler import save_upload_file
+from app.services.sheet_cache import read_excel_cached, preload_workbook
 from app.services.auto_processor import AutoProcessor, AutoMappingConfig
+from app.services.push_throttle import PushQueueTimeout, PushTicketInUse
 from app.utils.activity_logger import log_activity
 
 bp = Blueprint('calculator', __name__, url_prefix='/calculator')
 logger = logging.getLogger(__name__)
 
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'tsv'}
+
+# Pagination des unités d'organisation filtrées
+ORG_UNITS_PAGE_SIZE = 1000
+ORG_UNITS_MAX_PAGE_SIZE = 5000
+
+# Lectures préparées en tâche de fond dès l'upload (cf. sheet_cache.preload_workbook)
+# - fichier de données: TCD/mapping (header ligne 0) et template normal (onglet 'Données', 5 lignes ignorées)
+# - template du mode automatique: header ligne 5
+EXCEL_PRELOAD_VARIANTS = [{'header': 0}, {'skiprows': 5, 'sheets': ['Données']}]
+TEMPLATE_PRELOAD_VARIANTS = [{'header': 5}]
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -45,6 +60,33 @@ def get_metadata_from_session():
         print(f"[ERROR] Type: {type(session.get('metadata'))}")
         raise
 
+def _read_duplicate_policy(data: dict, default: str = DataCalculator.DEFAULT_CONSOLIDATION_POLICY):
+    """
+    Politique de doublons demandée (duplicate_policy du body JSON)
+
+    Returns:
+        Tuple (politique, None) ou (None, réponse 400) si la politique est inconnue
+    """
+    duplicate_policy = data.get('duplicate_policy') or default
+    if duplicate_policy not in DataCalculator.CONSOLIDATION_POLICIES:
+        return None, (jsonify({'error': f'Politique de doublons inconnue: {duplicate_policy}'}), 400)
+    return duplicate_policy, None
+
+def get_dhis2_client_from_session(pool_size: int = 10):
+    """Helper pour créer un client DHIS2 avec les credentials de la session"""
+    from app.services.dhis2_client import DHIS2Client
+
+    # Décoder les credentials depuis base64
+    credentials = base64.b64decode(session['dhis2_auth']).decode('utf-8')
+    _, password = credentials.split(':', 1)
+
+    return DHIS2Client(
+        url=session['dhis2_url'],
+        username=session['dhis2_username'],
+        password=password,
+        pool_size=pool_size
+    )
+
 
 @bp.route('/')
 def calculator_page():
@@ -81,9 +123,9 @@ def upload_excel():
             return jsonify({'error': 'Nom de fichier vide'}), 400
         
         # Vérifier l'extension
-        if not any(file.filename.lower().endswith(ext) for ext in ['.xlsx', '.xls']):
+        if not any(file.filename.lower().endswith(ext) for ext in ['.xlsx', '.xls', '.csv', '.tsv']):
             logger.warning(f"Type de fichier Excel invalide: {file.filename}")
-            return jsonify({'error': 'Type de fichier invalide. Seuls les fichiers Excel (.xlsx, .xls) sont acceptés.'}), 400
+            return jsonify({'error': 'Type de fichier invalide. Seuls les fichiers Excel (.xlsx, .xls) et CSV (.csv, .tsv) sont acceptés.'}), 400
         
         # Créer le répertoire de session avec chemin absolu
         import os
@@ -97,7 +139,8 @@ def upload_excel():
         success, result, filename = save_upload_file(
             file,
             session_dir,
-            ALLOWED_EXTENSIONS
+            ALLOWED_EXTENSIONS,
+            max_size=current_app.config.get('MAX_CONTENT_LENGTH') or 50 * 1024 * 1024
         )
         
         if not success:
@@ -110,6 +153,9 @@ def upload_excel():
         session['excel_file'] = str(filepath)
         session['excel_filename'] = filename
         
+        # Convertir les onglets pendant que l'utilisateur configure le traitement
+        preload_workbook(str(filepath), EXCEL_PRELOAD_VARIANTS)
+        
         logger.info(f"Fichier Excel uploadé avec succès: {filename}")
         log_activity(f"Upload fichier Excel - Nom: {filename}", 'info')
         
@@ -168,7 +214,9 @@ def process_template():
             "sheet_name": "Premier Cycle",    # Onglet à traiter
             "mode": "normal",                 # "normal" ou "pivot" (TCD)
             "data_element_id": "xyz123",      # (Optionnel) Si mode pivot mono-DE
-            "period": "2024"                  # (Optionnel) Période pour mode pivot
+            "period": "2024",                 # (Optionnel) Période pour mode pivot
+            "duplicate_policy": "last",       # (Optionnel) Doublons: "sum", "last" ou "reject"
+            "dataset_id": "abc123"            # (Optionnel) Dataset de référence pour la validation
         }
 
     Returns:
@@ -187,6 +235,9 @@ def process_template():
         mode = data.get('mode', 'normal')
         data_element_id = data.get('data_element_id')  # Optionnel pour TCD multi-DE
         period = data.get('period', '2024')  # Période pour TCD
+        duplicate_policy, error = _read_duplicate_policy(data)
+        if error:
+            return error
 
         # Mode pivot/TCD : data_element_id est maintenant optionnel
         # Si non fourni, les DE seront auto-détectés depuis la première colonne
@@ -216,6 +267,9 @@ def process_template():
         logger.info(f"Extraction terminée: {len(data_values)} valeurs générées")
         logger.info(f"Stats: {stats}")
         
+        # Regrouper les dataValues de même clé
+        data_values, consolidation = calculator.consolidate_data_values(data_values, duplicate_policy)
+        
         # Générer le payload
         payload = calculator.generate_dhis2_payload(data_values)
         
@@ -229,14 +283,18 @@ def process_template():
                 'details': errors
             }), 400
         
+        # Contrôle complet contre les métadonnées (rapport, non bloquant)
+        validation = calculator.check_payload(payload, data.get('dataset_id'))
+        
         # Sauvegarder le payload dans la session avec chemin absolu
         project_root = Path(__file__).parent.parent.parent
         session_dir = project_root / 'sessions' / session.sid
         json_filename = f"DHIS2_Import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        json_filepath = session_dir / json_filename
-        
-        with open(json_filepath, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, indent=2, ensure_ascii=False)
+        json_filepath = save_payload(
+            payload, session_dir / json_filename,
+            compress=current_app.config.get('PAYLOAD_GZIP', False)
+        )
+        write_payload_index(payload, json_filepath)
         
         session['json_file'] = str(json_filepath)
         session['json_filename'] = json_filename
@@ -250,6 +308,8 @@ def process_template():
         return jsonify({
             'success': True,
             'stats': stats,
+            'consolidation': consolidation,
+            'validation': validation,
             'preview': preview,
             'total_values': len(data_values),
             'json_filename': json_filename
@@ -270,6 +330,11 @@ def process_template():
 def process_custom():
     """
     Traite un fichier Excel avec mapping personnalisé
+
+    Body JSON (extrait):
+        "processing_mode": "values",   # "values" ou "count"
+        "duplicate_policy": "last"     # (Optionnel) Doublons: "sum", "last" ou "reject"
+                                       # (défaut "sum" en mode "count")
     
     Returns:
         JSON avec statistiques et preview
@@ -301,6 +366,15 @@ def process_custom():
         if not dataset_id or not period:
             return jsonify({'error': 'Paramètres manquants (dataset ou période)'}), 400
             
+        # En comptage, les synonymes résolus vers le même COC doivent s'additionner
+        duplicate_policy, error = _read_duplicate_policy(
+            data,
+            DataCalculator.COUNT_CONSOLIDATION_POLICY if processing_mode == 'count'
+            else DataCalculator.DEFAULT_CONSOLIDATION_POLICY
+        )
+        if error:
+            return error
+            
         if org_mode == 'column' and not org_column:
             return jsonify({'error': 'Colonne organisation manquante'}), 400
             
@@ -329,9 +403,11 @@ def process_custom():
             org_unit_mapping=org_unit_mapping
         )
         
-        from app.services.data_calculator import DataCalculator
         calculator = DataCalculator(metadata)
         
+        # Regrouper les dataValues de même clé
+        data_values, consolidation = calculator.consolidate_data_values(data_values, duplicate_policy)
+        
         # Générer le payload
         payload = calculator.generate_dhis2_payload(data_values)
         
@@ -345,14 +421,18 @@ def process_custom():
                 'details': errors
             }), 400
         
+        # Contrôle complet contre les métadonnées (rapport, non bloquant)
+        validation = calculator.check_payload(payload, dataset_id)
+        
         # Sauvegarder le payload
         project_root = Path(__file__).parent.parent.parent
         session_dir = project_root / 'sessions' / session.sid
         json_filename = f"DHIS2_Import_Custom_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        json_filepath = session_dir / json_filename
-        
-        with open(json_filepath, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, indent=2, ensure_ascii=False)
+        json_filepath = save_payload(
+            payload, session_dir / json_filename,
+            compress=current_app.config.get('PAYLOAD_GZIP', False)
+        )
+        write_payload_index(payload, json_filepath)
         
         session['json_file'] = str(json_filepath)
         session['json_filename'] = json_filename
@@ -363,6 +443,8 @@ def process_custom():
         return jsonify({
             'success': True,
             'stats': stats,
+            'consolidation': consolidation,
+            'validation': validation,
             'preview': data_values[:10],
             'total_values': len(data_values),
             'json_filename': json_filename
@@ -388,8 +470,9 @@ def download_json():
         filepath = session['json_file']
         filename = session.get('json_filename', 'dhis2_import.json')
         
+        # Payload gzip: servi décompressé (flux), sous son nom .json
         return send_file(
-            filepath,
+            open_payload(filepath, 'rb'),
             as_attachment=True,
             download_name=filename,
             mimetype='application/json'
@@ -406,7 +489,8 @@ def download_csv_names():
     Télécharge un CSV au format dataValueSets avec les NOMS des métadonnées
     Colonnes: dataElementName, period, orgUnitName, categoryOptionComboName, value
 
-    Utilise le payload JSON déjà généré, et résout les IDs → noms via les métadonnées en session.
+    Le CSV est produit par blocs depuis l'index du payload et envoyé au fur et
+    à mesure; les noms sont résolus une fois par UID distinct.
     """
     if 'json_file' not in session:
         return jsonify({'error': 'Aucun fichier JSON disponible'}), 400
@@ -415,60 +499,43 @@ def download_csv_names():
         return jsonify({'error': 'Métadonnées non chargées'}), 400
 
     try:
-        # Charger payload
-        json_filepath = session['json_file']
-        with open(json_filepath, 'r', encoding='utf-8') as f:
-            content = json.load(f)
-
-        data_values = content.get('dataValues', [])
-        if not isinstance(data_values, list) or len(data_values) == 0:
+        index = PayloadIndex.for_payload(session['json_file'])
+        if index.total == 0:
             return jsonify({'error': 'Payload vide ou invalide'}), 400
 
-        # Métadonnées
         metadata = get_metadata_from_session()
 
-        # Dossier session
-        project_root = Path(__file__).parent.parent.parent
-        session_dir = project_root / 'sessions' / session.sid
-        session_dir.mkdir(parents=True, exist_ok=True)
+        # Tables de noms indexées par code (vocabulaires de l'index)
+        names = {
+            'dataElement': [metadata.data_elements_map.get(uid, {}).get('name', uid) for uid in index.labels['dataElement']],
+            'period': index.labels['period'],
+            'orgUnit': [metadata.org_units_map.get(uid, {}).get('name', uid) for uid in index.labels['orgUnit']],
+            'categoryOptionCombo': [metadata.get_coc_display_name(uid) if uid else '' for uid in index.labels['categoryOptionCombo']],
+        }
 
-        # Nom de fichier CSV
-        # Essayer de détecter la période dominante
-        periods = [dv.get('period') for dv in data_values if dv.get('period')]
-        period_hint = periods[0] if periods else datetime.now().strftime('%Y%m')
+        # Période dominante: première période renseignée (ordre d'apparition)
+        period_hint = next((p for p in index.labels['period'] if p), datetime.now().strftime('%Y%m'))
         csv_filename = f"dataValueSets_{period_hint}.csv"
-        csv_filepath = session_dir / csv_filename
-
-        # Écrire CSV avec noms
-        headers = ['dataElementName', 'period', 'orgUnitName', 'categoryOptionComboName', 'value']
-        with open(csv_filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader()
-
-            for dv in data_values:
-                de_id = dv.get('dataElement')
-                ou_id = dv.get('orgUnit')
-                coc_id = dv.get('categoryOptionCombo')
-                value = dv.get('value')
-                period = dv.get('period')
-
-                de_name = metadata.data_elements_map.get(de_id, {}).get('name', de_id)
-                ou_name = metadata.org_units_map.get(ou_id, {}).get('name', ou_id)
-                coc_name = metadata.get_coc_display_name(coc_id) if coc_id else ''
-
-                writer.writerow({
-                    'dataElementName': de_name,
-                    'period': period,
-                    'orgUnitName': ou_name,
-                    'categoryOptionComboName': coc_name,
-                    'value': value,
-                })
 
-        return send_file(
-            str(csv_filepath),
-            as_attachment=True,
-            download_name=csv_filename,
-            mimetype='text/csv'
+        def generate_rows():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['dataElementName', 'period', 'orgUnitName', 'categoryOptionComboName', 'value'])
+            try:
+                for codes, values in index.iter_chunks():
+                    columns = [[names[field][code] for code in codes[field]] for field in names]
+                    writer.writerows(zip(*columns, values))
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            except Exception as e:
+                logger.error(f"Erreur pendant l'envoi du CSV (noms): {e}", exc_info=True)
+                raise
+
+        return Response(
+            generate_rows(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{csv_filename}"'}
         )
 
     except Exception as e:
@@ -479,33 +546,42 @@ def download_csv_names():
 @bp.route('/api/preview-json', methods=['GET'])
 def preview_json():
     """
-    Retourne un aperçu du JSON généré
-    
+    Retourne une page du JSON généré, lue dans l'index annexe du payload
+
+    Query params:
+        offset: Position de départ (défaut 0)
+        limit: Nombre de dataValues (défaut 20, max 1000)
+        orgUnit: Filtre sur l'UID d'unité d'organisation (optionnel)
+        dataElement: Filtre sur l'UID d'élément de données (optionnel)
+
     Returns:
-        JSON avec le contenu
+        JSON avec la page de dataValues et les totaux
     """
     if 'json_file' not in session:
         return jsonify({'error': 'Aucun fichier JSON disponible'}), 400
-    
+
     try:
-        filepath = session['json_file']
-        
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = json.load(f)
-        
-        # Limiter à 20 dataValues pour le preview
-        if 'dataValues' in content and len(content['dataValues']) > 20:
-            preview_content = {
-                'dataValues': content['dataValues'][:20],
-                'total': len(content['dataValues']),
-                'preview': True
-            }
-        else:
-            preview_content = content
-            preview_content['preview'] = False
-        
-        return jsonify(preview_content), 200
-        
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 0), MAX_PAGE_SIZE)
+
+        index = PayloadIndex.for_payload(session['json_file'])
+        data_values, matched = index.page(
+            offset=offset,
+            limit=limit,
+            org_unit=request.args.get('orgUnit'),
+            data_element=request.args.get('dataElement')
+        )
+
+        return jsonify({
+            **index.extra,
+            'dataValues': data_values,
+            'total': index.total,
+            'matched': matched,
+            'offset': offset,
+            'limit': limit,
+            'preview': len(data_values) < index.total
+        }), 200
+
     except Exception as e:
         logger.error(f"Erreur preview JSON: {e}")
         return jsonify({'error': str(e)}), 500
@@ -563,17 +639,6 @@ def get_dataset_info():
         required_cats = {}
         data_elements = []
 
-        # Build DE to Groups map for efficiency
-        de_groups_map = {}
-        # data_element_groups est un Dict, pas une List
-        for group_id, group in metadata.data_element_groups.items():
-            group_name = group.get('name', '')
-            for de_ref in group.get('dataElements', []):
-                de_ref_id = de_ref.get('id') if isinstance(de_ref, dict) else de_ref
-                if de_ref_id not in de_groups_map:
-                    de_groups_map[de_ref_id] = []
-                de_groups_map[de_ref_id].append({'id': group_id, 'name': group_name})
-
         for elem in dataset.get('dataSetElements', []):
             de_id = elem['dataElement']['id']
             de = metadata.data_elements_map.get(de_id)
@@ -584,7 +649,11 @@ def get_dataset_info():
             data_elements.append({
                 'id': de_id,
                 'name': de.get('name', 'N/A'),
-                'groups': de_groups_map.get(de_id, [])
+                'groups': metadata.de_to_groups.get(de_id, []),
+                'sections': [
+                    {'id': sec['id'], 'name': sec['name']}
+                    for sec in metadata.de_to_sections.get(de_id, []) if sec['dataSet'] == dataset_id
+                ]
             })
 
             # Récupérer les catégories de ce data element
@@ -630,6 +699,19 @@ def send_to_dhis2():
     """
     Sends the generated JSON payload to DHIS2.
     Uses credentials stored in session.
+
+    The payload is sent in batches; each batch acknowledged by DHIS2 is
+    recorded in a checkpoint file in the session directory.
+
+    Pushes to the same DHIS2 instance are queued and rate-limited across
+    workers (see PushThrottle); the UI polls push-queue-status with the
+    ticket to display its position in the queue.
+
+    Body JSON (optional):
+        {
+            "resume": true,       # Only send the batches missing from the checkpoint
+            "ticket": "abc123"    # Queue ticket chosen by the client (unique, 409 if already queued)
+        }
     """
     if 'json_file' not in session:
         return jsonify({'error': 'Aucun fichier JSON généré'}), 400
@@ -638,34 +720,35 @@ def send_to_dhis2():
         return jsonify({'error': 'Non connecté à DHIS2 via API'}), 400
         
     try:
-        # Load JSON payload
+        data = request.get_json(silent=True) or {}
+        resume = bool(data.get('resume', False))
+
+        # Payload index: batches are built one at a time, never the whole payload
         filepath = session['json_file']
-        with open(filepath, 'r', encoding='utf-8') as f:
-            payload = json.load(f)
+        payload = PayloadIndex.for_payload(filepath)
             
-        # Get credentials
-        auth_b64 = session['dhis2_auth']
-        url = session['dhis2_url']
-        username = session['dhis2_username']
-        
-        # Décoder les credentials depuis base64
-        credentials = base64.b64decode(auth_b64).decode('utf-8')
-        _, password = credentials.split(':', 1)
-        
-        from app.services.dhis2_client import DHIS2Client
-        
-        # Initialize client
-        client = DHIS2Client(
-            url=url,
-            username=username,
-            password=password
-        )
+        from app.services.push_engine import PushEngine
+        from app.services.push_throttle import PushThrottle
+        
+        client = get_dhis2_client_from_session()
         
         # Push data
-        success, response, error = client.push_data_values(payload)
+        engine = PushEngine(
+            client,
+            batch_size=current_app.config.get('PUSH_BATCH_SIZE', 1000),
+            throttle=PushThrottle.from_config(current_app.config),
+            ticket=data.get('ticket')
+        )
+        success, response, error = engine.push(
+            payload,
+            session_dir=Path(filepath).parent,
+            payload_file=filepath,
+            resume=resume
+        )
         
         if success:
             logger.info(f"Data pushed to DHIS2 successfully: {response}")
+            log_activity(f"Envoi DHIS2 - {response['batches_done']} lots, Import: {response['importCount']}", 'info')
             return jsonify({
                 'success': True,
                 'message': 'Données envoyées avec succès à DHIS2',
@@ -676,14 +759,104 @@ def send_to_dhis2():
             return jsonify({
                 'success': False,
                 'error': 'Erreur lors de l\'envoi à DHIS2',
+                'resumable': response.get('resumable', False),
                 'details': response or error
             }), 500
             
+    except PushQueueTimeout as e:
+        logger.warning(f"DHIS2 push queue timeout: {e}")
+        return jsonify({'error': 'Trop d\'envois en cours vers ce serveur DHIS2, réessayez plus tard'}), 503
+    except PushTicketInUse as e:
+        logger.warning(f"DHIS2 push ticket reused: {e}")
+        return jsonify({'error': 'Ce ticket d\'envoi est déjà dans la file, relancez l\'envoi'}), 409
     except Exception as e:
         logger.error(f"Error sending to DHIS2: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/api/preflight-dhis2', methods=['POST'])
+def preflight_dhis2():
+    """
+    Sends the generated payload to DHIS2 with dryRun=true over several
+    concurrent connections and returns the conflicts grouped by type.
+    Nothing is imported.
+    """
+    if 'json_file' not in session:
+        return jsonify({'error': 'Aucun fichier JSON généré'}), 400
+
+    if 'dhis2_auth' not in session or 'dhis2_url' not in session:
+        return jsonify({'error': 'Non connecté à DHIS2 via API'}), 400
+
+    try:
+        filepath = session['json_file']
+        payload = PayloadIndex.for_payload(filepath)
+
+        from app.services.push_engine import PushEngine
+        from app.services.push_throttle import PushThrottle
+
+        data = request.get_json(silent=True) or {}
+        workers = current_app.config.get('PREFLIGHT_WORKERS', 4)
+        client = get_dhis2_client_from_session(pool_size=workers)
+        engine = PushEngine(
+            client,
+            batch_size=current_app.config.get('PUSH_BATCH_SIZE', 1000),
+            throttle=PushThrottle.from_config(current_app.config),
+            ticket=data.get('ticket')
+        )
+        report = engine.preflight(payload, workers=workers)
+
+        logger.info(f"Preflight DHIS2: {report['conflicts_total']} conflits, {len(report['failed_batches'])} lots en échec")
+        log_activity(f"Preflight DHIS2 - Conflits: {report['conflicts_total']}", 'info')
+
+        return jsonify({
+            'success': True,
+            'report': report
+        }), 200
+
+    except PushQueueTimeout as e:
+        logger.warning(f"DHIS2 preflight queue timeout: {e}")
+        return jsonify({'error': 'Trop d\'envois en cours vers ce serveur DHIS2, réessayez plus tard'}), 503
+    except PushTicketInUse as e:
+        logger.warning(f"DHIS2 preflight ticket reused: {e}")
+        return jsonify({'error': 'Ce ticket d\'envoi est déjà dans la file, relancez l\'envoi'}), 409
+    except Exception as e:
+        logger.error(f"Error during DHIS2 preflight: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/push-queue-status', methods=['GET'])
+def push_queue_status():
+    """
+    Position of a push ticket in the DHIS2 queue of the connected instance.
+
+    Query:
+        ticket: Ticket sent with send-to-dhis2 / preflight-dhis2
+
+    Returns:
+        JSON {position}: 0 = running, n = waiting behind n-1 pushes, null = unknown
+    """
+    if 'dhis2_url' not in session:
+        return jsonify({'error': 'Non connecté à DHIS2 via API'}), 400
+
+    ticket = request.args.get('ticket')
+    if not ticket:
+        return jsonify({'error': 'Ticket requis'}), 400
+
+    try:
+        from app.services.push_throttle import PushThrottle
+
+        throttle = PushThrottle.from_config(current_app.config)
+        # Même clé que le client DHIS2 (URL normalisée avec /api/)
+        url = session['dhis2_url'].rstrip('/') + '/api/'
+        position = throttle.queue_position(url, ticket)
+
+        return jsonify({'success': True, 'position': position}), 200
+
+    except Exception as e:
+        logger.error(f"Error reading push queue status: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/api/get-metadata-filters', methods=['GET'])
 def get_metadata_filters():
     """
@@ -826,43 +999,48 @@ def get_dhis2_data_elements():
 @bp.route('/api/get-filtered-org-units', methods=['POST'])
 def get_filtered_org_units():
     """
-    Returns Organisation Units filtered by Group and/or Level.
+    Returns Organisation Units filtered by Group, Level, parent (subtree)
+    and/or Dataset assignment, sorted by name, one page at a time.
+
+    Body JSON:
+        {
+            "group_id": "abc",       # (Optionnel) Groupe d'unités
+            "level": 4,              # (Optionnel) Niveau
+            "parent_id": "def",      # (Optionnel) Sous-arbre de cette unité
+            "dataset_id": "ghi",     # (Optionnel) Unités assignées au dataset
+            "offset": 0,             # (Optionnel) Début de la page
+            "limit": 1000            # (Optionnel) Taille de la page (max 5000)
+        }
     """
     if 'metadata' not in session:
         return jsonify({'error': 'Métadonnées non chargées'}), 400
         
     try:
-        data = request.get_json()
-        group_id = data.get('group_id')
+        data = request.get_json() or {}
         level = data.get('level')
+        offset = max(int(data.get('offset') or 0), 0)
+        limit = min(max(int(data.get('limit') or ORG_UNITS_PAGE_SIZE), 1), ORG_UNITS_MAX_PAGE_SIZE)
         
         metadata = get_metadata_from_session()
-        
-        # Start with all org units (convert map to list)
-        filtered_ous = list(metadata.org_units_map.values())
-        
-        # Filter by Group
-        if group_id:
-            group_ous = metadata.get_org_units_by_group(group_id)
-            group_ou_ids = set(ou['id'] for ou in group_ous)
-            filtered_ous = [ou for ou in filtered_ous if ou['id'] in group_ou_ids]
-            
-        # Filter by Level
-        if level:
-            level = int(level)
-            filtered_ous = [ou for ou in filtered_ous if ou.get('level') == level]
-            
-        # Sort by name
-        filtered_ous.sort(key=lambda x: x['name'])
-        
-        # Limit results if too many (e.g. > 1000) to avoid browser crash
-        if len(filtered_ous) > 1000:
-            filtered_ous = filtered_ous[:1000]
+        index = metadata.get_org_unit_index()
+        
+        # Filtres combinés par ET bit à bit (cf. OrgUnitIndex)
+        selected = index.select(
+            group_id=data.get('group_id'),
+            level=int(level) if level else None,
+            parent_id=data.get('parent_id'),
+            dataset_id=data.get('dataset_id')
+        )
+        org_units, total = index.page(selected, offset, limit)
             
         return jsonify({
             'success': True,
-            'org_units': [{'id': ou['id'], 'name': ou['name']} for ou in filtered_ous],
-            'count': len(filtered_ous)
+            'org_units': [{'id': ou['id'], 'name': ou['name']} for ou in org_units],
+            'count': len(org_units),
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'has_more': offset + len(org_units) < total
         }), 200
         
     except Exception as e:
@@ -908,8 +1086,11 @@ def upload_template():
         session['template_file'] = str(filepath)
         session['template_filename'] = filename
         
+        # Convertir les onglets en tâche de fond (la lecture ci-dessous attend celle du premier)
+        preload_workbook(str(filepath), TEMPLATE_PRELOAD_VARIANTS)
+        
         # Lire le fichier pour avoir des infos basiques et extraire les orgs
-        df_full = pd.read_excel(filepath, sheet_name=0, header=5)
+        df_full = read_excel_cached(str(filepath), sheet_name=0, header=5)
         
         # Extraire les organisations uniques depuis la colonne orgUnitName avec leurs codes
         organisations_uniques = []
@@ -1029,7 +1210,7 @@ def extract_tcd_values():
         filepath = session['excel_file']
         
         # Lire le TCD avec header à la ligne 0 (tout le fichier)
-        df = pd.read_excel(filepath, sheet_name=sheet_name, header=0)
+        df = read_excel_cached(filepath, sheet_name=sheet_name, header=0)
         
         # Extraire les valeurs uniques de la colonne
         if column_name not in df.columns:
@@ -1133,6 +1314,8 @@ def process_auto():
             "tcd_sheet": "cycle",
             "col_data_element": "CYCLE",
             "period": "2024",
+            "duplicate_policy": "last",   # (Optionnel) Doublons: "sum", "last" ou "reject"
+            "dataset_id": "abc123",       # (Optionnel) Dataset de référence pour la validation
             "config": {
                 "etablissements_patterns": {
                     "CPSP": "Centre Privé de Santé Publique",
@@ -1172,6 +1355,10 @@ def process_auto():
         if not all([tcd_sheet, col_data_element, period]):
             return jsonify({'error': 'Paramètres manquants'}), 400
         
+        duplicate_policy, error = _read_duplicate_policy(data)
+        if error:
+            return error
+        
         # Récupérer metadata
         metadata = get_metadata_from_session()
         
@@ -1217,8 +1404,9 @@ def process_auto():
                 'stats': stats.to_dict()
             }), 400
         
-        # Générer le payload DHIS2
+        # Regrouper les dataValues de même clé puis générer le payload DHIS2
         calculator = DataCalculator(metadata)
+        data_values, consolidation = calculator.consolidate_data_values(data_values, duplicate_policy)
         payload = calculator.generate_dhis2_payload(data_values)
         
         # Valider
@@ -1231,14 +1419,18 @@ def process_auto():
                 'details': errors
             }), 400
         
+        # Contrôle complet contre les métadonnées (rapport, non bloquant)
+        validation = calculator.check_payload(payload, data.get('dataset_id'))
+        
         # Sauvegarder
         project_root = Path(__file__).parent.parent.parent
         session_dir = project_root / 'sessions' / session.sid
         json_filename = f"DHIS2_Import_Auto_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        json_filepath = session_dir / json_filename
-        
-        with open(json_filepath, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, indent=2, ensure_ascii=False)
+        json_filepath = save_payload(
+            payload, session_dir / json_filename,
+            compress=current_app.config.get('PAYLOAD_GZIP', False)
+        )
+        write_payload_index(payload, json_filepath)
         
         session['json_file'] = str(json_filepath)
         session['json_filename'] = json_filename
@@ -1251,6 +1443,8 @@ def process_auto():
         return jsonify({
             'success': True,
             'stats': stats.to_dict(),
+            'consolidation': consolidation,
+            'validation': validation,
             'preview': preview,
             'total_values': len(data_values),
             'json_filename': json_filename
@@ -4,6 +4,8 @@ import pandas as pd
 import anthropic
 from typing import Dict, Any, Optional
 
+from app.services.sheet_cache import read_excel_cached
+
 class AIAnalysisService:
     def __init__(self):
         api_key = os.getenv('ANTHROPIC_API_KEY')
@@ -36,7 +38,7 @@ class AIAnalysisService:
         """
         try:
             # Read all rows for better analysis (pivoted data needs full context)
-            df = pd.read_excel(file_path)
+            df = read_excel_cached(file_path)
             
             # Prepare context for AI
             columns = list(df.columns)
@@ -211,7 +213,7 @@ IMPORTANT: Les noms de colonnes doivent correspondre EXACTEMENT aux colonnes du
     def _heuristic_analysis(self, file_path: str) -> Dict[str, Any]:
         """Fallback heuristic analysis when AI fails"""
         try:
-            df = pd.read_excel(file_path, nrows=15)
+            df = read_excel_cached(file_path, nrows=15)
             columns = list(df.columns)
             
             mapping = {
@@ -321,7 +323,7 @@ IMPORTANT: Les noms de colonnes doivent correspondre EXACTEMENT aux colonnes du
             Dict avec les data elements extraits et matchés avec DHIS2
         """
         try:
-            df = pd.read_excel(file_path)
+            df = read_excel_cached(file_path)
             columns = list(df.columns)
             
             print(f"\n[PIVOTED] Analyse du fichier: {len(df)} lignes, {len(columns)} colonnes")
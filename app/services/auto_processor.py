@@ -9,16 +9,21 @@ Architecture:
 - AutoProcessor: Processeur principal
 """
 
+import numpy as np
 import pandas as pd
 import re
 import logging
 import difflib
+import threading
 import unicodedata
+from collections import OrderedDict
 from typing import Dict, List, Tuple, Optional, Any
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from app.services.data_values import DataValues
 from app.services.metadata_manager import MetadataManager
+from app.services.sheet_cache import cached_derived, probe_workbook, read_excel_cached
 
 logger = logging.getLogger(__name__)
 
@@ -97,12 +102,28 @@ class ProcessingStats:
 # =============================================================================
 
 class Normalizer:
-    """Méthodes statiques de normalisation"""
+    """
+    Méthodes statiques de normalisation
+
+    Les méthodes *_serie normalisent une colonne entière: chaque valeur
+    distincte n'est normalisée qu'une fois, et le résultat est mémorisé par
+    (règle, colonne, mappings de la colonne) pour les traitements suivants,
+    dans un cache LRU borné partagé par les threads du worker.
+    """
     
     # Patterns regex compilés une seule fois (optimisation)
     PATTERN_AGE_RANGE = re.compile(r'\[?\s*(\d+)\s*[-–]\s*(\d+)\s*\[?')
     PATTERN_COC_FORMAT1 = re.compile(r'^([FM])\s*\|\s*(.+)$')
     PATTERN_COC_FORMAT2 = re.compile(r'^(.+)\s*\|\s*([FM])$')
+    PATTERN_MOINS_18 = re.compile(r'^-\s*18')
+    PATTERN_NEGATIF = re.compile(r'^-\s*\d+')
+    PATTERN_ESPACES = re.compile(r'\s+')
+    PATTERN_NON_ALPHANUM = re.compile(r'[^A-Z0-9]')
+    
+    # Valeurs déjà normalisées (LRU): {((règle, colonne, mappings), texte): valeur normalisée}
+    _cache: 'OrderedDict[Tuple, Optional[str]]' = OrderedDict()
+    _cache_lock = threading.Lock()
+    CACHE_MAX_VALEURS = 100_000  # toutes règles confondues
     
     @staticmethod
     def normaliser_tranche_age(s: Any) -> Optional[str]:
@@ -127,11 +148,13 @@ class Normalizer:
         s = str(s).strip()
         
         # Cas spéciaux
-        if '40 ans' in s.lower() or '40+' in s.lower():
+        lower = s.lower()
+        if '40 ans' in lower or '40+' in lower:
             return '40+'
-        if '18 ans' in s.lower() or re.match(r'^-\s*18', s):
+        if '18 ans' in lower or Normalizer.PATTERN_MOINS_18.match(s):
             return '-18'
-        if 'ND' in s.upper() or 'NON' in s.upper():
+        upper = s.upper()
+        if 'ND' in upper or 'NON' in upper:
             return 'ND'
         
         # Extraction des bornes numériques
@@ -159,7 +182,7 @@ class Normalizer:
         
         # 2. Heuristic for Age Ranges
         # If it matches age patterns, use age normalizer
-        if 'ANS' in s.upper() or Normalizer.PATTERN_AGE_RANGE.search(s) or '+' in s or re.match(r'^-\s*\d+', s):
+        if 'ANS' in s.upper() or '+' in s or Normalizer.PATTERN_AGE_RANGE.search(s) or Normalizer.PATTERN_NEGATIF.match(s):
              # Only apply if it doesn't look like a standard string
              age_norm = Normalizer.normaliser_tranche_age(s)
              if age_norm: return age_norm
@@ -179,7 +202,7 @@ class Normalizer:
         text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode("utf-8")
         
         # Majuscules et nettoyage
-        text = re.sub(r'[^A-Z0-9]', '', text.upper())
+        text = Normalizer.PATTERN_NON_ALPHANUM.sub('', text.upper())
         
         return text
 
@@ -194,7 +217,7 @@ class Normalizer:
             return None
             
         s = str(coc).strip().replace('\t', ' ')
-        s = re.sub(r'\s+', ' ', s)
+        s = Normalizer.PATTERN_ESPACES.sub(' ', s)
         
         # Split by pipe
         parts = [p.strip() for p in s.split('|')]
@@ -232,6 +255,76 @@ class Normalizer:
         if pd.isna(s):
             return None
         return str(s).strip()
+    
+    @classmethod
+    def normaliser_serie(cls, valeurs: pd.Series, column_name: str = None,
+                         mappings: Dict[str, Dict[str, str]] = None) -> pd.Series:
+        """
+        normalize_value appliqué à une colonne (None pour les cellules vides).
+        
+        Args:
+            valeurs: Colonne à normaliser
+            column_name: Nom de la colonne (clé de mappings)
+            mappings: Value mappings {colonne: {valeur: remplacement}}
+            
+        Returns:
+            Series (object) des valeurs normalisées
+        """
+        regles = (mappings or {}).get(column_name) if column_name else None
+        cle = ('valeur', column_name, tuple(sorted(regles.items()))) if regles else ('valeur',)
+        return cls.par_valeur_distincte(
+            valeurs, lambda texte: cls.normalize_value(texte, column_name, mappings), cle
+        )
+    
+    @classmethod
+    def par_valeur_distincte(cls, valeurs: pd.Series, normaliser, cle: Tuple = None) -> pd.Series:
+        """
+        Applique normaliser au texte de chaque valeur distincte d'une colonne.
+        
+        normaliser doit donner le même résultat pour une valeur et son texte
+        (str); les cellules vides donnent None.
+        
+        Args:
+            valeurs: Colonne à normaliser
+            normaliser: Normalisation d'une valeur
+            cle: Clé du cache (défaut: nom de la fonction)
+            
+        Returns:
+            Series (object) des valeurs normalisées
+        """
+        vides = valeurs.isna().to_numpy()
+        if pd.api.types.infer_dtype(valeurs, skipna=True) in ('string', 'empty'):
+            codes, distinctes = pd.factorize(valeurs)
+        else:
+            # 1 et 1.0 n'ont pas le même texte: factoriser les textes
+            codes, distinctes = pd.factorize(valeurs.map(str))
+        
+        cle = cle or (normaliser.__qualname__,)
+        cache = cls._cache
+        resultats = [None] * len(distinctes)
+        manquantes = []
+        with cls._cache_lock:
+            for i, texte in enumerate(distinctes):
+                entree = (cle, texte)
+                if entree in cache:
+                    cache.move_to_end(entree)
+                    resultats[i] = cache[entree]
+                else:
+                    manquantes.append(i)
+        
+        # Normalisation hors verrou (fonctions pures)
+        for i in manquantes:
+            resultats[i] = normaliser(distinctes[i])
+        if manquantes:
+            with cls._cache_lock:
+                for i in manquantes:
+                    cache[(cle, distinctes[i])] = resultats[i]
+                while len(cache) > cls.CACHE_MAX_VALEURS:
+                    cache.popitem(last=False)
+        
+        normalisees = np.array(resultats + [None], dtype=object)[codes]
+        normalisees[vides] = None
+        return pd.Series(normalisees, index=valeurs.index, dtype=object)
 
 
 # =============================================================================
@@ -272,6 +365,9 @@ class AutoProcessor:
         self.mapping_data_elements = {}
         self.index_recherche = {}
         
+        # Template indexé partagé entre les traitements (cf. load_template)
+        self.template_indexe = None
+        
         logger.info("AutoProcessor initialisé")
     
     def detect_template_columns(self):
@@ -331,23 +427,58 @@ class AutoProcessor:
         """
         Charge le template DHIS2.
         
+        Le template normalisé, son index de recherche et les cibles des
+        suggestions ne sont construits qu'une fois par contenu de template:
+        ils sont enregistrés à côté du fichier (dossier de session) et gardés
+        en mémoire par worker. Le DataFrame obtenu est partagé: il ne doit
+        pas être modifié.
+        
         Args:
             template_path: Chemin vers le fichier template Excel
             sheet_name: Nom de l'onglet (défaut: 'Données')
         """
         logger.info(f"Chargement template: {template_path}, sheet: {sheet_name}")
         
-        self.df_template = pd.read_excel(
-            template_path, 
-            sheet_name=sheet_name, 
-            header=int(self.config.template_header_row)
+        header = int(self.config.template_header_row)
+        self.template_indexe = cached_derived(
+            template_path,
+            ('template_index', sheet_name, header),
+            lambda: self._indexer_template(template_path, sheet_name, header)
         )
         
-        self.detect_template_columns()
+        self.df_template = self.template_indexe['df']
+        for attr, col in self.template_indexe['colonnes'].items():
+            setattr(self.config, attr, col)
+        self.index_recherche = self.template_indexe['index_recherche']
         
         logger.info(f"Template chargé: {len(self.df_template)} lignes, {len(self.df_template.columns)} colonnes")
         logger.info(f"Colonnes: {self.df_template.columns.tolist()}")
     
+    def _indexer_template(self, template_path: str, sheet_name: str, header: int) -> Dict[str, Any]:
+        """
+        Lit et indexe le template (appelé une fois par contenu de template).
+        
+        Returns:
+            Dict avec le template normalisé ('df'), les colonnes détectées,
+            l'index de recherche et les cibles des suggestions de mapping
+        """
+        self.df_template = read_excel_cached(template_path, sheet_name=sheet_name, header=header)
+        self.detect_template_columns()
+        self.template_indexe = None
+        self.build_index_recherche()
+        
+        colonnes = {
+            attr: getattr(self.config, attr)
+            for attr in ('col_section_template', 'col_data_element_template', 'col_org_unit_template',
+                         'col_coc_template', 'col_value_template')
+        }
+        return {
+            'df': self.df_template,
+            'colonnes': colonnes,
+            'index_recherche': self.index_recherche,
+            'cibles': self._cibles_suggestions(),
+        }
+    
     def load_tcd(self, tcd_path: str, sheet_name: str):
         """
         Charge un onglet TCD.
@@ -358,7 +489,7 @@ class AutoProcessor:
         """
         logger.info(f"Chargement TCD: {tcd_path}, sheet: {sheet_name}")
         
-        self.df_tcd = pd.read_excel(
+        self.df_tcd = read_excel_cached(
             tcd_path, 
             sheet_name=sheet_name, 
             header=int(self.config.tcd_header_row)
@@ -411,15 +542,22 @@ class AutoProcessor:
         - Recherche O(1) au lieu de O(n)
         - Indépendant des variations de format
         - Facilite le débogage (clés lisibles)
+        
+        Sans effet pour un template chargé par load_template (index déjà construit).
         """
+        if self.template_indexe is not None and self.template_indexe['df'] is self.df_template:
+            self.index_recherche = self.template_indexe['index_recherche']
+            logger.info(f"Index de recherche du template réutilisé: {len(self.index_recherche)} clés")
+            return
+        
         logger.info("Construction de l'index de recherche...")
         
-        # Ajouter colonnes normalisées au template
-        self.df_template['_coc_norm'] = self.df_template[self.config.col_coc_template].apply(
-            Normalizer.normaliser_coc
+        # Ajouter colonnes normalisées au template (une normalisation par valeur distincte)
+        self.df_template['_coc_norm'] = Normalizer.par_valeur_distincte(
+            self.df_template[self.config.col_coc_template], Normalizer.normaliser_coc
         )
-        self.df_template['_org_norm'] = self.df_template[self.config.col_org_unit_template].apply(
-            lambda x: str(x).strip() if pd.notna(x) else None
+        self.df_template['_org_norm'] = Normalizer.par_valeur_distincte(
+            self.df_template[self.config.col_org_unit_template], Normalizer.normaliser_string
         )
         
         # Construire la clé de recherche
@@ -430,11 +568,8 @@ class AutoProcessor:
             self.df_template['_coc_norm'].fillna('')
         )
         
-        # Créer l'index dict {clé: index_ligne}
-        self.index_recherche = {
-            row['_cle']: idx 
-            for idx, row in self.df_template.iterrows()
-        }
+        # Créer l'index dict {clé: index_ligne} (dernière ligne retenue pour une clé en double)
+        self.index_recherche = dict(zip(self.df_template['_cle'], self.df_template.index))
         
         logger.info(f"Index de recherche construit: {len(self.index_recherche)} clés")
         
@@ -443,7 +578,7 @@ class AutoProcessor:
         for cle in exemples:
             logger.debug(f"Exemple de clé: {cle}")
     
-    def process_tcd_sheet(self, col_data_element: str, period: str) -> Tuple[List[Dict], ProcessingStats]:
+    def process_tcd_sheet(self, col_data_element: str, period: str) -> Tuple[DataValues, ProcessingStats]:
         """
         Traite un onglet TCD et insère les valeurs dans le template.
         
@@ -492,90 +627,81 @@ class AutoProcessor:
         
         col_valeur = df.columns[-1]
         logger.info(f"Colonne valeurs: '{col_valeur}'")
-        
-        data_values = []
-        
-        for idx, row in df.iterrows():
-            self.stats.lignes_traitees += 1
-            
-            etab = str(row[self.config.col_etablissement]).strip()
-            data_elem = str(row[col_data_element]).strip()
-            valeur = row[col_valeur]
-            
-            if pd.isna(valeur) or valeur == 0 or valeur == '':
-                continue
-            
-            etab_template = self.mapping_etablissements.get(etab)
-            if etab_template is None:
-                if etab not in self.stats.etablissements_non_mappes:
-                    self.stats.etablissements_non_mappes[etab] = 0
-                self.stats.etablissements_non_mappes[etab] += int(float(valeur))
-                continue
-            
-            mapping = self.config.data_elements_manuels.get(data_elem)
-            if mapping is None:
-                if data_elem not in self.stats.data_elements_non_mappes:
-                    self.stats.data_elements_non_mappes[data_elem] = 0
-                self.stats.data_elements_non_mappes[data_elem] += int(float(valeur))
-                continue
-            
-            section, de_template = mapping
-            
-            # --- GENERIC COC CONSTRUCTION ---
-            normalized_parts = []
-            valid_row = True
-            
-            for col in self.config.category_cols:
-                raw_val = row.get(col)
-                norm_val = Normalizer.normalize_value(
-                    raw_val, 
-                    col, 
-                    self.config.value_mappings
-                )
-                
-                if norm_val is None:
-                    # Special case: If value is missing and we expect it, it might be an aggregate row or error
-                    # But if we rely on ffill, it should be there.
-                    # Exception: Some columns might be optional? No, usually all required for a COC.
-                    valid_row = False
-                    break
-                
-                normalized_parts.append(norm_val)
-                
-            if not valid_row:
-                 continue
 
-            # Sort parts to match Normalizer.normaliser_coc logic
-            normalized_parts.sort()
-            coc_norm = '|'.join(normalized_parts)
-            
-            # --------------------------------
-            
-            cle = f"{section}|{de_template}|{etab_template}|{coc_norm}"
-            
-            if cle in self.index_recherche:
-                idx_template = self.index_recherche[cle]
-                
-                org_unit_uid = self.df_template.at[idx_template, 'orgUnit']
-                data_element_uid = self.df_template.at[idx_template, 'dataElement']
-                coc_uid = self.df_template.at[idx_template, 'categoryOptionCombo']
-                
-                data_value = {
-                    'dataElement': data_element_uid,
-                    'period': period,
-                    'orgUnit': org_unit_uid,
-                    'categoryOptionCombo': coc_uid,
-                    'value': str(int(float(valeur))),
-                    'attributeOptionCombo': 'HllvX50cXC0'
-                }
-                
-                data_values.append(data_value)
-                self.stats.valeurs_inserees += 1
-                
-                if self.stats.valeurs_inserees % 100 == 0:
-                    logger.info(f"Valeurs insérées: {self.stats.valeurs_inserees}")
-            else:
-                self.stats.combinaisons_non_trouvees.append({
+        self.stats.lignes_traitees = len(df)
+
+        # Ignorer les valeurs vides (et les zéros)
+        valeurs = df[col_valeur].to_numpy(dtype=object)
+        vides = pd.isna(valeurs) | (valeurs == 0) | (valeurs == '')
+
+        etabs = df[self.config.col_etablissement].map(str).str.strip()
+        data_elems = df[col_data_element].map(str).str.strip()
+
+        # Établissements non mappés: valeurs cumulées par établissement
+        etabs_template = etabs.map(self.mapping_etablissements)
+        etab_absent = ~vides & etabs_template.isna().to_numpy()
+        self.stats.etablissements_non_mappes = self._sommes_par_libelle(etabs, valeurs, etab_absent)
+
+        # Data elements non mappés: valeurs cumulées par data element
+        mappings_de = data_elems.map(self.config.data_elements_manuels)
+        de_absent = ~vides & ~etab_absent & mappings_de.isna().to_numpy()
+        self.stats.data_elements_non_mappes = self._sommes_par_libelle(data_elems, valeurs, de_absent)
+
+        # COC normalisé de chaque ligne (catégories triées, comme Normalizer.normaliser_coc)
+        a_traiter = ~(vides | etab_absent | de_absent)
+        parties = []
+        for col in self.config.category_cols:
+            if col not in df.columns:
+                a_traiter[:] = False
+                break
+            normalisees = Normalizer.normaliser_serie(df[col], col, self.config.value_mappings)
+            a_traiter &= normalisees.notna().to_numpy()
+            parties.append(normalisees.tolist())
+
+        positions = np.flatnonzero(a_traiter)
+        data_values = DataValues()
+        if len(positions) > 0:
+            cocs_norm = ['|'.join(sorted(valeurs_cat)) for valeurs_cat in zip(*[
+                [colonne[pos] for pos in positions.tolist()] for colonne in parties
+            ])] if parties else [''] * len(positions)
+
+            sections, des_template = zip(*mappings_de.iloc[positions].tolist())
+            lignes = pd.DataFrame({
+                'section': sections,
+                'data_element': des_template,
+                'organisation': etabs_template.iloc[positions].tolist(),
+                'coc_norm': cocs_norm,
+                'etablissement': etabs.iloc[positions].tolist(),
+                'data_element_tcd': data_elems.iloc[positions].tolist(),
+                'valeur': [int(float(v)) for v in valeurs[positions].tolist()]
+            })
+            lignes['cle'] = (
+                lignes['section'].map(str) + '|' + lignes['data_element'].map(str) + '|' +
+                lignes['organisation'].map(str) + '|' + lignes['coc_norm']
+            )
+
+            # Jointure sur la clé du template (index_recherche: clé -> ligne du template)
+            index_template = pd.DataFrame({
+                'cle': list(self.index_recherche.keys()),
+                '_position': self.df_template.index.get_indexer(list(self.index_recherche.values()))
+            })
+            lignes = lignes.merge(index_template, on='cle', how='left', sort=False)
+            trouvees = lignes['_position'].notna().to_numpy()
+
+            positions_template = lignes.loc[trouvees, '_position'].astype(int).to_numpy()
+            data_values.extend(
+                [str(valeur) for valeur in lignes.loc[trouvees, 'valeur'].tolist()],
+                dataElement=self.df_template['dataElement'].iloc[positions_template].tolist(),
+                period=period,
+                orgUnit=self.df_template['orgUnit'].iloc[positions_template].tolist(),
+                categoryOptionCombo=self.df_template['categoryOptionCombo'].iloc[positions_template].tolist(),
+                attributeOptionCombo='HllvX50cXC0'
+            )
+            self.stats.valeurs_inserees = len(data_values)
+
+            non_trouvees = lignes.loc[~trouvees]
+            self.stats.combinaisons_non_trouvees = [
+                {
                     'cle': cle,
                     'details': {
                         'section': section,
@@ -583,12 +709,19 @@ class AutoProcessor:
                         'organisation': etab_template,
                         'coc_norm': coc_norm
                     },
-                    'valeur': int(float(valeur)),
+                    'valeur': valeur,
                     'etablissement': etab,
                     'data_element': data_elem,
                     'coc': coc_norm
-                })
-        
+                }
+                for cle, section, de_template, etab_template, coc_norm, valeur, etab, data_elem in zip(*(
+                    non_trouvees[col].tolist() for col in (
+                        'cle', 'section', 'data_element', 'organisation', 'coc_norm',
+                        'valeur', 'etablissement', 'data_element_tcd'
+                    )
+                ))
+            ]
+
         logger.info("=" * 80)
         logger.info("FIN DU TRAITEMENT TCD")
         logger.info(f"Lignes traitées: {self.stats.lignes_traitees}")
@@ -600,6 +733,14 @@ class AutoProcessor:
         
         return data_values, self.stats
 
+    @staticmethod
+    def _sommes_par_libelle(libelles: pd.Series, valeurs, masque) -> Dict[str, int]:
+        """Somme des valeurs (entières) des lignes du masque par libellé, dans l'ordre d'apparition"""
+        if not masque.any():
+            return {}
+        montants = pd.Series([int(float(v)) for v in valeurs[masque].tolist()], dtype=object)
+        return montants.groupby(libelles[masque].to_numpy(), sort=False).sum().to_dict()
+
     def analyze_tcd_file(self, tcd_path: str) -> Dict:
         """
         Analyse un fichier TCD et retourne la structure.
@@ -611,13 +752,15 @@ class AutoProcessor:
             Dict avec informations sur les onglets, colonnes, etc.
         """
         try:
-            xl_file = pd.ExcelFile(tcd_path)
+            # Une seule ouverture du classeur pour tous les onglets
+            probes = probe_workbook(tcd_path, header=int(self.config.tcd_header_row), nrows=100)
             sheets_info = []
             etablissements_uniques = []
             etablissements_avec_codes = {}  # {nom: code}
             
-            for idx, sheet_name in enumerate(xl_file.sheet_names):
-                df = pd.read_excel(tcd_path, sheet_name=sheet_name, header=int(self.config.tcd_header_row), nrows=100)
+            for idx, probe in enumerate(probes):
+                sheet_name = probe['name']
+                df = probe['df']
                 
                 # Pour le premier onglet, extraire les établissements uniques avec leurs codes
                 if idx == 0:
@@ -640,6 +783,7 @@ class AutoProcessor:
                     'name': sheet_name,
                     'columns': [str(col) for col in df.columns],
                     'rows': len(df),
+                    'total_rows': probe['total_rows'],
                     'sample_values': {
                         str(col): [str(v) for v in df[col].dropna().unique()[:5]]
                         for col in df.columns[:5]  # Première 5 colonnes seulement
@@ -661,6 +805,26 @@ class AutoProcessor:
                 'error': str(e)
             }
 
+    def _cibles_suggestions(self) -> List[Dict[str, str]]:
+        """
+        Couples (section, data element) distincts du template, dans l'ordre
+        d'apparition, avec le nom normalisé utilisé par les suggestions.
+        """
+        if not self.config.col_section_template or not self.config.col_data_element_template:
+            return []
+        
+        couples = pd.DataFrame({
+            'section': self.df_template[self.config.col_section_template].map(str).str.strip(),
+            'name': self.df_template[self.config.col_data_element_template].map(str).str.strip(),
+        }).drop_duplicates()
+        couples = couples[(couples['section'] != '') & (couples['name'] != '')]
+        
+        return [
+            # Nom normalisé pour la recherche, nom brut pour l'affichage
+            {'section': section, 'name': de_name, 'norm': Normalizer.normalize_text(de_name)}
+            for section, de_name in zip(couples['section'].tolist(), couples['name'].tolist())
+        ]
+    
     def generate_mapping_suggestions(self, sheet_name: str, col_de: str) -> Dict[str, Any]:
         """
         Génère des suggestions de mapping entre les valeurs du TCD et le Template.
@@ -674,37 +838,21 @@ class AutoProcessor:
              return {'error': 'Chemin TCD non configuré'}
              
         try:
-            df = pd.read_excel(self.config.tcd_path, sheet_name=sheet_name, header=int(self.config.tcd_header_row))
+            df = read_excel_cached(self.config.tcd_path, sheet_name=sheet_name, header=int(self.config.tcd_header_row))
             tcd_values = [str(v).strip() for v in df[col_de].dropna().unique() if str(v).strip()]
         except Exception as e:
             return {'error': f"Erreur lecture TCD: {str(e)}"}
 
         # 2. Préparer les cibles (Template)
         # On veut une liste de (Section, DE Name)
-        targets = []
-        target_map = {} # (section, de_name) -> original_row
-        
-        seen = set()
-        
         if not self.config.col_section_template or not self.config.col_data_element_template:
              cols = self.df_template.columns.tolist()
              return {'error': f"Colonnes template introuvables. Colonnes dispos: {cols}"}
 
-        for idx, row in self.df_template.iterrows():
-            section = str(row[self.config.col_section_template]).strip()
-            de_name = str(row[self.config.col_data_element_template]).strip()
-            
-            key = (section, de_name)
-            if key not in seen and section and de_name:
-                seen.add(key)
-                # Normaliser pour la recherche
-                norm_name = Normalizer.normalize_text(de_name)
-                # On ajoute aussi le nom brut pour l'affichage
-                targets.append({
-                    'section': section,
-                    'name': de_name,
-                    'norm': norm_name
-                })
+        if self.template_indexe is not None and self.template_indexe['df'] is self.df_template:
+            targets = self.template_indexe['cibles']
+        else:
+            targets = self._cibles_suggestions()
 
         # 3. Fuzzy Matching
         suggestions = {}
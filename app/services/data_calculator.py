@@ -5,21 +5,80 @@ Traite les fichiers Excel remplis et génère le JSON DHIS2
 """
 
 import logging
+import re
+from decimal import Decimal
+from itertools import chain
 from typing import Dict, List, Tuple, Optional
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from app.services.data_values import DataValues
 from app.services.metadata_manager import MetadataManager
+from app.services.payload_validator import INTEGER_VALUE_TYPES, PayloadValidator
+from app.services.sheet_cache import get_sheet_names, read_excel_cached
+from app.services.sheet_reader import is_csv, iter_csv_chunks, iter_rows
 
 logger = logging.getLogger(__name__)
 
+# Décimal à partie fractionnaire nulle ('5.0', produit par la conversion float des cellules)
+INTEGRAL_DECIMAL_PATTERN = re.compile(r'\s*([-+]?\d+)\.0*\s*')
+
+
+def parse_values(values: pd.Series) -> pd.Series:
+    """
+    Version vectorisée de DataCalculator._parse_value sur une colonne
+
+    Args:
+        values: Valeurs à parser
+
+    Returns:
+        Série float, NaN pour les valeurs invalides (non numériques, NaN ou négatives)
+    """
+    try:
+        # Même analyse que float() (pd.to_numeric arrondit certaines décimales différemment)
+        numbers = values.astype('float64')
+    except (ValueError, TypeError):
+        # Cellules non numériques: float() une fois par valeur distincte
+        codes, uniques = pd.factorize(values)
+        converted = np.array([_to_float(value) for value in uniques] + [float('nan')], dtype='float64')
+        numbers = converted[codes]
+        # 0 et -0.0 sont confondus par factorize: signe du zéro relu cellule par cellule
+        zeros = np.flatnonzero(numbers == 0)
+        if len(zeros):
+            cells = values.to_numpy()
+            numbers[zeros] = [_to_float(cells[i]) for i in zeros.tolist()]
+        numbers = pd.Series(numbers, index=values.index, dtype='float64')
+
+    negative = numbers < 0
+    if negative.any():
+        logger.warning(f"{int(negative.sum())} valeur(s) négative(s) ignorée(s)")
+        numbers = numbers.mask(negative)
+    return numbers
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return float('nan')
+
 
 class DataCalculator:
     """
     Calculateur de données DHIS2
     Convertit les données Excel en payload JSON DHIS2
     """
-    
+
+    # Colonnes techniques du template, dans l'ordre des clés d'un dataValue
+    TEMPLATE_FIELDS = ['dataElement', 'period', 'orgUnit', 'categoryOptionCombo', 'attributeOptionCombo']
+
+    # Traitement des dataValues de même clé (TEMPLATE_FIELDS): somme, dernière valeur ou rejet
+    CONSOLIDATION_POLICIES = ('sum', 'last', 'reject')
+    DEFAULT_CONSOLIDATION_POLICY = 'last'
+    # Mode comptage: les libellés synonymes (M/Garçon) donnent la même clé, leurs comptes s'additionnent
+    COUNT_CONSOLIDATION_POLICY = 'sum'
+
     def __init__(self, metadata_manager: MetadataManager):
         """
         Initialise le calculateur
@@ -40,8 +99,7 @@ class DataCalculator:
             Liste des noms d'onglets
         """
         try:
-            excel_file = pd.ExcelFile(filepath)
-            sheets = excel_file.sheet_names
+            sheets = get_sheet_names(filepath)
             logger.info(f"Onglets détectés dans {filepath}: {sheets}")
             return sheets
         except Exception as e:
@@ -55,7 +113,7 @@ class DataCalculator:
         mode: str = "normal",
         data_element_id: Optional[str] = None,
         period: Optional[str] = None
-    ) -> Tuple[List[Dict], Dict]:
+    ) -> Tuple[DataValues, Dict]:
         """
         Traite un fichier Excel (mode normal ou tableau croisé)
 
@@ -67,7 +125,7 @@ class DataCalculator:
             period: (Optionnel) Période pour mode pivot
 
         Returns:
-            Tuple (liste de dataValues, statistiques)
+            Tuple (dataValues en colonnes, statistiques)
         """
         logger.info(f"[DataCalculator] Traitement du template")
         logger.info(f"  - Filepath: {filepath}")
@@ -86,7 +144,7 @@ class DataCalculator:
             logger.info(f"[DataCalculator] Mode NORMAL détecté, appel _process_normal_template")
             return self._process_normal_template(filepath, sheet_name)
 
-    def _process_normal_template(self, filepath: str, sheet_name: str) -> Tuple[List[Dict], Dict]:
+    def _process_normal_template(self, filepath: str, sheet_name: str) -> Tuple[DataValues, Dict]:
         """
         Traite un template normal (généré par le TemplateGenerator)
 
@@ -95,96 +153,134 @@ class DataCalculator:
             sheet_name: Nom de l'onglet
 
         Returns:
-            Tuple (liste de dataValues, statistiques)
+            Tuple (dataValues en colonnes, statistiques)
         """
         logger.info(f"[_process_normal_template] Début traitement")
-        logger.info(f"  - Sheet: {sheet_name}, Skip 5 rows")
-        
-        # Lire le fichier Excel
+
+        # Lire le fichier (un CSV est lu par blocs de lignes)
         try:
-            df = pd.read_excel(filepath, sheet_name=sheet_name, skiprows=5)
-            logger.info(f"[_process_normal_template] Fichier lu: {len(df)} lignes, colonnes: {list(df.columns)}")
+            if is_csv(filepath):
+                skiprows = self._template_header_row(filepath)
+                logger.info(f"  - CSV, en-tête ligne {skiprows + 1}, lecture par blocs")
+                chunks = iter_csv_chunks(filepath, skiprows=skiprows)
+            else:
+                logger.info(f"  - Sheet: {sheet_name}, Skip 5 rows")
+                chunks = iter([read_excel_cached(filepath, sheet_name=sheet_name, skiprows=5)])
+            df = next(chunks)
+            logger.info(f"[_process_normal_template] Fichier lu: colonnes: {list(df.columns)}")
         except Exception as e:
             logger.error(f"[_process_normal_template] ERREUR lecture: {str(e)}")
             raise ValueError(f"Erreur lecture fichier: {str(e)}")
 
         # Vérifier les colonnes requises (accepter 'value' ou 'VALEUR' pour compatibilité)
-        required_cols = ['dataElement', 'period', 'orgUnit', 'categoryOptionCombo', 'attributeOptionCombo']
-        missing_core = [col for col in required_cols if col not in df.columns]
+        missing_core = [col for col in self.TEMPLATE_FIELDS if col not in df.columns]
         if missing_core:
             raise ValueError(f"Colonnes manquantes: {', '.join(missing_core)}")
 
         value_col = 'value' if 'value' in df.columns else ('VALEUR' if 'VALEUR' in df.columns else None)
         if not value_col:
             raise ValueError("Colonne manquante: 'value' (ou 'VALEUR')")
-        
-        # Section column is optional
-        section_col = 'section' if 'section' in df.columns else None
-
-        # Filtrer les lignes avec valeur
-        df_with_values = df[df[value_col].notna() & (df[value_col] != '')]
-
-        if len(df_with_values) == 0:
-            raise ValueError("Aucune valeur trouvée dans la colonne 'VALEUR'. Veuillez remplir au moins une ligne avec une valeur numérique.")
-
-        df = df_with_values
 
         # Générer les dataValues
-        data_values = []
+        data_values = DataValues()
         errors = {
             'invalid_value': 0,
             'missing_data': 0
         }
+        total_rows = 0
 
-        for idx, row in df.iterrows():
-            try:
-                # Valider la valeur
-                value = self._parse_value(row[value_col])
-                if value is None:
-                    errors['invalid_value'] += 1
-                    continue
-
-                # Créer le dataValue directement depuis les colonnes techniques
-                data_value = {
-                    'dataElement': str(row['dataElement']).strip(),
-                    'period': str(row['period']).strip(),
-                    'orgUnit': str(row['orgUnit']).strip(),
-                    'categoryOptionCombo': str(row['categoryOptionCombo']).strip(),
-                    'attributeOptionCombo': str(row['attributeOptionCombo']).strip(),
-                    'value': str(value)
-                }
-
-                # Vérifier que tous les champs sont présents
-                if any(not v or v == 'nan' for v in data_value.values()):
-                    errors['missing_data'] += 1
-                    continue
-
-                data_values.append(data_value)
-
-            except Exception as e:
-                logger.warning(f"Erreur ligne {idx}: {e}")
-                errors['missing_data'] += 1
-                continue
+        for chunk in chain([df], chunks):
+            # Filtrer les lignes avec valeur
+            chunk = chunk[chunk[value_col].notna() & (chunk[value_col] != '')]
+            total_rows += len(chunk)
+            self._collect_template_values(chunk, value_col, data_values, errors)
+
+        if total_rows == 0:
+            raise ValueError("Aucune valeur trouvée dans la colonne 'VALEUR'. Veuillez remplir au moins une ligne avec une valeur numérique.")
 
         # Statistiques
         stats = {
-            'total_rows': len(df),
+            'total_rows': total_rows,
             'valid_rows': len(data_values),
             'errors': errors,
-            'error_rate': round((sum(errors.values()) / len(df)) * 100, 2) if len(df) > 0 else 0
+            'error_rate': round((sum(errors.values()) / total_rows) * 100, 2) if total_rows > 0 else 0
         }
 
-        logger.info(f"Traitement terminé: {len(data_values)} valeurs valides sur {len(df)}")
+        logger.info(f"Traitement terminé: {len(data_values)} valeurs valides sur {total_rows}")
 
         return data_values, stats
 
+    @staticmethod
+    def _template_header_row(filepath: str, max_scan: int = 10) -> int:
+        """
+        Index de la ligne d'en-tête d'un template exporté en CSV
+
+        Le template Excel a 5 lignes de métadonnées au-dessus de l'en-tête;
+        un CSV peut les avoir conservées ou non.
+        """
+        for index, row in enumerate(iter_rows(filepath)):
+            if index >= max_scan:
+                break
+            cells = {str(v).strip() for v in row if v is not None}
+            if {'dataElement', 'orgUnit'} <= cells:
+                return index
+        return 5
+
+    def _collect_template_values(self, df: pd.DataFrame, value_col: str, data_values: DataValues, errors: Dict[str, int]):
+        """
+        Ajoute à data_values les dataValues d'un bloc de lignes avec valeur (erreurs comptées dans errors)
+
+        Traitement par colonnes: conversion numérique de la colonne valeur,
+        texte nettoyé des colonnes techniques et masques d'erreurs, puis une
+        seule conversion en colonnes de dataValues pour les lignes valides.
+        """
+        if df.empty:
+            return
+
+        values = parse_values(df[value_col]).to_numpy()
+        invalid = np.isnan(values)
+
+        fields = [self._text_values(df[col]) for col in self.TEMPLATE_FIELDS]
+        missing = np.zeros(len(df), dtype=bool)
+        for text in fields:
+            missing |= (text == '') | (text == 'nan')
+        missing &= ~invalid
+
+        errors['invalid_value'] += int(invalid.sum())
+        errors['missing_data'] += int(missing.sum())
+
+        keep = ~(invalid | missing)
+        if not keep.any():
+            return
+
+        data_values.extend(
+            list(map(str, values[keep].tolist())),
+            **{field: text[keep].tolist() for field, text in zip(self.TEMPLATE_FIELDS, fields)}
+        )
+
+    @staticmethod
+    def _text_values(column: pd.Series) -> np.ndarray:
+        """Équivalent vectorisé de str(valeur).strip() sur une colonne (NaN -> 'nan'), en tableau object"""
+        dtype = column.dtype
+        if (
+            pd.api.types.is_integer_dtype(dtype)
+            or pd.api.types.is_bool_dtype(dtype)
+            or pd.api.types.infer_dtype(column, skipna=True) == 'string'
+        ):
+            # Colonne homogène: rendu calculé une seule fois par valeur distincte
+            codes, uniques = pd.factorize(column)
+            labels = np.array([str(u).strip() for u in uniques] + ['nan'], dtype=object)
+            return labels[codes]
+        # Colonne mixte, décimale ou de dates: rendu str() de chaque cellule
+        return column.map(str).str.strip().to_numpy(dtype=object)
+
     def _process_pivot_table(
         self,
         filepath: str,
         sheet_name: str,
         data_element_id: Optional[str] = None,
         period: str = '2024'
-    ) -> Tuple[List[Dict], Dict]:
+    ) -> Tuple[DataValues, Dict]:
         """
         Traite un tableau croisé dynamique (TCD)
         Format: Première colonne = noms des indicateurs/data elements
@@ -207,7 +303,7 @@ class DataCalculator:
 
         # Lire le tableau
         try:
-            df = pd.read_excel(filepath, sheet_name=sheet_name)
+            df = read_excel_cached(filepath, sheet_name=sheet_name)
             logger.info(f"[_process_pivot_table] Fichier lu: {len(df)} lignes, {len(df.columns)} colonnes")
             logger.info(f"[_process_pivot_table] Colonnes: {list(df.columns)}")
         except Exception as e:
@@ -218,7 +314,6 @@ class DataCalculator:
             logger.error(f"[_process_pivot_table] L'onglet est VIDE")
             raise ValueError("L'onglet est vide")
 
-        data_values = []
         errors = {
             'org': 0,
             'value': 0,
@@ -226,8 +321,7 @@ class DataCalculator:
             'de_name_empty': 0
         }
 
-        # Première colonne = indicateurs/data elements
-        indicator_col = df.columns[0]
+        # Première colonne = indicateurs/data elements (df.iloc[:, 0])
         # Autres colonnes = noms des structures
         org_columns = df.columns[1:]
 
@@ -236,72 +330,73 @@ class DataCalculator:
 
         logger.info(f"TCD détecté: {len(df)} indicateurs x {len(org_columns)} organisations")
 
-        for idx, row in df.iterrows():
-            # Récupérer le nom de l'indicateur/data element
-            indicator_name = str(row[indicator_col]).strip()
-            
-            if not indicator_name or indicator_name == '' or indicator_name.lower() == 'nan':
-                errors['de_name_empty'] += 1
-                continue
-
-            # Résoudre le data element
-            if data_element_id:
-                # Mode mono-DE : utiliser l'ID fourni pour toutes les lignes
-                de_id = data_element_id
-            else:
-                # Mode multi-DE : chercher le DE par son nom
-                de_id = self.metadata.de_name_to_id.get(indicator_name.lower())
-                
-                if not de_id:
-                    errors['de_not_found'] += 1
-                    logger.warning(f"Data element non trouvé: '{indicator_name}'")
-                    continue
-
-            # Pour chaque organisation (colonne)
-            for org_col in org_columns:
-                value = row[org_col]
-
-                # Ignorer valeurs vides
-                if pd.isna(value) or str(value).strip() == '':
-                    continue
-
-                # Résoudre organisation
-                org_name = str(org_col).strip()
-                org_key = org_name.lower()
-
-                # Essayer par code d'abord
-                org_id = self.metadata.org_code_to_id.get(org_key)
-
-                # Fallback sur le nom
-                if not org_id:
-                    org_id = self.metadata.org_name_to_id.get(org_key)
-
-                if not org_id:
-                    errors['org'] += 1
-                    logger.warning(f"Organisation inconnue: {org_name}")
-                    continue
-
-                # Valider valeur
-                val = self._parse_value(value)
-                if val is None:
-                    errors['value'] += 1
-                    continue
-
-                # Créer dataValue
-                data_values.append({
-                    'dataElement': de_id,
-                    'period': period,
-                    'orgUnit': org_id,
-                    'categoryOptionCombo': default_coc,
-                    'attributeOptionCombo': default_aoc,
-                    'value': str(int(val) if val.is_integer() else val)
-                })
+        # Data element de chaque ligne ('' si nom vide ou DE inconnu)
+        names = pd.Series(self._text_values(df.iloc[:, 0]), dtype=object)
+        lowered = names.map(str.lower)
+        name_empty = ((names == '') | (lowered == 'nan')).to_numpy()
+        if data_element_id:
+            # Mode mono-DE : utiliser l'ID fourni pour toutes les lignes
+            row_de_ids = pd.Series(data_element_id, index=names.index, dtype=object)
+        else:
+            # Mode multi-DE : chercher le DE par son nom
+            row_de_ids = lowered.map(self.metadata.de_name_to_id).fillna('')
+        row_de_ids = row_de_ids.where(~name_empty, '').tolist()
+        de_missing = ~name_empty & (np.array(row_de_ids, dtype=object) == '')
+        errors['de_name_empty'] += int(name_empty.sum())
+        errors['de_not_found'] += int(de_missing.sum())
+        if de_missing.any():
+            logger.warning(f"Data elements non trouvés: {sorted(set(names[de_missing]))}")
+
+        # Organisation de chaque colonne, résolue une seule fois (code puis nom)
+        column_org_ids = []
+        for org_col in org_columns:
+            org_key = str(org_col).strip().lower()
+            column_org_ids.append(
+                self.metadata.org_code_to_id.get(org_key) or self.metadata.org_name_to_id.get(org_key)
+            )
+        unknown_orgs = [str(col).strip() for col, org_id in zip(org_columns, column_org_ids) if not org_id]
+
+        # Passage en format long: une cellule par (ligne, organisation), dans l'ordre des lignes
+        n_rows, n_cols = len(df), len(org_columns)
+        cells = pd.Series(df.iloc[:, 1:].to_numpy().ravel())
+        row_codes = np.repeat(np.arange(n_rows), n_cols)
+        col_codes = np.tile(np.arange(n_cols), n_rows)
+
+        # Cellules à traiter: ligne avec DE, valeur non vide
+        filled = ~cells.isna().to_numpy()
+        if not pd.api.types.is_numeric_dtype(cells.dtype):
+            filled &= self._text_values(cells) != ''
+        candidate = np.array([bool(de_id) for de_id in row_de_ids], dtype=bool)[row_codes] & filled
+
+        org_known = np.array([bool(org_id) for org_id in column_org_ids], dtype=bool)[col_codes]
+        org_missing = candidate & ~org_known
+        errors['org'] += int(org_missing.sum())
+        if org_missing.any():
+            logger.warning(f"Organisations inconnues: {unknown_orgs}")
+
+        # Validation des valeurs des cellules restantes
+        positions = np.flatnonzero(candidate & org_known)
+        values = parse_values(cells.iloc[positions]).to_numpy()
+        valid = ~np.isnan(values)
+        errors['value'] += int((~valid).sum())
+        positions, values = positions[valid], values[valid]
+
+        rows, cols = row_codes[positions].tolist(), col_codes[positions].tolist()
+        data_values = DataValues()
+        data_values.extend(
+            [str(int(val) if val.is_integer() else val) for val in values.tolist()],
+            dataElement=[row_de_ids[row] for row in rows],
+            period=period,
+            orgUnit=[column_org_ids[col] for col in cols],
+            categoryOptionCombo=default_coc,
+            attributeOptionCombo=default_aoc
+        )
 
         stats = {
             'total_rows': len(df),
             'total_columns': len(org_columns),
             'valid_rows': len(data_values),
-            'unique_data_elements': len(set(dv['dataElement'] for dv in data_values)),
+            'unique_data_elements': len(data_values.unique('dataElement')),
             'errors': errors,
             'error_rate': round((sum(errors.values()) / (len(df) * len(org_columns))) * 100, 2) if len(df) > 0 else 0
         }
@@ -316,7 +411,7 @@ class DataCalculator:
         column_mapping: Dict[str, str],
         dataset_id: str,
         default_period: Optional[str] = None
-    ) -> Tuple[List[Dict], Dict]:
+    ) -> Tuple[DataValues, Dict]:
         """
         Traite un fichier Excel personnalisé (non-template)
         
@@ -327,13 +422,13 @@ class DataCalculator:
             default_period: Période par défaut si non présente dans le fichier
             
         Returns:
-            Tuple (liste de dataValues, statistiques)
+            Tuple (dataValues en colonnes, statistiques)
         """
         logger.info(f"Traitement fichier personnalisé: {filepath}")
         
         # Lire le fichier
         try:
-            df = pd.read_excel(filepath)
+            df = read_excel_cached(filepath)
         except Exception as e:
             raise ValueError(f"Erreur lecture fichier: {str(e)}")
         
@@ -375,7 +470,7 @@ class DataCalculator:
         logger.info(f"Données groupées: {len(grouped)} combinaisons")
         
         # Générer les dataValues
-        data_values = []
+        data_values = DataValues()
         errors = {
             'org_not_found': 0,
             'indicator_not_found': 0,
@@ -467,7 +562,7 @@ class DataCalculator:
         column_mapping: Dict[str, str]
     ) -> Optional[str]:
         """
-        Résout le categoryOptionCombo avec fuzzy matching
+        Résout le categoryOptionCombo via le résolveur compilé du combo
         
         Args:
             cc_id: ID du category combo
@@ -476,48 +571,20 @@ class DataCalculator:
             column_mapping: Mapping des colonnes
             
         Returns:
-            ID du COC ou None
+            ID du COC (défaut si aucune option renseignée) ou None
         """
-        # Si pas de combo ou combo par défaut
-        if not cc_id:
-            return self.metadata.coc_lookup.get("default")
-        
-        cat_combo = self.metadata.cat_combos.get(cc_id)
-        if not cat_combo or cat_combo.get('name') == 'default':
-            return self.metadata.coc_lookup.get("default")
+        resolver = self.metadata.get_coc_resolver(cc_id)
         
         # Récupérer les options de catégories
-        options = []
-        for cat in cat_combo.get('categories', []):
-            cat_id = cat['id']
-            
-            # Trouver la colonne correspondante
-            cat_col = None
-            for key, col in category_cols.items():
-                if key == f'cat_{cat_id}':
-                    cat_col = col
-                    break
-            
+        options = {}
+        for cat_id, _ in resolver.categories:
+            cat_col = category_cols.get(f'cat_{cat_id}')
             if cat_col and cat_col in row.index:
-                val = str(row[cat_col]).strip()
-                val = self._normalize_category_value(val)
+                val = self._normalize_category_value(str(row[cat_col]).strip())
                 if val:
-                    options.append(val)
-        
-        # Utiliser le fuzzy matching
-        if options:
-            coc_name = " | ".join(sorted(options))
-            coc_id = self.metadata.get_coc_uid_fuzzy(coc_name)
-            if coc_id:
-                return coc_id
-            
-            # Tenter avec "," comme séparateur alternatif
-            coc_name_alt = ", ".join(sorted(options))
-            coc_id = self.metadata.get_coc_uid_fuzzy(coc_name_alt)
-            if coc_id:
-                return coc_id
+                    options[cat_id] = val
         
-        return self.metadata.coc_lookup.get("default")
+        return resolver.resolve(options)
     
     def _normalize_category_value(self, value: str) -> str:
         """
@@ -575,20 +642,171 @@ class DataCalculator:
             None
         )
     
-    def generate_dhis2_payload(self, data_values: List[Dict]) -> Dict:
+    def consolidate_data_values(
+        self,
+        data_values: DataValues,
+        policy: str = DEFAULT_CONSOLIDATION_POLICY
+    ) -> Tuple[DataValues, Dict]:
+        """
+        Regroupe les dataValues de même clé (dataElement, period, orgUnit,
+        categoryOptionCombo, attributeOptionCombo) en une passe
+        
+        Politiques:
+        - 'sum': valeurs additionnées (dernière valeur si non numériques)
+        - 'last': dernière valeur retenue (comme à l'import DHIS2)
+        - 'reject': clés en conflit retirées du payload
+        
+        Args:
+            data_values: dataValues (DataValues ou liste de dicts)
+            policy: Politique de consolidation
+            
+        Returns:
+            Tuple (dataValues consolidés, rapport des conflits)
+        """
+        if policy not in self.CONSOLIDATION_POLICIES:
+            raise ValueError(f"Politique de consolidation inconnue: {policy}")
+        if not isinstance(data_values, DataValues):
+            data_values = DataValues.from_records(data_values)
+        
+        positions = {}  # clé (codes des UID) -> rang dans kept (première occurrence)
+        doublons = {}   # rang -> valeurs de toutes les occurrences
+        kept = []       # position retenue pour chaque clé (dernière occurrence)
+        values = data_values.values
+        for pos, key in enumerate(data_values.keys()):
+            rank = positions.get(key)
+            if rank is None:
+                positions[key] = len(kept)
+                kept.append(pos)
+                continue
+            doublons.setdefault(rank, [values[kept[rank]]]).append(values[pos])
+            kept[rank] = pos
+        
+        if not doublons:
+            return data_values, {
+                'policy': policy, 'duplicate_keys': 0, 'removed_values': 0, 'non_summable': 0, 'conflicts': []
+            }
+        
+        new_values = [values[pos] for pos in kept]
+        conflicts, non_summable = [], 0
+        for rank, occurrences in doublons.items():
+            if len(conflicts) < 10:
+                conflicts.append({
+                    **{field: value for field, value in data_values[kept[rank]].items() if field != 'value'},
+                    'values': occurrences
+                })
+            if policy == 'sum':
+                total = self._sum_values(occurrences)
+                if total is None:
+                    non_summable += 1
+                else:
+                    new_values[rank] = total
+        
+        if policy == 'reject':
+            ranks = [rank for rank in range(len(kept)) if rank not in doublons]
+            consolidated = data_values.take([kept[rank] for rank in ranks], [new_values[rank] for rank in ranks])
+        else:
+            consolidated = data_values.take(kept, new_values)
+        
+        report = {
+            'policy': policy,
+            'duplicate_keys': len(doublons),
+            'removed_values': len(data_values) - len(consolidated),
+            'non_summable': non_summable,
+            'conflicts': conflicts
+        }
+        logger.warning(
+            f"{len(doublons)} clés dataValue en double ({report['removed_values']} valeurs retirées, "
+            f"politique '{policy}')"
+        )
+        return consolidated, report
+    
+    @staticmethod
+    def _sum_values(values: List[str]) -> Optional[str]:
+        """
+        Somme de valeurs texte, None si non numériques
+
+        Entière si toutes les valeurs le sont; sinon somme décimale exacte
+        (0.1 + 0.2 = 0.3, sans artefact de virgule flottante).
+        """
+        try:
+            return str(sum(int(v) for v in values))
+        except (TypeError, ValueError):
+            pass
+        try:
+            total = sum(Decimal(str(v).strip()) for v in values)
+        except (TypeError, ValueError, ArithmeticError):
+            return None
+        if not total.is_finite():
+            return None
+        return format(total, 'f')
+    
+    def generate_dhis2_payload(self, data_values: DataValues) -> Dict:
         """
         Génère le payload JSON final pour DHIS2
+        (à écrire avec data_values.write_payload_json)
+        
+        Les valeurs des éléments de données entiers lues comme décimales
+        ('5.0') sont écrites en entiers ('5'), seule forme acceptée par DHIS2.
         
         Args:
-            data_values: Liste des dataValues
+            data_values: dataValues (DataValues ou liste de dicts)
             
         Returns:
             Payload JSON DHIS2
         """
+        self.normalize_integer_values(data_values)
         return {
             "dataValues": data_values
         }
     
+    def normalize_integer_values(self, data_values: DataValues) -> int:
+        """
+        Réécrit en entier ('5') les valeurs décimales entières ('5.0') des
+        éléments de données de type entier (modification sur place)
+        
+        Args:
+            data_values: dataValues (DataValues ou liste de dicts)
+            
+        Returns:
+            Nombre de valeurs réécrites
+        """
+        integer_des = {
+            de_id for de_id, de in self.metadata.data_elements_map.items()
+            if de.get('valueType') in INTEGER_VALUE_TYPES
+        }
+        if not integer_des:
+            return 0
+        
+        rendered = {}  # texte d'origine -> entier, ou None si non concerné
+        
+        def as_integer(value):
+            if value not in rendered:
+                match = INTEGRAL_DECIMAL_PATTERN.fullmatch(str(value))
+                rendered[value] = str(int(match.group(1))) if match else None
+            return rendered[value]
+        
+        changed = 0
+        if isinstance(data_values, DataValues):
+            labels = data_values.labels('dataElement')
+            is_integer = np.array([label in integer_des for label in labels] + [False], dtype=bool)
+            codes = np.frombuffer(data_values.codes('dataElement'), dtype=np.int32)
+            values = data_values.values
+            for pos in np.flatnonzero(is_integer[codes]).tolist():
+                integer = as_integer(values[pos])
+                if integer is not None:
+                    values[pos] = integer
+                    changed += 1
+        else:
+            for data_value in data_values:
+                if data_value.get('dataElement') in integer_des:
+                    integer = as_integer(data_value.get('value'))
+                    if integer is not None:
+                        data_value['value'] = integer
+                        changed += 1
+        if changed:
+            logger.info(f"{changed} valeur(s) décimale(s) entière(s) réécrite(s) en entier (éléments de type entier)")
+        return changed
+    
     def validate_payload(self, payload: Dict) -> Tuple[bool, List[str]]:
         """
         Valide un payload DHIS2
@@ -607,7 +825,7 @@ class DataCalculator:
         
         data_values = payload['dataValues']
         
-        if not isinstance(data_values, list):
+        if not isinstance(data_values, (list, DataValues)):
             errors.append("'dataValues' doit être une liste")
             return False, errors
         
@@ -615,12 +833,43 @@ class DataCalculator:
             errors.append("'dataValues' est vide")
             return False, errors
         
-        # Valider chaque dataValue
+        # Valider chaque dataValue (DataValues: tous les champs existent par construction)
         required_fields = ['dataElement', 'period', 'orgUnit', 'categoryOptionCombo', 'value']
         
-        for idx, dv in enumerate(data_values[:10]):  # Vérifier les 10 premiers
-            missing = [f for f in required_fields if f not in dv]
-            if missing:
-                errors.append(f"DataValue {idx}: champs manquants {missing}")
+        if isinstance(data_values, list):
+            incomplete = 0
+            for idx, dv in enumerate(data_values):
+                missing = [f for f in required_fields if f not in dv]
+                if missing:
+                    incomplete += 1
+                    if incomplete <= 10:
+                        errors.append(f"DataValue {idx}: champs manquants {missing}")
+            if incomplete > 10:
+                errors.append(f"... {incomplete} dataValues incomplets au total")
         
         return len(errors) == 0, errors
+    
+    def check_payload(self, payload: Dict, dataset_id: Optional[str] = None) -> Dict:
+        """
+        Contrôle chaque dataValue contre les métadonnées du dataset
+        (cf. PayloadValidator)
+        
+        Args:
+            payload: Payload DHIS2 (structure déjà validée par validate_payload)
+            dataset_id: Dataset de référence (défaut: celui qui contient le
+                        plus d'éléments de données du payload)
+            
+        Returns:
+            Rapport d'erreurs groupées par type
+        """
+        data_values = payload['dataValues']
+        if not isinstance(data_values, DataValues):
+            data_values = DataValues.from_records(data_values)
+        validator = PayloadValidator.for_payload(self.metadata, data_values, dataset_id)
+        report = validator.validate(data_values)
+        if report['invalid_values']:
+            logger.warning(
+                f"Validation payload: {report['invalid_values']}/{report['checked']} valeurs en erreur "
+                f"({', '.join(e['type'] for e in report['errors'])})"
+            )
+        return report
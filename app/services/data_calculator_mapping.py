@@ -6,14 +6,31 @@ Traite les fichiers Excel bruts avec mapping explicite des data elements
 Supporte deux modes:
 1. Mode Valeurs: Fichiers avec valeurs agrégées (colonnes de valeurs numériques)
 2. Mode Comptage: Fichiers avec enregistrements individuels (compte automatiquement)
+
+Les fichiers CSV/TSV sont traités par blocs de lignes (cellules lues comme texte).
 """
 
 import logging
-from typing import Dict, List, Tuple, Optional
+from itertools import chain
+from typing import Dict, Iterable, List, Tuple, Optional, Union
+import numpy as np
 import pandas as pd
 
+from app.services.data_calculator import parse_values
+from app.services.data_values import DataValues
+from app.services.sheet_cache import read_excel_cached
+from app.services.excel_stream import (
+    EMPTY_LABEL, count_combinations, count_csv_combinations, ffill_chunks,
+    is_large_sheet, is_streamable, read_sheet_columns
+)
+from app.services.sheet_reader import is_csv, iter_csv_chunks
+
 logger = logging.getLogger(__name__)
 
+# Détection des colonnes de valeurs: cellules examinées et part minimale de nombres
+VALUE_DETECTION_SAMPLE = 1000
+VALUE_DETECTION_MIN_RATIO = 0.9
+
 
 def process_mapped_excel(
     metadata_manager,
@@ -29,7 +46,7 @@ def process_mapped_excel(
     fixed_org_unit: Optional[str] = None,
     sheet_name: Optional[str] = None,
     org_unit_mapping: Optional[Dict[str, str]] = None
-) -> Tuple[List[Dict], Dict]:
+) -> Tuple[DataValues, Dict]:
     """
     Traite un fichier Excel avec mapping explicite des data elements
 
@@ -49,26 +66,25 @@ def process_mapped_excel(
         org_unit_mapping: (Optionnel) Mapping manuel {valeur_excel: code_dhis2}
 
     Returns:
-        Tuple (liste de dataValues, statistiques)
+        Tuple (dataValues en colonnes, statistiques)
     """
     logger.info(f"Traitement mapping Excel: {filepath} - Mode: {processing_mode} - Sheet: {sheet_name}")
 
-    # Lire le fichier
-    try:
-        if sheet_name:
-            df = pd.read_excel(filepath, sheet_name=sheet_name)
-            logger.info(f"Fichier lu avec sheet '{sheet_name}': {len(df)} lignes, colonnes: {list(df.columns)}")
-        else:
-            df = pd.read_excel(filepath)
-            logger.info(f"Fichier lu (premier sheet): {len(df)} lignes, colonnes: {list(df.columns)}")
-    except Exception as e:
-        logger.error(f"ERREUR lecture fichier: {str(e)}")
-        raise ValueError(f"Erreur lecture fichier: {str(e)}")
-    
-    # Appliquer le fill down pour les cellules fusionnées (format TCD)
-    logger.info(f"Application fill-down sur org_column={org_column}, categories={list(category_mapping.keys())}")
-    df = _apply_fill_down(df, org_column, category_mapping)
-    logger.info(f"Après fill-down: {len(df)} lignes")
+    # CSV: lecture par blocs, sans DataFrame complet
+    if is_csv(filepath):
+        logger.info("Fichier CSV: traitement par blocs")
+        df = None
+    # Mode comptage sur un gros export: agrégation en flux sans DataFrame complet
+    elif processing_mode == 'count' and is_streamable(filepath) and is_large_sheet(filepath, sheet_name):
+        logger.info(f"Onglet volumineux: comptage en flux (lecture read-only)")
+        df = None
+    else:
+        df = _read_sheet(filepath, sheet_name)
+
+        # Appliquer le fill down pour les cellules fusionnées (format TCD)
+        logger.info(f"Application fill-down sur org_column={org_column}, categories={list(category_mapping.keys())}")
+        df = _apply_fill_down(df, org_column, category_mapping)
+        logger.info(f"Après fill-down: {len(df)} lignes")
 
     # Récupérer le dataset
     dataset = next((ds for ds in metadata_manager.datasets if ds['id'] == dataset_id), None)
@@ -80,9 +96,13 @@ def process_mapped_excel(
         return _process_count_mode(
             metadata_manager, df, org_column, category_mapping,
             data_element_mapping, dataset_id, period,
-            data_element_column, value_to_de_mapping, fixed_org_unit
+            data_element_column, value_to_de_mapping, fixed_org_unit,
+            filepath=filepath, sheet_name=sheet_name
         )
     else:
+        if df is None:
+            fill_columns = _structural_columns(read_sheet_columns(filepath), org_column, category_mapping)
+            df = ffill_chunks(iter_csv_chunks(filepath), fill_columns)
         return _process_values_mode(
             metadata_manager, df, org_column, category_mapping,
             data_element_mapping, dataset_id, period, fixed_org_unit,
@@ -90,9 +110,24 @@ def process_mapped_excel(
         )
 
 
+def _read_sheet(filepath: str, sheet_name: Optional[str]) -> pd.DataFrame:
+    """Lit l'onglet demandé (ou le premier) depuis le cache des onglets"""
+    try:
+        if sheet_name:
+            df = read_excel_cached(filepath, sheet_name=sheet_name)
+            logger.info(f"Fichier lu avec sheet '{sheet_name}': {len(df)} lignes, colonnes: {list(df.columns)}")
+        else:
+            df = read_excel_cached(filepath)
+            logger.info(f"Fichier lu (premier sheet): {len(df)} lignes, colonnes: {list(df.columns)}")
+    except Exception as e:
+        logger.error(f"ERREUR lecture fichier: {str(e)}")
+        raise ValueError(f"Erreur lecture fichier: {str(e)}")
+    return df
+
+
 def _process_values_mode(
     metadata_manager,
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
     org_column: str,
     category_mapping: Dict[str, str],
     data_element_mapping: Dict[str, str],
@@ -100,12 +135,17 @@ def _process_values_mode(
     period: str,
     fixed_org_unit: Optional[str] = None,
     org_unit_mapping: Optional[Dict[str, str]] = None
-) -> Tuple[List[Dict], Dict]:
+) -> Tuple[DataValues, Dict]:
     """
     Mode Valeurs: Traite un fichier avec valeurs numériques pré-agrégées
     Support de la détection automatique des colonnes de valeurs (TCD)
+
+    df peut être un DataFrame ou une suite de blocs (CSV lu par blocs): la
+    validation se fait sur le premier bloc, les lignes sont traitées bloc par bloc.
     """
     logger.info("Mode Valeurs: Traitement des valeurs agrégées")
+    chunks = iter([df]) if isinstance(df, pd.DataFrame) else iter(df)
+    df = next(chunks)
     logger.info(f"Input: df shape={df.shape}, org_column={org_column}, fixed_org={fixed_org_unit}")
     logger.info(f"Mapping reçu: categories={category_mapping}, DEs={data_element_mapping}")
 
@@ -139,11 +179,8 @@ def _process_values_mode(
     if missing_cols:
         raise ValueError(f"Colonnes manquantes dans le fichier: {', '.join(missing_cols)}")
 
-    # Préparer les données
-    df = df.fillna("")
-
     # Générer les dataValues
-    data_values = []
+    data_values = DataValues()
     errors = {
         'org_not_found': 0,
         'de_not_found': 0,
@@ -153,133 +190,206 @@ def _process_values_mode(
     }
 
     default_aoc = metadata_manager.coc_lookup.get("default", "")
+    total_rows = 0
     
-    logger.info(f"Début de la boucle: {len(df)} lignes à traiter avec {len(data_element_mapping)} DEs")
-
-    for idx, row in df.iterrows():
-        # Résoudre l'organisation
-        if fixed_org_unit:
-            # Mode valeur fixe
-            org_id = fixed_org_unit
-        else:
-            # Mode colonne avec gestion avancée des types (float -> str)
-            raw_org = row[org_column]
-            
-            if isinstance(raw_org, float) and raw_org.is_integer():
-                org_value = str(int(raw_org))
-            else:
-                org_value = str(raw_org).strip()
-                
-            org_key = org_value.lower()
-            org_id = None
-
-            # 1. Vérifier le mapping manuel
-            # Le mapping manuel contient {valeur_excel: code_dhis2}
-            if org_unit_mapping and org_value in org_unit_mapping:
-                mapped_code = org_unit_mapping[org_value]
-                # Résoudre le code mappé en ID
-                org_id = metadata_manager.org_code_to_id.get(str(mapped_code).lower().strip())
-                if not org_id:
-                    logger.warning(f"Ligne {idx+2}: Code mappé manuellement introuvable dans DHIS2: {mapped_code} (mapping: {org_value} -> {mapped_code})")
-
-            # 2. Si pas de mapping manuel ou mapping échoué, utiliser la logique standard
-            if not org_id:
-                # Essayer d'abord par code (plus fiable)
-                org_id = metadata_manager.org_code_to_id.get(org_key)
-
-                # Fallback sur le nom si code non trouvé
-                if not org_id:
-                    org_id = metadata_manager.org_name_to_id.get(org_key)
-
-            if not org_id:
-                errors['org_not_found'] += 1
-                logger.warning(f"Ligne {idx+2}: Organisation non trouvée: {org_value}")
-                continue
-
-        # Résoudre les category options
-        category_options = {}
-        for cat_id, col_name in category_mapping.items():
-            cat_value = str(row[col_name]).strip()
-            if cat_value:
-                # Normaliser la valeur
-                cat_value_normalized = _normalize_category_value(cat_value)
-                category_options[cat_id] = cat_value_normalized
-
-        # Pour chaque data element mappé
-        for de_id, col_name in data_element_mapping.items():
-            # Récupérer la valeur
-            value = row[col_name]
-
-            # Ignorer les valeurs vides
-            if pd.isna(value) or value == '' or value == 0:
-                errors['empty_value'] += 1
-                continue
-
-            # Valider la valeur
-            parsed_value = _parse_value(value)
-            if parsed_value is None:
-                errors['invalid_value'] += 1
-                logger.warning(f"Ligne {idx+2}, DE {de_id}: Valeur invalide: {value}")
-                continue
-
-            # Récupérer le data element
-            de = metadata_manager.data_elements_map.get(de_id)
-            if not de:
-                errors['de_not_found'] += 1
-                continue
-
-            # Résoudre le COC
-            cc_id = de.get('categoryCombo', {}).get('id')
-            coc_id = _resolve_coc(metadata_manager, cc_id, category_options)
-
-            if not coc_id:
-                errors['coc_not_found'] += 1
-                logger.warning(f"Ligne {idx+2}, DE {de_id}: COC non trouvé pour {category_options}")
-                continue
-
-            # Créer le dataValue
-            data_value = {
-                'dataElement': de_id,
-                'period': period,
-                'orgUnit': org_id,
-                'categoryOptionCombo': coc_id,
-                'attributeOptionCombo': default_aoc,
-                'value': str(parsed_value)
-            }
-
-            data_values.append(data_value)
+    logger.info(f"Début de la boucle: {len(data_element_mapping)} DEs par ligne")
+
+    for chunk in chain([df], chunks):
+        # Préparer les données
+        chunk = chunk.fillna("")
+        total_rows += len(chunk)
+        _collect_values(
+            metadata_manager, chunk, org_column, category_mapping, data_element_mapping,
+            period, fixed_org_unit, org_unit_mapping, default_aoc, data_values, errors
+        )
 
     # Statistiques
     stats = {
-        'total_rows': len(df),
+        'total_rows': total_rows,
         'valid_rows': len(data_values),
         'errors': errors,
-        'error_rate': round((sum(errors.values()) / (len(df) * len(data_element_mapping))) * 100, 2) if len(df) > 0 else 0
+        'error_rate': round((sum(errors.values()) / (total_rows * len(data_element_mapping))) * 100, 2) if total_rows > 0 else 0
     }
 
-    logger.info(f"Traitement terminé: {len(data_values)} valeurs valides sur {len(df)} lignes x {len(data_element_mapping)} DEs")
+    logger.info(f"Traitement terminé: {len(data_values)} valeurs valides sur {total_rows} lignes x {len(data_element_mapping)} DEs")
 
     return data_values, stats
 
 
-def _process_count_mode(
+def _collect_values(
     metadata_manager,
     df: pd.DataFrame,
     org_column: str,
     category_mapping: Dict[str, str],
     data_element_mapping: Dict[str, str],
+    period: str,
+    fixed_org_unit: Optional[str],
+    org_unit_mapping: Optional[Dict[str, str]],
+    default_aoc: str,
+    data_values: DataValues,
+    errors: Dict[str, int]
+):
+    """
+    Mode Valeurs: ajoute à data_values les dataValues d'un bloc de lignes (erreurs comptées dans errors)
+
+    Traitement par colonnes: organisations résolues une fois par valeur
+    distincte, catégories réduites à une clé (tuple d'options) par ligne,
+    COC résolu une fois par (category combo, clé), colonnes de DE passées
+    en format long. Les dataValues restent dans l'ordre ligne puis DE.
+    """
+    n_rows = len(df)
+    if n_rows == 0:
+        return
+
+    # Organisation de chaque ligne
+    if fixed_org_unit:
+        # Mode valeur fixe
+        row_org_ids = [fixed_org_unit] * n_rows
+    else:
+        org_values = [_org_value(raw) for raw in df[org_column].tolist()]
+        resolved = {
+            value: _resolve_org(metadata_manager, value, org_unit_mapping)
+            for value in dict.fromkeys(org_values)
+        }
+        row_org_ids = [resolved[value] for value in org_values]
+        unknown = [value for value, org_id in resolved.items() if not org_id]
+        if unknown:
+            logger.warning(f"Organisations non trouvées ({len(unknown)}): {unknown[:20]}")
+
+    org_found = np.array([bool(org_id) for org_id in row_org_ids], dtype=bool)
+    errors['org_not_found'] += int((~org_found).sum())
+
+    # Clé des category options de chaque ligne
+    row_keys = _category_keys(df, category_mapping)
+
+    # Format long: une cellule par (ligne, DE), validée colonne par colonne
+    coc_cache = {}
+    cell_rows, cell_des, cell_cocs, cell_values = [], [], [], []
+    for de_index, (de_id, col_name) in enumerate(data_element_mapping.items()):
+        column = df[col_name]
+        raw = column.to_numpy(dtype=object)
+
+        # Ignorer les valeurs vides (et les zéros)
+        empty = pd.isna(raw) | (raw == '') | (raw == 0)
+        errors['empty_value'] += int((org_found & empty).sum())
+        positions = np.flatnonzero(org_found & ~empty)
+
+        # Valider la valeur
+        numbers = parse_values(column.iloc[positions]).to_numpy()
+        invalid = np.isnan(numbers)
+        if invalid.any():
+            errors['invalid_value'] += int(invalid.sum())
+            logger.warning(
+                f"DE {de_id}: {int(invalid.sum())} valeur(s) invalide(s), "
+                f"ex: {raw[positions[invalid]][:5].tolist()}"
+            )
+
+        # Zéro saisi comme texte (CSV): ignoré comme un zéro numérique
+        zero = numbers == 0
+        errors['empty_value'] += int(zero.sum())
+        keep = ~(invalid | zero)
+        positions, numbers = positions[keep], numbers[keep]
+        if len(positions) == 0:
+            continue
+
+        # Récupérer le data element
+        de = metadata_manager.data_elements_map.get(de_id)
+        if not de:
+            errors['de_not_found'] += len(positions)
+            continue
+
+        # Résoudre le COC (une fois par combinaison d'options distincte)
+        cc_id = de.get('categoryCombo', {}).get('id')
+        cocs = [_cached_coc(metadata_manager, cc_id, row_keys[row], coc_cache) for row in positions.tolist()]
+
+        found = np.array([bool(coc_id) for coc_id in cocs], dtype=bool)
+        errors['coc_not_found'] += int((~found).sum())
+
+        cell_rows.append(positions[found])
+        cell_des.append(np.full(int(found.sum()), de_index))
+        cell_cocs.extend(coc_id for coc_id in cocs if coc_id)
+        cell_values.append(numbers[found])
+
+    if not cell_rows:
+        return
+
+    # Créer les dataValues dans l'ordre ligne puis DE
+    rows = np.concatenate(cell_rows)
+    order = np.lexsort((np.concatenate(cell_des), rows))
+    de_ids = list(data_element_mapping.keys())
+    data_values.extend(
+        [str(value) for value in np.concatenate(cell_values)[order].tolist()],
+        dataElement=[de_ids[de_index] for de_index in np.concatenate(cell_des)[order].tolist()],
+        period=period,
+        orgUnit=[row_org_ids[row] for row in rows[order].tolist()],
+        categoryOptionCombo=[cell_cocs[cell] for cell in order.tolist()],
+        attributeOptionCombo=default_aoc
+    )
+
+
+def _org_value(raw) -> str:
+    """Valeur d'organisation d'une cellule (float entier -> entier, ex: code 1234.0 -> '1234')"""
+    if isinstance(raw, float) and raw.is_integer():
+        return str(int(raw))
+    return str(raw).strip()
+
+
+def _resolve_org(metadata_manager, org_value: str, org_unit_mapping: Optional[Dict[str, str]]) -> Optional[str]:
+    """
+    Résout une valeur d'organisation: mapping manuel, puis code, puis nom
+
+    Args:
+        metadata_manager: MetadataManager
+        org_value: Valeur de la cellule (cf. _org_value)
+        org_unit_mapping: Mapping manuel {valeur_excel: code_dhis2}
+
+    Returns:
+        ID de l'organisation ou None
+    """
+    org_key = org_value.lower()
+    org_id = None
+
+    # 1. Vérifier le mapping manuel
+    if org_unit_mapping and org_value in org_unit_mapping:
+        mapped_code = org_unit_mapping[org_value]
+        # Résoudre le code mappé en ID
+        org_id = metadata_manager.org_code_to_id.get(str(mapped_code).lower().strip())
+        if not org_id:
+            logger.warning(f"Code mappé manuellement introuvable dans DHIS2: {mapped_code} (mapping: {org_value} -> {mapped_code})")
+
+    # 2. Si pas de mapping manuel ou mapping échoué, utiliser la logique standard
+    if not org_id:
+        # Essayer d'abord par code (plus fiable), puis par nom
+        org_id = metadata_manager.org_code_to_id.get(org_key) or metadata_manager.org_name_to_id.get(org_key)
+
+    return org_id
+
+
+def _process_count_mode(
+    metadata_manager,
+    df: Optional[pd.DataFrame],
+    org_column: str,
+    category_mapping: Dict[str, str],
+    data_element_mapping: Dict[str, str],
     dataset_id: str,
     period: str,
     data_element_column: Optional[str] = None,
     value_to_de_mapping: Optional[Dict[str, str]] = None,
-    fixed_org_unit: Optional[str] = None
-) -> Tuple[List[Dict], Dict]:
+    fixed_org_unit: Optional[str] = None,
+    filepath: Optional[str] = None,
+    sheet_name: Optional[str] = None
+) -> Tuple[DataValues, Dict]:
     """
     Mode Comptage: Traite un fichier avec enregistrements individuels
     Compte automatiquement les enregistrements par combinaison de catégories
     Supporte le mapping dynamique des Data Elements via une colonne
+
+    Sans DataFrame (df=None), l'onglet filepath/sheet_name (ou le CSV, par
+    blocs) est parcouru en flux et seul l'agrégat (combinaison -> compte)
+    est gardé en mémoire.
     """
     logger.info("Mode Comptage: Agrégation automatique des enregistrements")
+    columns = list(df.columns) if df is not None else read_sheet_columns(filepath, sheet_name)
 
     # Vérifier que les colonnes requises existent
     if fixed_org_unit:
@@ -290,7 +400,7 @@ def _process_count_mode(
     if data_element_column:
         required_cols.append(data_element_column)
         
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = [col for col in required_cols if col not in columns]
     if missing_cols:
         raise ValueError(f"Colonnes manquantes dans le fichier: {', '.join(missing_cols)}")
 
@@ -326,18 +436,30 @@ def _process_count_mode(
     if data_element_column:
         group_columns.append(data_element_column)
 
-    # Nettoyer les données
-    df = df.copy()
-    for col in group_columns:
-        df[col] = df[col].fillna('Non spécifié').astype(str).str.strip()
-
-    # Grouper et compter
-    aggregated = df.groupby(group_columns).size().reset_index(name='COUNT')
+    if df is not None:
+        # Nettoyer les données
+        df = df.copy()
+        for col in group_columns:
+            df[col] = df[col].fillna('Non spécifié').astype(str).str.strip()
+
+        # Grouper et compter
+        aggregated = df.groupby(group_columns).size().reset_index(name='COUNT')
+        record_count = len(df)
+    elif is_csv(filepath):
+        aggregated, record_count = count_csv_combinations(
+            filepath, group_columns,
+            fill_columns=_structural_columns(columns, org_column, category_mapping)
+        )
+    else:
+        aggregated, record_count = count_combinations(
+            filepath, sheet_name, group_columns,
+            fill_columns=_structural_columns(columns, org_column, category_mapping)
+        )
 
-    logger.info(f"Agrégation: {len(df)} enregistrements → {len(aggregated)} combinaisons")
+    logger.info(f"Agrégation: {record_count} enregistrements → {len(aggregated)} combinaisons")
 
     # Générer les dataValues
-    data_values = []
+    data_values = DataValues()
     errors = {
         'org_not_found': 0,
         'de_not_found': 0,
@@ -359,86 +481,71 @@ def _process_count_mode(
         logger.info(f"Utilisation DE fixe: {fixed_de_id} ({de_obj.get('name', 'sans nom')})")
 
     logger.info(f"Début génération des dataValues pour {len(aggregated)} combinaisons...")
-    
-    for idx, row in aggregated.iterrows():
-        # Résoudre le Data Element
-        de_id = fixed_de_id
-        
-        if data_element_column:
-            val = row[data_element_column]
-            # Essayer de trouver le DE correspondant à la valeur
-            # On normalise la clé (minuscule, strip) pour être plus tolérant
-            # Mais le mapping doit être fourni correctement
-            de_id = value_to_de_mapping.get(val)
-            
-            # Si pas trouvé, essayer avec des variantes simples ? 
-            # Pour l'instant on reste strict ou on log
-            if not de_id:
-                errors['mapping_not_found'] += 1
-                logger.warning(f"Combinaison {idx+1}: Pas de mapping pour la valeur '{val}'")
-                continue
-        
-        de = metadata_manager.data_elements_map.get(de_id)
-        if not de:
-            errors['de_not_found'] += 1
-            logger.warning(f"Combinaison {idx+1}: DE {de_id} introuvable dans metadata")
-            continue
 
-        # Résoudre l'organisation
-        if fixed_org_unit:
-            org_id = fixed_org_unit
-        else:
-            org_value = str(row[org_column]).strip()
-            org_key = org_value.lower()
-
-            # Essayer par code puis par nom
-            org_id = metadata_manager.org_code_to_id.get(org_key)
-            if not org_id:
-                org_id = metadata_manager.org_name_to_id.get(org_key)
-
-            if not org_id:
-                errors['org_not_found'] += 1
-                logger.warning(f"Combinaison {idx+1}: Organisation non trouvée: {org_value}")
-                continue
-
-        # Résoudre les category options
-        category_options = {}
-        for cat_id, col_name in category_mapping.items():
-            cat_value = str(row[col_name]).strip()
-            if cat_value and cat_value != 'Non spécifié':
-                cat_value_normalized = _normalize_category_value(cat_value)
-                category_options[cat_id] = cat_value_normalized
-
-        # Résoudre le COC
-        cc_id = de.get('categoryCombo', {}).get('id')
-        coc_id = _resolve_coc(metadata_manager, cc_id, category_options)
+    # Data element de chaque combinaison ('' si pas de mapping)
+    if data_element_column:
+        de_column = aggregated[data_element_column]
+        de_lookup = {value: value_to_de_mapping.get(value) for value in de_column.unique()}
+        de_ids = de_column.map(de_lookup).fillna('').astype(object)
+        unmapped = (de_ids == '').to_numpy()
+        if unmapped.any():
+            logger.warning(f"Pas de mapping pour les valeurs: {sorted(set(de_column[unmapped]))}")
+    else:
+        de_ids = pd.Series(fixed_de_id, index=aggregated.index, dtype=object)
+        unmapped = np.zeros(len(aggregated), dtype=bool)
+    errors['mapping_not_found'] += int(unmapped.sum())
 
+    de_objects = {de_id: metadata_manager.data_elements_map.get(de_id) for de_id in de_ids.unique() if de_id}
+    de_missing = ~unmapped & ~de_ids.map(lambda de_id: bool(de_objects.get(de_id))).to_numpy(dtype=bool)
+    errors['de_not_found'] += int(de_missing.sum())
+    if de_missing.any():
+        logger.warning(f"DE introuvables dans metadata: {sorted(set(de_ids[de_missing]))}")
+
+    # Organisation de chaque combinaison (une résolution par valeur distincte)
+    if fixed_org_unit:
+        org_ids = pd.Series(fixed_org_unit, index=aggregated.index, dtype=object)
+    else:
+        org_labels = aggregated[org_column].astype(str).str.strip()
+        org_lookup = {value: _resolve_org(metadata_manager, value, None) for value in org_labels.unique()}
+        org_ids = org_labels.map(org_lookup).fillna('').astype(object)
+    org_missing = ~unmapped & ~de_missing & (org_ids == '').to_numpy()
+    errors['org_not_found'] += int(org_missing.sum())
+    if org_missing.any():
+        logger.warning(f"Organisations non trouvées: {sorted(set(aggregated[org_column][org_missing].astype(str)))[:20]}")
+
+    # COC de chaque combinaison restante (une résolution par combo et options distinctes)
+    row_keys = _category_keys(aggregated, category_mapping, empty_label=EMPTY_LABEL)
+    positions = np.flatnonzero(~(unmapped | de_missing | org_missing))
+    de_list, org_list = de_ids.tolist(), org_ids.tolist()
+    counts = aggregated['COUNT'].to_numpy()
+    coc_cache = {}
+    valid_des, valid_orgs, valid_cocs, valid_counts = [], [], [], []
+    for row in positions.tolist():
+        de_id = de_list[row]
+        cc_id = de_objects[de_id].get('categoryCombo', {}).get('id')
+        coc_id = _cached_coc(metadata_manager, cc_id, row_keys[row], coc_cache)
         if not coc_id:
             errors['coc_not_found'] += 1
-            logger.warning(f"Combinaison {idx+1}: COC non trouvé pour CC={cc_id}, options={category_options}")
             continue
 
-        # Récupérer le compte
-        count_value = int(row['COUNT'])
-
+        count_value = int(counts[row])
         if count_value == 0:
             errors['empty_value'] += 1
-            logger.debug(f"Combinaison {idx+1}: Valeur = 0, ignorée")
             continue
-        
-        logger.debug(f"✓ Combinaison {idx+1}: DE={de_id}, Org={org_id}, COC={coc_id}, Value={count_value}")
-
-        # Créer le dataValue
-        data_value = {
-            'dataElement': de_id,
-            'period': period,
-            'orgUnit': org_id,
-            'categoryOptionCombo': coc_id,
-            'attributeOptionCombo': default_aoc,
-            'value': str(count_value)
-        }
 
-        data_values.append(data_value)
+        valid_des.append(de_id)
+        valid_orgs.append(org_list[row])
+        valid_cocs.append(coc_id)
+        valid_counts.append(str(count_value))
+
+    data_values.extend(
+        valid_counts,
+        dataElement=valid_des,
+        period=period,
+        orgUnit=valid_orgs,
+        categoryOptionCombo=valid_cocs,
+        attributeOptionCombo=default_aoc
+    )
 
     # Statistiques
     stats = {
@@ -446,7 +553,7 @@ def _process_count_mode(
         'valid_rows': len(data_values),
         'errors': errors,
         'error_rate': round((sum(errors.values()) / len(aggregated)) * 100, 2) if len(aggregated) > 0 else 0,
-        'original_records': len(df),
+        'original_records': record_count,
         'aggregated_combinations': len(aggregated)
     }
 
@@ -458,6 +565,40 @@ def _process_count_mode(
     return data_values, stats
 
 
+def _category_keys(
+    df: pd.DataFrame,
+    category_mapping: Dict[str, str],
+    empty_label: Optional[str] = None
+) -> List[Tuple]:
+    """
+    Clé des category options de chaque ligne: tuple ((category_id, option normalisée), ...)
+
+    Les cellules vides (ou égales à empty_label) sont ignorées; chaque valeur
+    distincte d'une colonne n'est normalisée qu'une fois.
+    """
+    option_columns = []
+    for cat_id, col_name in category_mapping.items():
+        texts = [str(raw).strip() for raw in df[col_name].tolist()]
+        normalized = {
+            text: (cat_id, _normalize_category_value(text))
+            for text in set(texts) if text and text != empty_label
+        }
+        option_columns.append([normalized.get(text) for text in texts])
+    if not option_columns:
+        return [()] * len(df)
+    return [tuple(option for option in options if option is not None) for options in zip(*option_columns)]
+
+
+def _cached_coc(metadata_manager, cc_id: Optional[str], key: Tuple, cache: Dict) -> Optional[str]:
+    """_resolve_coc mémorisé par (category combo, clé d'options)"""
+    cache_key = (cc_id, key)
+    if cache_key not in cache:
+        cache[cache_key] = _resolve_coc(metadata_manager, cc_id, dict(key))
+        if not cache[cache_key]:
+            logger.warning(f"COC non trouvé pour CC={cc_id}, options={dict(key)}")
+    return cache[cache_key]
+
+
 def _resolve_coc(
     metadata_manager,
     cc_id: Optional[str],
@@ -465,7 +606,7 @@ def _resolve_coc(
 ) -> Optional[str]:
     """
     Résout le categoryOptionCombo à partir des category options
-    Utilise le fuzzy matching pour gérer les variantes d'ordre
+    (résolveur compilé du combo, cf. MetadataManager.get_coc_resolver)
 
     Args:
         metadata_manager: MetadataManager
@@ -473,43 +614,9 @@ def _resolve_coc(
         category_options: Dict {category_id: option_value}
 
     Returns:
-        ID du COC ou None
+        ID du COC (défaut si aucune option renseignée) ou None
     """
-    # Si pas de combo ou combo par défaut
-    if not cc_id:
-        return metadata_manager.coc_lookup.get("default")
-
-    cat_combo = metadata_manager.cat_combos.get(cc_id)
-    if not cat_combo or cat_combo.get('name') == 'default':
-        return metadata_manager.coc_lookup.get("default")
-
-    # Construire la clé de lookup
-    options = []
-    for cat in cat_combo.get('categories', []):
-        cat_id = cat['id']
-        if cat_id in category_options:
-            options.append(category_options[cat_id])
-
-    if options:
-        # Construire le nom du COC avec différents séparateurs
-        # Tenter d'abord avec " | " (standard)
-        coc_name = " | ".join(sorted(options))
-        
-        # Utiliser le fuzzy matching
-        coc_id = metadata_manager.get_coc_uid_fuzzy(coc_name)
-        if coc_id:
-            return coc_id
-        
-        # Tenter avec "," comme séparateur alternatif
-        coc_name_alt = ", ".join(sorted(options))
-        coc_id = metadata_manager.get_coc_uid_fuzzy(coc_name_alt)
-        if coc_id:
-            return coc_id
-
-        # Debug: log la clé recherchée
-        logger.debug(f"COC non trouvé pour: '{coc_name}' ou '{coc_name_alt}'")
-
-    return metadata_manager.coc_lookup.get("default")
+    return metadata_manager.get_coc_resolver(cc_id).resolve(category_options)
 
 
 def _normalize_category_value(value: str) -> str:
@@ -580,17 +687,7 @@ def _apply_fill_down(
     Returns:
         DataFrame avec fill down appliqué
     """
-    # Identifier les colonnes structurelles qui nécessitent un fill down
-    structural_cols = []
-    
-    # Ajouter la colonne organisation si elle existe
-    if org_column and org_column in df.columns:
-        structural_cols.append(org_column)
-    
-    # Ajouter les colonnes de catégories
-    for col_name in category_mapping.values():
-        if col_name in df.columns and col_name not in structural_cols:
-            structural_cols.append(col_name)
+    structural_cols = _structural_columns(df.columns, org_column, category_mapping)
     
     # Appliquer le fill down (forward fill) sur les colonnes structurelles
     for col in structural_cols:
@@ -602,6 +699,22 @@ def _apply_fill_down(
     return df
 
 
+def _structural_columns(columns, org_column: str, category_mapping: Dict[str, str]) -> List[str]:
+    """Colonnes structurelles (organisation, catégories) qui nécessitent un fill down"""
+    structural_cols = []
+    
+    # Ajouter la colonne organisation si elle existe
+    if org_column and org_column in columns:
+        structural_cols.append(org_column)
+    
+    # Ajouter les colonnes de catégories
+    for col_name in category_mapping.values():
+        if col_name in columns and col_name not in structural_cols:
+            structural_cols.append(col_name)
+    
+    return structural_cols
+
+
 def _detect_value_columns(
     df: pd.DataFrame,
     org_column: str,
@@ -643,7 +756,7 @@ def _detect_value_columns(
         col_lower = str(col).lower()
         is_value_col = (
             any(keyword in col_lower for keyword in value_keywords) or
-            pd.api.types.is_numeric_dtype(df[col])
+            _is_numeric_column(df[col])
         )
         
         if is_value_col:
@@ -652,3 +765,18 @@ def _detect_value_columns(
     logger.info(f"Colonnes de valeurs détectées: {value_cols}")
     
     return value_cols
+
+
+def _is_numeric_column(column: pd.Series) -> bool:
+    """
+    Colonne de nombres, qu'ils soient typés (Excel) ou en texte (CSV lu en dtype=str)
+
+    Examine les VALUE_DETECTION_SAMPLE premières cellules (hors cellules vides ou blanches).
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        return True
+    sample = column.dropna().head(VALUE_DETECTION_SAMPLE)
+    sample = sample[sample.astype(str).str.strip() != '']
+    if sample.empty:
+        return False
+    return pd.to_numeric(sample, errors='coerce').notna().mean() >= VALUE_DETECTION_MIN_RATIO
@@ -0,0 +1,234 @@
+"""
+Conteneur colonnaire des dataValues
+===================================
+Les traitements produisent des centaines de milliers de dataValues: au lieu
+d'une liste de dicts à 6 clés, DataValues garde une colonne par champ.
+Les identifiants (dataElement, period, orgUnit, categoryOptionCombo,
+attributeOptionCombo) sont internés: chaque colonne est un tableau de codes
+entiers (array('i')) et un vocabulaire des UID distincts. Les valeurs
+restent du texte.
+
+Les dicts ne sont construits qu'aux frontières (aperçus, lots envoyés à
+DHIS2, écriture JSON par blocs): un index ou une tranche de DataValues
+donne un dict ou une liste de dicts, comme une liste de dataValues.
+
+Les payloads sont écrits en JSON compact, bloc par bloc, éventuellement
+compressés en gzip; open_payload/load_payload lisent les deux formats.
+"""
+
+import gzip
+import json
+from array import array
+from itertools import repeat
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+# Champs identifiants d'un dataValue (clé d'unicité DHIS2), dans l'ordre des clés
+FIELDS = ('dataElement', 'period', 'orgUnit', 'categoryOptionCombo', 'attributeOptionCombo')
+
+# Nombre de dataValues sérialisés à la fois par write_payload_json
+JSON_CHUNK_SIZE = 10_000
+
+# JSON compact: ni indentation ni espaces après les séparateurs
+COMPACT_SEPARATORS = (',', ':')
+
+# Payloads compressés: suffixe ajouté au nom .json, en-tête et niveau gzip
+GZIP_SUFFIX = '.gz'
+GZIP_MAGIC = b'\x1f\x8b'
+GZIP_LEVEL = 6
+
+
+class DataValues:
+    """
+    dataValues en colonnes (struct-of-arrays)
+
+    Se manipule comme une liste de dataValues en lecture: len(), itération,
+    index, tranches (dicts construits à la demande) et comparaison.
+    """
+
+    def __init__(self):
+        self._vocab: Dict[str, Dict[str, int]] = {field: {} for field in FIELDS}
+        self._labels: Dict[str, List[str]] = {field: [] for field in FIELDS}
+        self._codes: Dict[str, array] = {field: array('i') for field in FIELDS}
+        self.values: List[str] = []
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'DataValues':
+        """Conteneur construit à partir de dicts dataValue"""
+        data_values = cls()
+        for record in records:
+            data_values.append(record)
+        return data_values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self.values)):
+            yield self._record(index)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict, List[Dict]]:
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self.values)))]
+        if index < 0:
+            index += len(self.values)
+        if not 0 <= index < len(self.values):
+            raise IndexError("Index de dataValue hors limites")
+        return self._record(index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (DataValues, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def _record(self, index: int) -> Dict:
+        record = {field: self._labels[field][self._codes[field][index]] for field in FIELDS}
+        record['value'] = self.values[index]
+        return record
+
+    def _code(self, field: str, label: str) -> int:
+        vocab = self._vocab[field]
+        code = vocab.get(label)
+        if code is None:
+            code = vocab[label] = len(self._labels[field])
+            self._labels[field].append(label)
+        return code
+
+    def append(self, record: Dict):
+        """Ajoute un dataValue (dict)"""
+        for field in FIELDS:
+            self._codes[field].append(self._code(field, record.get(field) or ''))
+        self.values.append(record['value'])
+
+    def extend(self, values: List[str], **columns: Union[str, List[str]]):
+        """
+        Ajoute des dataValues colonne par colonne
+
+        Args:
+            values: Valeurs (texte)
+            **columns: Une liste par champ de FIELDS, ou une valeur commune à toutes les lignes
+        """
+        count = len(values)
+        for field in FIELDS:
+            column = columns[field]
+            if not isinstance(column, list):
+                self._codes[field].extend(repeat(self._code(field, column), count))
+            else:
+                # Un code par libellé distinct, puis correspondance en C (map)
+                codes = {label: self._code(field, label) for label in dict.fromkeys(column)}
+                self._codes[field].extend(map(codes.__getitem__, column))
+        self.values.extend(values)
+
+    def codes(self, field: str) -> array:
+        """Codes d'un champ (indices dans labels(field)), un par dataValue"""
+        return self._codes[field]
+
+    def labels(self, field: str) -> List[str]:
+        """Vocabulaire d'un champ: texte de chaque code"""
+        return self._labels[field]
+
+    def column(self, field: str) -> List[str]:
+        """Texte d'un champ pour chaque dataValue"""
+        labels = self._labels[field]
+        return [labels[code] for code in self._codes[field]]
+
+    def unique(self, field: str) -> List[str]:
+        """Valeurs distinctes d'un champ"""
+        labels = self._labels[field]
+        return [labels[code] for code in sorted(set(self._codes[field]))]
+
+    def keys(self) -> Iterator[Tuple[int, ...]]:
+        """Clé compacte de chaque dataValue: tuple des codes de FIELDS"""
+        return zip(*(self._codes[field] for field in FIELDS))
+
+    def take(self, positions: Sequence[int], values: Optional[Sequence[str]] = None) -> 'DataValues':
+        """
+        Sous-ensemble des dataValues (vocabulaires partagés)
+
+        Args:
+            positions: Positions retenues, dans l'ordre voulu
+            values: Valeurs de remplacement (défaut: valeurs d'origine)
+        """
+        subset = DataValues()
+        for field in FIELDS:
+            subset._vocab[field] = dict(self._vocab[field])
+            subset._labels[field] = list(self._labels[field])
+            codes = self._codes[field]
+            subset._codes[field] = array('i', [codes[pos] for pos in positions])
+        subset.values = list(values) if values is not None else [self.values[pos] for pos in positions]
+        return subset
+
+
+def write_payload_json(payload: Dict, f: TextIO, chunk_size: int = JSON_CHUNK_SIZE):
+    """
+    Écrit un payload {'dataValues': ...} en JSON compact (sans indentation),
+    par blocs: seuls chunk_size dicts existent à la fois, quelle que soit la
+    taille du payload
+
+    Args:
+        payload: Payload DHIS2 (dataValues: DataValues ou liste de dicts)
+        f: Fichier texte ouvert en écriture
+        chunk_size: Nombre de dataValues sérialisés à la fois
+    """
+    data_values = payload['dataValues']
+    f.write('{"dataValues":[')
+    for start in range(0, len(data_values), chunk_size):
+        text = json.dumps(list(data_values[start:start + chunk_size]), ensure_ascii=False, separators=COMPACT_SEPARATORS)
+        if start:
+            f.write(',')
+        f.write(text[1:-1])
+    f.write(']')
+    for key, value in payload.items():
+        if key != 'dataValues':
+            f.write(f',{json.dumps(key, ensure_ascii=False)}:{json.dumps(value, ensure_ascii=False, separators=COMPACT_SEPARATORS)}')
+    f.write('}')
+
+
+def save_payload(payload: Dict, filepath: Union[str, Path], compress: bool = False) -> Path:
+    """
+    Enregistre un payload (write_payload_json), compressé en gzip si demandé
+
+    Args:
+        payload: Payload DHIS2
+        filepath: Chemin du fichier .json (suffixe .gz ajouté si compress)
+        compress: Compression gzip
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    filepath = Path(filepath)
+    if compress:
+        filepath = filepath.with_name(filepath.name + GZIP_SUFFIX)
+        with gzip.open(filepath, 'wt', encoding='utf-8', compresslevel=GZIP_LEVEL) as f:
+            write_payload_json(payload, f)
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            write_payload_json(payload, f)
+    return filepath
+
+
+def is_gzip_file(filepath: Union[str, Path]) -> bool:
+    """Vrai si le fichier commence par l'en-tête gzip"""
+    with open(filepath, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def open_payload(filepath: Union[str, Path], mode: str = 'rt') -> IO:
+    """
+    Ouvre un fichier payload en lecture, compressé ou non (détection par
+    l'en-tête gzip)
+
+    Args:
+        filepath: Chemin du payload
+        mode: 'rt' (texte) ou 'rb' (octets JSON décompressés)
+    """
+    encoding = 'utf-8' if 't' in mode else None
+    if is_gzip_file(filepath):
+        return gzip.open(filepath, mode, encoding=encoding)
+    return open(filepath, mode, encoding=encoding)
+
+
+def load_payload(filepath: Union[str, Path]) -> Dict:
+    """Charge un fichier payload (JSON ou JSON gzip)"""
+    with open_payload(filepath) as f:
+        return json.load(f)
@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 from typing import Dict, Optional, Tuple, Any
 from urllib.parse import urljoin
@@ -11,9 +12,15 @@ class DHIS2Client:
     Supports Basic Auth and Personal Access Token (PAT).
     """
 
-    def __init__(self, url: str, username: Optional[str] = None, password: Optional[str] = None, token: Optional[str] = None):
+    def __init__(self, url: str, username: Optional[str] = None, password: Optional[str] = None, token: Optional[str] = None,
+                 pool_size: int = 10):
         self.url = url.rstrip('/') + '/api/'
         self.session = requests.Session()
+
+        # Connection pool shared by sequential and concurrent requests (batched push, preflight)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         
         if token:
             self.session.headers.update({'Authorization': f'ApiToken {token}'})
@@ -68,11 +75,11 @@ class DHIS2Client:
             'organisationUnitLevels': 'id,name,level',
             'organisationUnitGroups': 'id,name,code,shortName,organisationUnits[id]',
             'organisationUnitGroupSets': 'id,name,code,shortName,organisationUnitGroups[id]',
-            'dataSets': 'id,name,code,periodType,dataSetElements[dataElement[id]],organisationUnits[id]',
+            'dataSets': 'id,name,code,periodType,categoryCombo[id],dataSetElements[dataElement[id],categoryCombo[id]],organisationUnits[id]',
             'dataElements': 'id,name,code,shortName,description,valueType,aggregationType,domainType,zeroIsSignificant,categoryCombo[id,name,categories[id,name,categoryOptions[id,name]]]',
             'dataElementGroups': 'id,name,code,shortName,dataElements[id]',
             'dataElementGroupSets': 'id,name,code,shortName,dataElementGroups[id]',
-            'categoryOptionCombos': 'id,name,code,categoryOptions[id]',
+            'categoryOptionCombos': 'id,name,code,categoryCombo[id],categoryOptions[id]',
             'categories': 'id,name,code,dataDimensionType,categoryOptions[id,name,code]',
             'categoryCombos': 'id,name,code,categories[id]',
             'categoryOptions': 'id,name,code,startDate,endDate'
@@ -107,11 +114,12 @@ class DHIS2Client:
             logger.error(f"Error fetching metadata: {e}")
             return False, {}, str(e)
 
-    def push_data_values(self, payload: Dict) -> Tuple[bool, Dict, Optional[str]]:
+    def push_data_values(self, payload: Dict, dry_run: bool = False) -> Tuple[bool, Dict, Optional[str]]:
         """
         Sends data values to DHIS2.
         Args:
             payload: The data payload (must contain 'dataValues' list)
+            dry_run: Validate the import on the server without saving anything
         Returns:
             (success, response_json, error_message)
         """
@@ -123,15 +131,19 @@ class DHIS2Client:
             # Use dataValueSets endpoint
             url = urljoin(self.url, 'dataValueSets')
             
-            logger.info(f"Pushing {len(payload['dataValues'])} data values to {url}")
+            params = {'dryRun': 'true'} if dry_run else None
+            
+            logger.info(f"Pushing {len(payload['dataValues'])} data values to {url}" + (" (dry run)" if dry_run else ""))
             
-            response = self.session.post(url, json=payload)
+            response = self.session.post(url, json=payload, params=params)
             
             # DHIS2 returns 200 even for partial imports, so we check the response body
             # But 4xx/5xx are definite errors
             if response.status_code >= 400:
                 logger.error(f"DHIS2 push failed: {response.status_code} - {response.text}")
-                return False, {}, f"HTTP {response.status_code}: {response.text}"
+                # DHIS2 >= 2.38 answers 409 with an import summary when values conflict
+                summary = self._parse_import_summary(response)
+                return False, summary, f"HTTP {response.status_code}: {response.text}"
                 
             response_data = response.json()
             
@@ -145,3 +157,16 @@ class DHIS2Client:
         except requests.exceptions.RequestException as e:
             logger.error(f"Error pushing data: {e}")
             return False, {}, str(e)
+
+    @staticmethod
+    def _parse_import_summary(response: requests.Response) -> Dict:
+        """
+        Returns the import summary carried by an error response, or {} if there is none.
+        """
+        try:
+            data = response.json()
+        except ValueError:
+            return {}
+        if isinstance(data, dict) and isinstance(data.get('response'), dict) and 'importCount' in data['response']:
+            return data
+        return {}
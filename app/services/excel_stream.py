@@ -0,0 +1,271 @@
+"""
+Lecture en flux des onglets Excel et des CSV
+============================================
+Parcourt les lignes d'un onglet XLSX (sheet_reader.iter_rows) ou les blocs
+d'un CSV (sheet_reader.iter_csv_chunks) sans charger le fichier en
+DataFrame: la mémoire utilisée dépend du nombre de combinaisons distinctes
+et non du nombre d'enregistrements (exports de plusieurs millions de lignes).
+
+Les cellules sont interprétées comme le fait pd.read_excel (valeurs NA,
+conversion numérique des colonnes, lignes vides) afin que count_combinations
+produise les mêmes libellés et les mêmes comptes que:
+
+    df[cols].ffill() -> fillna('Non spécifié').astype(str).str.strip()
+    -> groupby(cols).size()
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from app.services.sheet_reader import (
+    is_csv, is_streamable, iter_csv_chunks, iter_rows, read_sheet, sheet_row_count
+)
+
+logger = logging.getLogger(__name__)
+
+# Au-delà de ce nombre de lignes, un onglet est lu en flux plutôt qu'en DataFrame
+LARGE_SHEET_ROWS = 100_000
+
+# Libellé des cellules vides après agrégation (mode comptage)
+EMPTY_LABEL = 'Non spécifié'
+
+# Valeurs texte lues comme NA par pandas (na_values par défaut)
+NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null'
+})
+
+# Erreurs Excel (rendues comme texte par openpyxl en values_only, NaN pour pandas)
+EXCEL_ERRORS = frozenset({'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'})
+
+
+def is_large_sheet(filepath: str, sheet_name: Optional[Union[str, int]] = None, book=None) -> bool:
+    """Indique si un onglet dépasse LARGE_SHEET_ROWS lignes"""
+    rows = sheet_row_count(filepath, sheet_name, book)
+    return rows is not None and rows > LARGE_SHEET_ROWS
+
+
+def read_sheet_columns(filepath: str, sheet_name: Optional[Union[str, int]] = None) -> List:
+    """Noms de colonnes tels que pd.read_excel les produit (doublons et en-têtes vides compris)"""
+    return list(read_sheet(filepath, sheet_name=sheet_name if sheet_name is not None else 0, nrows=0).columns)
+
+
+def _is_na(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value in NA_STRINGS or value in EXCEL_ERRORS
+    return isinstance(value, float) and value != value
+
+
+def _to_number(value):
+    """Conversion numérique d'une cellule (None si non numérique)"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and '_' not in value:
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class _ColumnProfile:
+    """Types rencontrés dans une colonne, pour reproduire l'inférence de pandas"""
+
+    __slots__ = ('numeric', 'integer', 'boolean', 'datetime', 'midnight', 'na_raw', 'na_filled', 'first_scalar')
+
+    def __init__(self):
+        self.numeric = True     # Toutes les valeurs convertibles en nombre
+        self.integer = True     # ... et toutes entières
+        self.boolean = True     # Toutes les valeurs sont booléennes
+        self.datetime = True    # Toutes les valeurs sont des dates
+        self.midnight = True    # ... toutes à minuit
+        self.na_raw = False     # Au moins une cellule NA dans le fichier
+        self.na_filled = False  # Au moins une cellule NA après fill down
+        # Colonne objet: pandas garde la première occurrence des valeurs égales (True == 1 == 1.0)
+        self.first_scalar: Dict = {}
+
+    def update(self, raw, filled):
+        if _is_na(raw):
+            self.na_raw = True
+        else:
+            number = _to_number(raw)
+            if number is None:
+                self.numeric = False
+            elif not isinstance(number, int):
+                self.integer = False
+            if not isinstance(raw, bool):
+                self.boolean = False
+            if isinstance(raw, (bool, int, float)):
+                self.first_scalar.setdefault(raw, raw)
+            if isinstance(raw, datetime):
+                if raw.hour or raw.minute or raw.second or raw.microsecond:
+                    self.midnight = False
+            else:
+                self.datetime = False
+        if _is_na(filled):
+            self.na_filled = True
+
+    def render(self, value) -> str:
+        """Libellé de la valeur tel que fillna(EMPTY_LABEL).astype(str).str.strip()"""
+        if _is_na(value):
+            return EMPTY_LABEL
+        if self.datetime:
+            if not self.na_filled and self.midnight:
+                return pd.Timestamp(value).strftime('%Y-%m-%d')
+            return str(pd.Timestamp(value)).strip()
+        if self.boolean and not self.na_raw:
+            return str(value)
+        if self.numeric:
+            number = _to_number(value)
+            if self.integer and not self.na_raw:
+                return str(int(number))
+            return str(float(number))
+        if isinstance(value, (bool, int, float)):
+            value = self.first_scalar.get(value, value)
+        return str(value).strip()
+
+
+def count_combinations(
+    filepath: str,
+    sheet_name: Optional[Union[str, int]],
+    group_columns: Sequence,
+    fill_columns: Sequence = ()
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Compte les enregistrements par combinaison de colonnes, en flux
+
+    Args:
+        filepath: Chemin du fichier XLSX
+        sheet_name: Nom ou index de l'onglet (premier par défaut)
+        group_columns: Colonnes de groupement (noms pandas)
+        fill_columns: Colonnes à compléter par fill down (cellules fusionnées)
+
+    Returns:
+        Tuple (DataFrame group_columns + COUNT trié comme groupby, nombre d'enregistrements)
+    """
+    columns = read_sheet_columns(filepath, sheet_name)
+    positions = [columns.index(col) for col in group_columns]
+    fill_flags = [col in fill_columns for col in group_columns]
+    profiles = [_ColumnProfile() for _ in group_columns]
+
+    counts = Counter()
+    last_values: List = [None] * len(group_columns)
+    pending_blank = 0
+    records = 0
+
+    def commit(raw_values):
+        key = []
+        for i, raw in enumerate(raw_values):
+            value = raw
+            if fill_flags[i]:
+                if _is_na(raw):
+                    value = last_values[i]
+                else:
+                    last_values[i] = raw
+            profiles[i].update(raw, value)
+            key.append(value)
+        counts[tuple(key)] += 1
+
+    blank_values = [None] * len(group_columns)
+    rows = iter_rows(filepath, sheet_name)
+    next(rows, None)  # En-tête
+    for row in rows:
+        if not any(v is not None and v != '' for v in row):
+            # Ligne vide: comptée comme pandas seulement si suivie de données
+            pending_blank += 1
+            continue
+        for _ in range(pending_blank):
+            commit(blank_values)
+        records += pending_blank
+        pending_blank = 0
+
+        commit([row[p] if p < len(row) else None for p in positions])
+        records += 1
+
+    # Rendu des libellés puis regroupement (1 et 1.0 peuvent donner le même libellé)
+    labelled: Dict[Tuple, int] = Counter()
+    for key, count in counts.items():
+        labelled[tuple(profiles[i].render(v) for i, v in enumerate(key))] += count
+
+    aggregated = _aggregated_frame(labelled, group_columns)
+    logger.info(f"Comptage en flux: {records} enregistrements → {len(aggregated)} combinaisons")
+    return aggregated, records
+
+
+def _aggregated_frame(counts: Dict[Tuple, int], group_columns: Sequence) -> pd.DataFrame:
+    """DataFrame group_columns + COUNT trié comme le résultat d'un groupby"""
+    return pd.DataFrame(
+        [list(key) + [count] for key, count in sorted(counts.items())],
+        columns=list(group_columns) + ['COUNT']
+    )
+
+
+def ffill_chunks(chunks: Iterable[pd.DataFrame], columns: Sequence) -> Iterator[pd.DataFrame]:
+    """
+    Applique un fill down continu sur des blocs successifs
+
+    La dernière valeur renseignée de chaque colonne est reportée en tête du
+    bloc suivant, comme si le fichier avait été lu d'un seul tenant.
+    """
+    carry = {}
+    for chunk in chunks:
+        for col in columns:
+            if col not in chunk.columns:
+                continue
+            filled = chunk[col].ffill()
+            if col in carry:
+                filled = filled.fillna(carry[col])
+            last_index = filled.last_valid_index()
+            if last_index is not None:
+                carry[col] = filled.loc[last_index]
+            chunk[col] = filled
+        yield chunk
+
+
+def count_csv_combinations(
+    filepath: str,
+    group_columns: Sequence,
+    fill_columns: Sequence = ()
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Compte les enregistrements d'un CSV par combinaison de colonnes, bloc par bloc
+
+    Chaque bloc est agrégé par groupby puis fusionné dans un agrégat cumulé:
+    seules les combinaisons distinctes restent en mémoire.
+
+    Args:
+        filepath: Chemin du fichier CSV/TSV
+        group_columns: Colonnes de groupement
+        fill_columns: Colonnes à compléter par fill down (d'un bloc à l'autre)
+
+    Returns:
+        Tuple (DataFrame group_columns + COUNT trié comme groupby, nombre d'enregistrements)
+    """
+    group_columns = list(group_columns)
+    counts: Dict[Tuple, int] = Counter()
+    records = 0
+
+    chunks = ffill_chunks(iter_csv_chunks(filepath, usecols=group_columns), fill_columns)
+    for chunk in chunks:
+        records += len(chunk)
+        for col in group_columns:
+            chunk[col] = chunk[col].fillna(EMPTY_LABEL).astype(str).str.strip()
+        sizes = chunk.groupby(group_columns, sort=False).size()
+        for key, count in zip(sizes.index, sizes.to_numpy()):
+            counts[key if isinstance(key, tuple) else (key,)] += int(count)
+
+    aggregated = _aggregated_frame(counts, group_columns)
+    logger.info(f"Comptage CSV par blocs: {records} enregistrements → {len(aggregated)} combinaisons")
+    return aggregated, records
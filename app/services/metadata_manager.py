@@ -9,14 +9,89 @@ Auteur: Amadou Roufai
 
 import json
 import os
+import hashlib
 import logging
 import re
+import unicodedata
+import uuid
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
 
+from app.services.org_unit_index import OrgUnitIndex
+
 logger = logging.getLogger(__name__)
 
+# Synonymes des options de sexe (clés d'alias, cf. _alias_key)
+SEX_SYNONYMS = (
+    {'m', 'h', 'masculin', 'masculins', 'homme', 'hommes', 'male', 'garcon', 'garcons'},
+    {'f', 'feminin', 'feminins', 'femme', 'femmes', 'female', 'fille', 'filles'},
+)
+
+
+def _alias_key(value) -> str:
+    """Clé de comparaison d'une option: minuscules, sans accents ni espaces superflus"""
+    text = unicodedata.normalize('NFD', str(value)).encode('ascii', 'ignore').decode('ascii')
+    return " ".join(text.lower().split())
+
+
+class CocResolver:
+    """
+    Résolution compilée des categoryOptionCombos d'un category combo
+
+    Chaque category du combo a sa table {alias normalisé: option id} (nom,
+    code, shortName, formName et synonymes de sexe); l'ensemble des options
+    trouvées donne le COC. Les résultats sont mémorisés par combinaison de
+    valeurs; le fuzzy matching par nom (get_coc_uid_fuzzy) ne sert plus que
+    de repli.
+    """
+
+    def __init__(self, metadata: 'MetadataManager', categories: List[Tuple[str, Dict[str, str]]],
+                 cocs: Dict[frozenset, str], default: Optional[str] = None):
+        self.metadata = metadata
+        self.categories = categories
+        self.cocs = cocs
+        self.default = default
+        self._cache = {}
+
+    def resolve(self, category_options: Dict[str, str]) -> Optional[str]:
+        """
+        Résout le COC à partir des valeurs d'options
+
+        Args:
+            category_options: Dict {category_id: valeur d'option}
+
+        Returns:
+            ID du COC, le COC par défaut si aucune valeur n'est fournie
+            (ou combo par défaut), None si les valeurs ne correspondent à
+            aucun COC du combo
+        """
+        values = tuple(category_options.get(cat_id) or None for cat_id, _ in self.categories)
+        if values not in self._cache:
+            self._cache[values] = self._resolve(values)
+        return self._cache[values]
+
+    def _resolve(self, values: Tuple) -> Optional[str]:
+        provided = [value for value in values if value is not None]
+        if not provided:
+            return self.default
+
+        option_ids = [
+            aliases.get(_alias_key(value))
+            for (_, aliases), value in zip(self.categories, values) if value is not None
+        ]
+        if None not in option_ids:
+            coc_id = self.cocs.get(frozenset(option_ids))
+            if coc_id:
+                return coc_id
+
+        # Repli: correspondance par nom de COC (ordre-indépendant)
+        for separator in (" | ", ", "):
+            coc_id = self.metadata.get_coc_uid_fuzzy(separator.join(sorted(provided)))
+            if coc_id:
+                return coc_id
+        return None
+
 
 @dataclass
 class MetadataManager:
@@ -49,6 +124,19 @@ class MetadataManager:
     sections_by_dataset: Dict[str, List[Dict]] = field(default_factory=dict)
     de_to_section: Dict[str, str] = field(default_factory=dict)
     
+    # Index inverses, construits au parsing: {id: [{'id', 'name'}, ...]}
+    # (sections: + 'dataSet')
+    de_to_groups: Dict[str, List[Dict]] = field(default_factory=dict)
+    ou_to_groups: Dict[str, List[Dict]] = field(default_factory=dict)
+    de_to_datasets: Dict[str, List[Dict]] = field(default_factory=dict)
+    de_to_sections: Dict[str, List[Dict]] = field(default_factory=dict)
+    
+    # Empreinte du chargement (clé des index conservés par worker)
+    fingerprint: str = ''
+    
+    # Résolveurs de COC par category combo (construits à la demande, non sérialisés)
+    coc_resolvers: Dict[str, CocResolver] = field(default_factory=dict, repr=False, compare=False)
+    
     def load_from_file(self, filepath: str) -> Tuple[bool, List[str], List[str]]:
         """
         Charge les métadonnées depuis un fichier JSON
@@ -111,6 +199,8 @@ class MetadataManager:
         errors = []
         
         try:
+            self.fingerprint = uuid.uuid4().hex
+            
             # Organisations
             for ou in self.raw_data.get('organisationUnits', []):
                 self.org_units_map[ou['id']] = ou
@@ -223,12 +313,43 @@ class MetadataManager:
             for ds_id, secs in self.sections_by_dataset.items():
                 secs.sort(key=lambda x: x.get('sortOrder', 999))
             
+            self._build_reverse_indexes()
+            
             return True, errors
             
         except Exception as e:
             logger.error(f"Erreur lors du parsing: {e}")
             return False, [f"Erreur de parsing: {e}"]
     
+    def _build_reverse_indexes(self):
+        """Index inverses DE → groupes/datasets/sections et UO → groupes"""
+        def ref_id(ref):
+            return ref.get('id') if isinstance(ref, dict) else ref
+        
+        self.de_to_groups, self.ou_to_groups = {}, {}
+        self.de_to_datasets, self.de_to_sections = {}, {}
+        
+        for group_id, group in self.data_element_groups.items():
+            entry = {'id': group_id, 'name': group.get('name', '')}
+            for de_ref in group.get('dataElements', []):
+                self.de_to_groups.setdefault(ref_id(de_ref), []).append(entry)
+        
+        for group_id, group in self.org_unit_groups.items():
+            entry = {'id': group_id, 'name': group.get('name', '')}
+            for ou_ref in group.get('organisationUnits', []):
+                self.ou_to_groups.setdefault(ref_id(ou_ref), []).append(entry)
+        
+        for ds in self.datasets:
+            entry = {'id': ds['id'], 'name': ds.get('name', '')}
+            for dse in ds.get('dataSetElements', []):
+                self.de_to_datasets.setdefault(ref_id(dse.get('dataElement')), []).append(entry)
+        
+        for dataset_id, secs in self.sections_by_dataset.items():
+            for section in secs:
+                entry = {'id': section['id'], 'name': section.get('name', ''), 'dataSet': dataset_id}
+                for de_ref in section.get('dataElements', []):
+                    self.de_to_sections.setdefault(ref_id(de_ref), []).append(entry)
+    
     def get_root_org_units(self) -> List[str]:
         """Retourne les IDs des organisations racines (sans parent)"""
         all_ids = set(self.org_units_map.keys())
@@ -285,6 +406,75 @@ class MetadataManager:
         logger.debug(f"COC non trouvé: '{name}' (variant: '{variant_key}')")
         return None
     
+    def get_org_unit_index(self) -> OrgUnitIndex:
+        """
+        Index des unités d'organisation en bitsets (groupes, niveaux,
+        sous-arbres, assignations aux datasets), partagé par les requêtes
+        du worker tant que l'empreinte des métadonnées ne change pas
+        """
+        return OrgUnitIndex.for_metadata(self)
+    
+    def get_coc_resolver(self, cc_id: Optional[str]) -> CocResolver:
+        """
+        Résolveur de COC d'un category combo (construit une fois par combo)
+        
+        Args:
+            cc_id: ID du category combo (None: combo par défaut)
+            
+        Returns:
+            CocResolver du combo; pour un combo absent ou par défaut, le
+            résolveur retourne toujours le COC par défaut
+        """
+        if cc_id not in self.coc_resolvers:
+            self.coc_resolvers[cc_id] = self._build_coc_resolver(cc_id)
+        return self.coc_resolvers[cc_id]
+    
+    def _build_coc_resolver(self, cc_id: Optional[str]) -> CocResolver:
+        """Tables d'alias des categories du combo et COC par ensemble d'options"""
+        default = self.coc_lookup.get("default")
+        cat_combo = self.cat_combos.get(cc_id) if cc_id else None
+        if not cat_combo or cat_combo.get('name') == 'default':
+            return CocResolver(self, [], {}, default)
+        
+        option_details = {co['id']: co for co in self.raw_data.get('categoryOptions', [])}
+        categories = []
+        combo_options = set()
+        for cat_ref in cat_combo.get('categories', []):
+            cat_id = cat_ref['id'] if isinstance(cat_ref, dict) else cat_ref
+            option_keys = {}
+            for option in self.categories.get(cat_id, {}).get('categoryOptions', []):
+                option_id = option['id'] if isinstance(option, dict) else option
+                details = {**option_details.get(option_id, {}), **(option if isinstance(option, dict) else {})}
+                keys = [_alias_key(details[attr]) for attr in ('name', 'shortName', 'code', 'formName') if details.get(attr)]
+                if option_id in self.cat_opt_map:
+                    keys.append(_alias_key(self.cat_opt_map[option_id]))
+                option_keys[option_id] = keys
+            combo_options.update(option_keys)
+            
+            # Alias propres aux options d'abord, synonymes de sexe ensuite
+            aliases = {}
+            for option_id, keys in option_keys.items():
+                for key in keys:
+                    aliases.setdefault(key, option_id)
+            for option_id, keys in option_keys.items():
+                for synonyms in SEX_SYNONYMS:
+                    if synonyms.intersection(keys):
+                        for key in synonyms:
+                            aliases.setdefault(key, option_id)
+            categories.append((cat_id, aliases))
+        
+        # COC du combo: rattachés au combo, sinon déduits de leurs options
+        cocs = {}
+        for coc in self.raw_data.get('categoryOptionCombos', []):
+            option_ids = frozenset(o['id'] if isinstance(o, dict) else o for o in coc.get('categoryOptions', []))
+            linked = (coc.get('categoryCombo') or {}).get('id')
+            if linked == cc_id:
+                cocs[option_ids] = coc['id']
+            elif linked is None and len(option_ids) == len(categories) and option_ids <= combo_options:
+                cocs.setdefault(option_ids, coc['id'])
+        
+        return CocResolver(self, categories, cocs, default)
+    
     def _normalize_text(self, text: str) -> str:
         """
         Normalise un texte pour le matching
@@ -363,16 +553,18 @@ class MetadataManager:
         }
     
     def get_org_units_by_group(self, group_id: str) -> List[Dict]:
-        """Retourne les UO appartenant à un groupe"""
-        group = self.org_unit_groups.get(group_id)
-        if not group:
+        """Retourne les UO appartenant à un groupe (triées par nom)"""
+        if group_id not in self.org_unit_groups:
             return []
-        ou_ids = {ou['id'] for ou in group.get('organisationUnits', [])}
-        return [self.org_units_map[ou_id] for ou_id in ou_ids if ou_id in self.org_units_map]
+        index = self.get_org_unit_index()
+        return index.page(index.select(group_id=group_id))[0]
 
     def get_org_units_by_level(self, level: int) -> List[Dict]:
-        """Retourne les UO d'un niveau spécifique"""
-        return [ou for ou in self.org_units_map.values() if ou.get('level') == level]
+        """Retourne les UO d'un niveau spécifique (triées par nom)"""
+        index = self.get_org_unit_index()
+        if level not in index.levels:
+            return []
+        return index.page(index.select(level=level))[0]
 
     def get_data_elements_by_group(self, group_id: str) -> List[Dict]:
         """Retourne les éléments de données d'un groupe"""
@@ -411,7 +603,12 @@ class MetadataManager:
             'data_element_group_sets': self.data_element_group_sets,
             'sections': self.sections,
             'sections_by_dataset': self.sections_by_dataset,
-            'de_to_section': self.de_to_section
+            'de_to_section': self.de_to_section,
+            'de_to_groups': self.de_to_groups,
+            'ou_to_groups': self.ou_to_groups,
+            'de_to_datasets': self.de_to_datasets,
+            'de_to_sections': self.de_to_sections,
+            'fingerprint': self.fingerprint
         }
     
     @classmethod
@@ -429,7 +626,23 @@ class MetadataManager:
         for key, value in data.items():
             if hasattr(instance, key):
                 setattr(instance, key, value)
+        # Session antérieure aux index inverses
+        if 'de_to_groups' not in data:
+            instance._build_reverse_indexes()
+        # Session antérieure à l'empreinte: la dériver pour garder l'index d'unités en mémoire
+        if not instance.fingerprint:
+            instance.fingerprint = instance._derive_fingerprint()
         return instance
+
+    def _derive_fingerprint(self) -> str:
+        """Empreinte stable des données dont dépend l'index des unités d'organisation"""
+        content = json.dumps([
+            self.org_units_map,
+            self.org_children_map,
+            {group_id: group.get('organisationUnits', []) for group_id, group in self.org_unit_groups.items()},
+            [[ds.get('id'), ds.get('organisationUnits')] for ds in self.datasets],
+        ], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
     
     def validate_structure(self) -> Tuple[bool, List[str]]:
         """
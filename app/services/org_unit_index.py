@@ -0,0 +1,206 @@
+"""
+Index des unités d'organisation en bitsets
+==========================================
+Les unités d'organisation sont numérotées de façon dense dans l'ordre des
+noms; chaque ensemble (groupe, niveau, assignation à un dataset, sous-arbre)
+est un tableau de bits compacté (np.packbits, un bit par unité).
+
+Une requête combinant plusieurs filtres est un ET bit à bit entre ces
+tableaux; les positions retenues sont déjà triées par nom, ce qui donne la
+pagination sans tri. Les sous-arbres sont des intervalles de la numérotation
+en profondeur (préordre), convertis en bitset à la demande puis mémorisés.
+
+L'index est construit une fois par chargement de métadonnées et conservé par
+worker (clé: empreinte des métadonnées).
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Index conservés en mémoire par worker (empreintes de métadonnées distinctes)
+INDEX_MEMORY_ENTRIES = 4
+
+# Sous-arbres convertis en bitset conservés par index
+SUBTREE_MEMORY_ENTRIES = 256
+
+_indexes: 'OrderedDict[str, OrgUnitIndex]' = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class OrgUnitIndex:
+    """Ensembles d'unités d'organisation en bitsets et requêtes combinées"""
+
+    def __init__(self, org_units_map: Dict[str, Dict], org_children_map: Dict[str, List[str]],
+                 org_unit_groups: Dict[str, Dict], datasets: List[Dict]):
+        self.org_units_map = org_units_map
+
+        # Numérotation dense dans l'ordre des noms
+        self.ids: List[str] = sorted(org_units_map, key=lambda ou_id: (org_units_map[ou_id].get('name') or '', ou_id))
+        self.position: Dict[str, int] = {ou_id: i for i, ou_id in enumerate(self.ids)}
+        self.size = len(self.ids)
+        self._id_index = pd.Index(self.ids)
+
+        levels = np.array([org_units_map[ou_id].get('level') or 0 for ou_id in self.ids], dtype=np.int32)
+        self.levels: Dict[int, np.ndarray] = {
+            int(level): self._pack(levels == level) for level in np.unique(levels) if level
+        }
+        self.groups: Dict[str, np.ndarray] = {
+            group_id: self._from_refs(group.get('organisationUnits', []))
+            for group_id, group in org_unit_groups.items()
+        }
+        self.datasets: Dict[str, np.ndarray] = {
+            ds['id']: self._from_refs(ds['organisationUnits'])
+            for ds in datasets if 'organisationUnits' in ds
+        }
+        self._build_preorder(org_children_map)
+        self._subtrees: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._subtrees_lock = threading.Lock()
+
+    @classmethod
+    def for_metadata(cls, metadata) -> 'OrgUnitIndex':
+        """
+        Index des métadonnées, reconstruit seulement pour une nouvelle empreinte
+
+        Args:
+            metadata: MetadataManager (empreinte vide: index non mémorisé; les
+                sessions sans empreinte en reçoivent une dérivée dans from_dict)
+        """
+        fingerprint = metadata.fingerprint
+        if fingerprint:
+            with _indexes_lock:
+                index = _indexes.get(fingerprint)
+                if index is not None:
+                    _indexes.move_to_end(fingerprint)
+                    return index
+
+        # Construction hors verrou; deux requêtes simultanées peuvent construire le même index
+        index = cls(metadata.org_units_map, metadata.org_children_map, metadata.org_unit_groups, metadata.datasets)
+        if fingerprint:
+            with _indexes_lock:
+                _indexes[fingerprint] = index
+                while len(_indexes) > INDEX_MEMORY_ENTRIES:
+                    _indexes.popitem(last=False)
+        logger.info(f"Index des unités d'organisation construit: {index.size} unités, "
+                    f"{len(index.groups)} groupes, {len(index.datasets)} datasets")
+        return index
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        return np.packbits(mask)
+
+    def _from_refs(self, refs: List) -> np.ndarray:
+        """Bitset d'une liste de références d'unités ({'id': ...} ou chaînes)"""
+        mask = np.zeros(self.size, dtype=bool)
+        positions = self._id_index.get_indexer([ref['id'] if isinstance(ref, dict) else ref for ref in refs])
+        mask[positions[positions >= 0]] = True
+        return self._pack(mask)
+
+    def _build_preorder(self, org_children_map: Dict[str, List[str]]):
+        """Numérotation en profondeur: le sous-arbre d'une unité est [début, fin[ de preorder"""
+        preorder: List[int] = []
+        self._subtree_ranges: Dict[str, Tuple[int, int]] = {}
+        children = {
+            parent: sorted((self.position[c] for c in kids if c in self.position))
+            for parent, kids in org_children_map.items() if parent in self.position
+        }
+        has_parent = np.zeros(self.size, dtype=bool)
+        for kids in children.values():
+            has_parent[kids] = True
+
+        # Parcours itératif (profondeur DHIS2 non bornée a priori)
+        visited = [False] * self.size
+        for root in np.flatnonzero(~has_parent).tolist() + list(range(self.size)):
+            if visited[root]:
+                continue
+            stack = [(root, False)]
+            while stack:
+                position, closing = stack.pop()
+                ou_id = self.ids[position]
+                if closing:
+                    self._subtree_ranges[ou_id] = (self._subtree_ranges[ou_id][0], len(preorder))
+                    continue
+                if visited[position]:
+                    continue
+                visited[position] = True
+                self._subtree_ranges[ou_id] = (len(preorder), len(preorder))
+                preorder.append(position)
+                stack.append((position, True))
+                stack.extend((kid, False) for kid in reversed(children.get(ou_id, [])))
+        self.preorder = np.array(preorder, dtype=np.int64)
+
+    def subtree(self, ou_id: str) -> Optional[np.ndarray]:
+        """Bitset d'une unité et de tous ses descendants (None si inconnue)"""
+        if ou_id not in self._subtree_ranges:
+            return None
+        with self._subtrees_lock:
+            bits = self._subtrees.get(ou_id)
+            if bits is not None:
+                self._subtrees.move_to_end(ou_id)
+                return bits
+
+        start, end = self._subtree_ranges[ou_id]
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.preorder[start:end]] = True
+        bits = self._pack(mask)
+        with self._subtrees_lock:
+            self._subtrees[ou_id] = bits
+            while len(self._subtrees) > SUBTREE_MEMORY_ENTRIES:
+                self._subtrees.popitem(last=False)
+        return bits
+
+    def select(
+        self,
+        group_id: Optional[str] = None,
+        level: Optional[int] = None,
+        parent_id: Optional[str] = None,
+        dataset_id: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Bitset des unités qui vérifient tous les filtres fournis
+
+        Args:
+            group_id: Groupe d'unités d'organisation
+            level: Niveau hiérarchique
+            parent_id: Unité dont on garde le sous-arbre (elle comprise)
+            dataset_id: Dataset auquel les unités sont assignées
+
+        Returns:
+            Bitset compacté (filtre inconnu: ensemble vide)
+        """
+        empty = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        selected = np.full_like(empty, 0xFF)
+        filters = (
+            (group_id, self.groups.get),
+            (level, self.levels.get),
+            (parent_id, self.subtree),
+            (dataset_id, self.datasets.get),
+        )
+        for key, lookup in filters:
+            if key is None or key == '':
+                continue
+            bits = lookup(key)
+            if bits is None:
+                return empty
+            selected = selected & bits
+        return selected
+
+    def positions(self, bits: np.ndarray) -> np.ndarray:
+        """Positions (ordre des noms) des unités d'un bitset"""
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+
+    def page(self, bits: np.ndarray, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """
+        Page d'unités d'un bitset, triées par nom
+
+        Returns:
+            (unités de la page, nombre total d'unités du bitset)
+        """
+        positions = self.positions(bits)
+        end = None if limit is None else offset + limit
+        return [self.org_units_map[self.ids[p]] for p in positions[offset:end].tolist()], len(positions)
@@ -0,0 +1,234 @@
+"""
+Index annexe des payloads
+=========================
+Chaque payload enregistré est accompagné d'un index colonnaire (dossier
+<payload>.idx): codes des champs en tableaux .npy, vocabulaires, valeurs
+(texte UTF-8 + offsets) et, pour orgUnit et dataElement, les positions
+groupées par code (ordre + début de chaque groupe).
+
+Les tableaux sont ouverts en memory-map: un aperçu ne lit que la tranche
+demandée, sans parser le JSON, quelle que soit la taille du payload.
+"""
+
+import json
+import os
+import shutil
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.data_values import DataValues, FIELDS, load_payload
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.idx'
+META_FILENAME = 'meta.json'
+VALUES_BLOB = 'values.bin'
+VALUES_OFFSETS = 'values.offsets.npy'
+
+# Champs filtrables de l'aperçu (positions groupées par code)
+FILTER_FIELDS = ('orgUnit', 'dataElement')
+
+# Nombre de dataValues par bloc lu par iter_chunks
+CHUNK_SIZE = 10_000
+
+# Taille de page par défaut et maximale de l'aperçu
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+
+
+def index_path_for(payload_path: Union[str, Path]) -> Path:
+    """Dossier d'index d'un fichier payload"""
+    payload_path = Path(payload_path)
+    return payload_path.with_name(payload_path.name + INDEX_SUFFIX)
+
+
+def payload_signature_of(payload_path: Union[str, Path]) -> str:
+    """Signature d'un fichier payload (taille + mtime)"""
+    stat = os.stat(payload_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def write_payload_index(payload: Dict, payload_path: Union[str, Path]) -> Path:
+    """
+    Écrit l'index annexe d'un payload déjà enregistré
+
+    Args:
+        payload: Payload DHIS2 (dataValues: DataValues ou liste de dicts)
+        payload_path: Fichier payload correspondant (pour la signature)
+
+    Returns:
+        Dossier d'index
+    """
+    data_values = payload['dataValues']
+    if not isinstance(data_values, DataValues):
+        data_values = DataValues.from_records(data_values)
+
+    index_dir = index_path_for(payload_path)
+    tmp_dir = index_dir.with_name(index_dir.name + f'.tmp{os.getpid()}')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    for field in FIELDS:
+        codes = np.frombuffer(data_values.codes(field), dtype=np.int32)
+        np.save(tmp_dir / f'{field}.npy', codes)
+        if field in FILTER_FIELDS:
+            order = np.argsort(codes, kind='stable').astype(np.int64)
+            counts = np.bincount(codes, minlength=len(data_values.labels(field)))
+            starts = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=starts[1:])
+            np.save(tmp_dir / f'{field}.order.npy', order)
+            np.save(tmp_dir / f'{field}.starts.npy', starts)
+
+    encoded = [str(value).encode('utf-8') for value in data_values.values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+    np.save(tmp_dir / VALUES_OFFSETS, offsets)
+    with open(tmp_dir / VALUES_BLOB, 'wb') as f:
+        f.write(b''.join(encoded))
+
+    meta = {
+        'payload_signature': payload_signature_of(payload_path),
+        'total': len(data_values),
+        'labels': {field: data_values.labels(field) for field in FIELDS},
+        'extra': {key: value for key, value in payload.items() if key != 'dataValues'},
+    }
+    with open(tmp_dir / META_FILENAME, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+    return index_dir
+
+
+class PayloadIndex:
+    """Lecture paginée d'un payload via son index annexe"""
+
+    def __init__(self, index_dir: Path, meta: Dict):
+        self.index_dir = index_dir
+        self.total: int = meta['total']
+        self.labels: Dict[str, List[str]] = meta['labels']
+        self.extra: Dict = meta['extra']
+        self._vocab = {field: {label: code for code, label in enumerate(self.labels[field])} for field in FILTER_FIELDS}
+        self._codes = {field: self._array(f'{field}.npy') for field in FIELDS}
+        self._orders = {field: self._array(f'{field}.order.npy') for field in FILTER_FIELDS}
+        self._starts = {field: self._array(f'{field}.starts.npy') for field in FILTER_FIELDS}
+        self._offsets = self._array(VALUES_OFFSETS)
+
+    def _array(self, filename: str) -> np.ndarray:
+        return np.load(self.index_dir / filename, mmap_mode='r')
+
+    @classmethod
+    def open(cls, payload_path: Union[str, Path]) -> Optional['PayloadIndex']:
+        """
+        Ouvre l'index d'un payload
+
+        Returns:
+            Instance, ou None si l'index est absent, illisible ou périmé
+        """
+        index_dir = index_path_for(payload_path)
+        try:
+            with open(index_dir / META_FILENAME, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('payload_signature') != payload_signature_of(payload_path):
+                return None
+            return cls(index_dir, meta)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Index de payload illisible, ignoré: {e}")
+            return None
+
+    @classmethod
+    def for_payload(cls, payload_path: Union[str, Path]) -> 'PayloadIndex':
+        """Index du payload, construit depuis le fichier s'il manque (payloads antérieurs)"""
+        index = cls.open(payload_path)
+        if index is None:
+            logger.info(f"Construction de l'index du payload {Path(payload_path).name}")
+            write_payload_index(load_payload(payload_path), payload_path)
+            index = cls.open(payload_path)
+        return index
+
+    def _positions(self, filters: Dict[str, str]) -> Optional[np.ndarray]:
+        """Positions (croissantes) des dataValues correspondant aux filtres, None sans filtre"""
+        positions = None
+        for field, label in filters.items():
+            code = self._vocab[field].get(label)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            starts = self._starts[field]
+            group = self._orders[field][starts[code]:starts[code + 1]]
+            positions = group if positions is None else np.intersect1d(positions, group, assume_unique=True)
+        return positions
+
+    def _read_values(self, positions: List[int]) -> List[str]:
+        """Valeurs des positions: une lecture pour une tranche contiguë, sinon une par valeur"""
+        offsets = self._offsets
+        with open(self.index_dir / VALUES_BLOB, 'rb') as f:
+            if positions[-1] - positions[0] + 1 == len(positions):
+                first = int(offsets[positions[0]])
+                f.seek(first)
+                blob = f.read(int(offsets[positions[-1] + 1]) - first)
+                return [blob[offsets[pos] - first:offsets[pos + 1] - first].decode('utf-8') for pos in positions]
+            values = []
+            for pos in positions:
+                f.seek(int(offsets[pos]))
+                values.append(f.read(int(offsets[pos + 1] - offsets[pos])).decode('utf-8'))
+            return values
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Dict[str, List[int]], List[str]]]:
+        """
+        Parcourt tous les dataValues par blocs, en colonnes
+
+        Yields:
+            (codes de chaque champ de FIELDS, valeurs) pour chaque bloc
+        """
+        for start in range(0, self.total, chunk_size):
+            stop = min(start + chunk_size, self.total)
+            codes = {field: self._codes[field][start:stop].tolist() for field in FIELDS}
+            yield codes, self._read_values(list(range(start, stop)))
+
+    def records(self, start: int, stop: int) -> List[Dict]:
+        """dataValues [start, stop[ sous forme de dicts DHIS2 (un lot d'envoi)"""
+        return self._records(list(range(max(0, start), min(stop, self.total))))
+
+    def _records(self, positions: List[int]) -> List[Dict]:
+        if not positions:
+            return []
+        records = []
+        for pos, value in zip(positions, self._read_values(positions)):
+            record = {field: self.labels[field][self._codes[field][pos]] for field in FIELDS}
+            record['value'] = value
+            records.append(record)
+        return records
+
+    def page(
+        self,
+        offset: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+        org_unit: Optional[str] = None,
+        data_element: Optional[str] = None
+    ) -> Tuple[List[Dict], int]:
+        """
+        Tranche de dataValues, filtrée par orgUnit et/ou dataElement
+
+        Args:
+            offset: Position de départ parmi les dataValues retenus
+            limit: Nombre maximum de dataValues
+            org_unit: UID d'unité d'organisation (optionnel)
+            data_element: UID d'élément de données (optionnel)
+
+        Returns:
+            (dataValues de la page, nombre total de dataValues retenus)
+        """
+        filters = {field: label for field, label in (('orgUnit', org_unit), ('dataElement', data_element)) if label}
+        positions = self._positions(filters)
+        if positions is None:
+            matched = self.total
+            selected = list(range(min(offset, matched), min(offset + limit, matched)))
+        else:
+            matched = len(positions)
+            selected = positions[offset:offset + limit].tolist()
+        return self._records(selected), matched
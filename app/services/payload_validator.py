@@ -0,0 +1,295 @@
+"""
+Validation complète d'un payload DHIS2
+======================================
+Vérifie chaque dataValue contre les métadonnées du dataset:
+- dataElement rattaché au dataset
+- categoryOptionCombo valide pour le category combo du dataElement
+- attributeOptionCombo valide pour le combo d'attributs du dataset
+- orgUnit assignée au dataset
+- format de la période conforme au periodType du dataset
+- valeur conforme au valueType du dataElement
+
+Les contrôles portent sur les vocabulaires de DataValues (UID distincts,
+couples distincts, valeurs distinctes par valueType) puis sont projetés sur
+les codes par indexation NumPy: aucun dict n'est construit par dataValue.
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.services.data_values import DataValues, FIELDS
+from app.services.metadata_manager import MetadataManager
+
+logger = logging.getLogger(__name__)
+
+# Format des périodes DHIS2 par periodType
+PERIOD_PATTERNS = {
+    'Daily': r'\d{4}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])',
+    'Weekly': r'\d{4}W([1-9]|[1-4]\d|5[0-3])',
+    'WeeklyWednesday': r'\d{4}WedW([1-9]|[1-4]\d|5[0-3])',
+    'WeeklyThursday': r'\d{4}ThuW([1-9]|[1-4]\d|5[0-3])',
+    'WeeklySaturday': r'\d{4}SatW([1-9]|[1-4]\d|5[0-3])',
+    'WeeklySunday': r'\d{4}SunW([1-9]|[1-4]\d|5[0-3])',
+    'BiWeekly': r'\d{4}BiW([1-9]|1\d|2[0-7])',
+    'Monthly': r'\d{4}(0[1-9]|1[0-2])',
+    'BiMonthly': r'\d{4}0[1-6]B',
+    'Quarterly': r'\d{4}Q[1-4]',
+    'QuarterlyNov': r'\d{4}NovQ[1-4]',
+    'SixMonthly': r'\d{4}S[12]',
+    'SixMonthlyApril': r'\d{4}AprilS[12]',
+    'SixMonthlyNov': r'\d{4}NovS[12]',
+    'Yearly': r'\d{4}',
+    'FinancialApril': r'\d{4}April',
+    'FinancialJuly': r'\d{4}July',
+    'FinancialOct': r'\d{4}Oct',
+    'FinancialNov': r'\d{4}Nov',
+}
+
+NUMBER_PATTERN = r'[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?'
+
+# Format des valeurs par valueType (types absents: texte libre, non contrôlé)
+VALUE_TYPE_PATTERNS = {
+    'NUMBER': NUMBER_PATTERN,
+    'PERCENTAGE': NUMBER_PATTERN,
+    'UNIT_INTERVAL': NUMBER_PATTERN,
+    # Entiers DHIS2: ni signe '+', ni zéros de tête
+    'INTEGER': r'0|-?[1-9]\d*',
+    'INTEGER_POSITIVE': r'[1-9]\d*',
+    'INTEGER_NEGATIVE': r'-[1-9]\d*',
+    'INTEGER_ZERO_OR_POSITIVE': r'0|[1-9]\d*',
+    'BOOLEAN': r'(?i:true|false|1|0)',
+    'TRUE_ONLY': r'(?i:true|1)',
+    'DATE': r'\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])',
+    'LETTER': r'.',
+}
+
+# valueTypes entiers (les valeurs décimales entières '5.0' y sont ramenées à '5')
+INTEGER_VALUE_TYPES = ('INTEGER', 'INTEGER_POSITIVE', 'INTEGER_NEGATIVE', 'INTEGER_ZERO_OR_POSITIVE')
+
+# Bornes des valueTypes numériques bornés
+VALUE_TYPE_RANGES = {
+    'PERCENTAGE': (0, 100),
+    'UNIT_INTERVAL': (0, 1),
+}
+
+# Types d'erreurs, dans l'ordre du rapport
+ERROR_TYPES = {
+    'data_element_not_in_dataset': "Élément de données hors du dataset",
+    'category_option_combo': "categoryOptionCombo invalide pour le category combo de l'élément",
+    'attribute_option_combo': "attributeOptionCombo invalide pour le combo d'attributs du dataset",
+    'org_unit_not_assigned': "Unité d'organisation non assignée au dataset",
+    'period': "Format de période non conforme au periodType du dataset",
+    'value_type': "Valeur non conforme au valueType de l'élément",
+}
+
+# Nombre d'UID fautifs et d'exemples conservés par type d'erreur
+MAX_ERROR_KEYS = 20
+MAX_ERROR_SAMPLES = 10
+
+
+def _ref_id(ref) -> Optional[str]:
+    """ID d'une référence DHIS2 ({'id': ...} ou chaîne)"""
+    return ref.get('id') if isinstance(ref, dict) else ref
+
+
+class PayloadValidator:
+    """
+    Validateur des dataValues d'un dataset
+
+    Les ensembles de référence (éléments, combos, unités assignées, format
+    de période) sont calculés une fois à la construction.
+    """
+
+    def __init__(self, metadata: MetadataManager, dataset: Optional[Dict]):
+        """
+        Args:
+            metadata: Métadonnées DHIS2
+            dataset: Dataset de référence (None: contrôles propres au dataset ignorés)
+        """
+        self.metadata = metadata
+        self.dataset = dataset
+        self.default_coc = metadata.coc_lookup.get('default')
+
+        # Éléments du dataset et category combo effectif (surcharge du dataSetElement)
+        self.dataset_des: Dict[str, Optional[str]] = {}
+        self.org_units: Optional[set] = None
+        self.period_pattern: Optional[re.Pattern] = None
+        self.valid_aocs: Optional[set] = None
+        if dataset:
+            for dse in dataset.get('dataSetElements', []):
+                de_id = _ref_id(dse.get('dataElement'))
+                if de_id:
+                    self.dataset_des[de_id] = _ref_id(dse.get('categoryCombo'))
+            if 'organisationUnits' in dataset:
+                self.org_units = {_ref_id(ou) for ou in dataset['organisationUnits']}
+            pattern = PERIOD_PATTERNS.get(dataset.get('periodType'))
+            if pattern:
+                self.period_pattern = re.compile(pattern)
+            self.valid_aocs = self._valid_cocs(_ref_id(dataset.get('categoryCombo')))
+
+        self._valid_cocs_by_combo: Dict[Optional[str], Optional[set]] = {}
+
+    @classmethod
+    def for_payload(cls, metadata: MetadataManager, data_values: DataValues,
+                    dataset_id: Optional[str] = None) -> 'PayloadValidator':
+        """
+        Validateur du dataset indiqué, sinon du dataset qui contient le plus
+        d'éléments de données du payload
+        """
+        dataset = next((ds for ds in metadata.datasets if ds['id'] == dataset_id), None) if dataset_id else None
+        if dataset is None and metadata.datasets:
+            payload_des = set(data_values.unique('dataElement'))
+            best = max(metadata.datasets, key=lambda ds: len(payload_des & {
+                _ref_id(dse.get('dataElement')) for dse in ds.get('dataSetElements', [])
+            }))
+            if any(_ref_id(dse.get('dataElement')) in payload_des for dse in best.get('dataSetElements', [])):
+                dataset = best
+        return cls(metadata, dataset)
+
+    def _valid_cocs(self, cc_id: Optional[str]) -> Optional[set]:
+        """
+        COC acceptés pour un category combo ('' = COC omis, vaut le défaut)
+
+        Returns:
+            Ensemble d'UID, None si le combo est inconnu des métadonnées ou
+            si ses COC n'ont pas pu être résolus (contrôle des COC ignoré)
+        """
+        if cc_id and cc_id not in self.metadata.cat_combos:
+            return None
+        resolver = self.metadata.get_coc_resolver(cc_id)
+        if not resolver.categories:
+            return {'', self.default_coc}
+        return set(resolver.cocs.values()) or None
+
+    def _de_combo(self, de_id: str) -> Optional[str]:
+        """Category combo effectif d'un élément de données"""
+        override = self.dataset_des.get(de_id)
+        if override:
+            return override
+        return _ref_id(self.metadata.data_elements_map.get(de_id, {}).get('categoryCombo'))
+
+    def validate(self, data_values: Union[DataValues, List[Dict]]) -> Dict:
+        """
+        Contrôle tous les dataValues
+
+        Args:
+            data_values: DataValues ou liste de dicts
+
+        Returns:
+            Rapport: nombre de dataValues contrôlés et en erreur, et par type
+            d'erreur le nombre, les UID fautifs les plus fréquents et des exemples
+        """
+        if not isinstance(data_values, DataValues):
+            data_values = DataValues.from_records(data_values)
+
+        codes = {field: np.frombuffer(data_values.codes(field), dtype=np.int32) for field in FIELDS}
+        labels = {field: data_values.labels(field) for field in FIELDS}
+        masks = {}
+
+        if self.dataset is not None:
+            outside = np.array([de_id not in self.dataset_des for de_id in labels['dataElement']], dtype=bool)
+            masks['data_element_not_in_dataset'] = outside[codes['dataElement']]
+
+        masks['category_option_combo'] = self._check_cocs(codes, labels)
+
+        if self.valid_aocs is not None:
+            invalid = np.array([aoc not in self.valid_aocs for aoc in labels['attributeOptionCombo']], dtype=bool)
+            masks['attribute_option_combo'] = invalid[codes['attributeOptionCombo']]
+
+        if self.org_units is not None:
+            invalid = np.array([ou not in self.org_units for ou in labels['orgUnit']], dtype=bool)
+            masks['org_unit_not_assigned'] = invalid[codes['orgUnit']]
+
+        if self.period_pattern is not None:
+            invalid = np.array([not self.period_pattern.fullmatch(pe) for pe in labels['period']], dtype=bool)
+            masks['period'] = invalid[codes['period']]
+
+        masks['value_type'] = self._check_values(codes, labels, data_values.values)
+
+        return self._report(data_values, codes, masks)
+
+    def _check_cocs(self, codes: Dict[str, np.ndarray], labels: Dict[str, List[str]]) -> np.ndarray:
+        """(dataElement, categoryOptionCombo) contrôlé une fois par couple distinct"""
+        pairs = codes['dataElement'].astype(np.int64) * max(len(labels['categoryOptionCombo']), 1) + codes['categoryOptionCombo']
+        unique_pairs, inverse = np.unique(pairs, return_inverse=True)
+        invalid = np.zeros(len(unique_pairs), dtype=bool)
+        coc_count = max(len(labels['categoryOptionCombo']), 1)
+        for i, pair in enumerate(unique_pairs.tolist()):
+            de_id = labels['dataElement'][pair // coc_count]
+            if de_id not in self.metadata.data_elements_map:
+                continue
+            cc_id = self._de_combo(de_id)
+            if cc_id not in self._valid_cocs_by_combo:
+                self._valid_cocs_by_combo[cc_id] = self._valid_cocs(cc_id)
+            valid = self._valid_cocs_by_combo[cc_id]
+            invalid[i] = valid is not None and labels['categoryOptionCombo'][pair % coc_count] not in valid
+        return invalid[inverse.reshape(-1)]
+
+    def _check_values(self, codes: Dict[str, np.ndarray], labels: Dict[str, List[str]], values: List[str]) -> np.ndarray:
+        """Valeurs contrôlées une fois par valeur distincte et par valueType"""
+        invalid_rows = np.zeros(len(values), dtype=bool)
+        value_types = [self.metadata.data_elements_map.get(de_id, {}).get('valueType') for de_id in labels['dataElement']]
+        checked_types = sorted({vt for vt in value_types if vt in VALUE_TYPE_PATTERNS})
+        if not checked_types or not values:
+            return invalid_rows
+
+        value_codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        type_codes = np.array([checked_types.index(vt) if vt in checked_types else -1 for vt in value_types], dtype=np.int64)
+        row_types = type_codes[codes['dataElement']]
+        for type_index, value_type in enumerate(checked_types):
+            rows = row_types == type_index
+            distinct = np.unique(value_codes[rows])
+            candidates = pd.Series(uniques[distinct], dtype=object).astype(str).str.strip()
+            ok = candidates.str.fullmatch(VALUE_TYPE_PATTERNS[value_type]).fillna(False).to_numpy(dtype=bool)
+            if value_type in VALUE_TYPE_RANGES:
+                low, high = VALUE_TYPE_RANGES[value_type]
+                numbers = pd.to_numeric(candidates.where(ok), errors='coerce')
+                ok = ok & ((numbers >= low) & (numbers <= high)).to_numpy(dtype=bool)
+            # Valeur vide: suppression côté DHIS2, acceptée
+            ok = ok | (candidates == '').to_numpy(dtype=bool)
+            invalid_values = np.zeros(len(uniques), dtype=bool)
+            invalid_values[distinct[~ok]] = True
+            invalid_rows |= rows & invalid_values[value_codes]
+        return invalid_rows
+
+    def _report(self, data_values: DataValues, codes: Dict[str, np.ndarray], masks: Dict[str, np.ndarray]) -> Dict:
+        key_fields = {
+            'data_element_not_in_dataset': 'dataElement',
+            'category_option_combo': 'categoryOptionCombo',
+            'attribute_option_combo': 'attributeOptionCombo',
+            'org_unit_not_assigned': 'orgUnit',
+            'period': 'period',
+            'value_type': 'dataElement',
+        }
+        any_error = np.zeros(len(data_values), dtype=bool)
+        errors = []
+        for error_type, message in ERROR_TYPES.items():
+            mask = masks.get(error_type)
+            if mask is None or not mask.any():
+                continue
+            any_error |= mask
+            positions = np.flatnonzero(mask)
+            field = key_fields[error_type]
+            key_codes, counts = np.unique(codes[field][positions], return_counts=True)
+            top = np.argsort(-counts, kind='stable')[:MAX_ERROR_KEYS]
+            field_labels = data_values.labels(field)
+            errors.append({
+                'type': error_type,
+                'message': message,
+                'count': int(len(positions)),
+                'field': field,
+                'keys': {field_labels[key_codes[i]]: int(counts[i]) for i in top},
+                'samples': [data_values[int(pos)] for pos in positions[:MAX_ERROR_SAMPLES]],
+            })
+
+        return {
+            'dataset': self.dataset['id'] if self.dataset else None,
+            'checked': len(data_values),
+            'invalid_values': int(any_error.sum()),
+            'valid': not errors,
+            'errors': errors,
+        }
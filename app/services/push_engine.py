@@ -0,0 +1,429 @@
+"""
+Moteur d'envoi des dataValues vers DHIS2
+========================================
+Découpe le payload en lots et enregistre un checkpoint dans le dossier de
+session après chaque lot accusé par DHIS2, pour pouvoir reprendre un envoi
+interrompu sans renvoyer les lots déjà importés.
+"""
+
+import json
+import os
+import uuid
+import logging
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple, Optional, Union
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from pathlib import Path
+
+from app.services.dhis2_client import DHIS2Client
+from app.services.payload_index import PayloadIndex
+from app.services.push_throttle import PushThrottle
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PREFLIGHT_WORKERS = 4
+CHECKPOINT_FILENAME = 'push_checkpoint.json'
+
+# Nombre maximum de conflits conservés par lot dans le checkpoint
+MAX_CONFLICTS_PER_BATCH = 50
+
+# Nombre d'exemples conservés par type de conflit dans le rapport de preflight
+MAX_CONFLICT_SAMPLES = 10
+
+# Types de conflits: (type, codes d'erreur DHIS2 >= 2.38, mots-clés des messages)
+CONFLICT_TYPES = [
+    ('org_unit', {'E7603', 'E7612', 'E7617'}, ('organisation unit', 'org unit', 'orgunit')),
+    ('data_element_not_in_dataset', {'E7633', 'E7634'}, ('not part of data set', 'does not belong to data set', 'not in data set')),
+    ('data_element', {'E7610'}, ('data element',)),
+    ('category_option_combo', {'E7613', 'E7614', 'E7615', 'E7616'}, ('category option combo', 'option combo')),
+    ('period_locked', {'E7640', 'E7641', 'E7643', 'E7644', 'E7645', 'E7646'}, ('locked', 'expir', 'not open', 'approved', 'input period')),
+    ('period', {'E7611'}, ('period',)),
+    ('value', {'E7618', 'E7619', 'E7621'}, ('value',)),
+]
+
+
+class PayloadBatches:
+    """
+    Lots de taille fixe d'un payload, construits à la demande
+
+    La source est une liste de dataValues, un DataValues ou l'index annexe du
+    payload (PayloadIndex): seul le lot demandé est converti en dicts, le
+    payload complet n'est jamais matérialisé.
+    """
+
+    def __init__(self, source: Union[List[Dict], PayloadIndex], batch_size: int):
+        self.source = source
+        self.batch_size = max(1, int(batch_size))
+        total = source.total if isinstance(source, PayloadIndex) else len(source)
+        self.bounds = [(start, min(start + self.batch_size, total)) for start in range(0, total, self.batch_size)]
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def __getitem__(self, index: int) -> List[Dict]:
+        start, stop = self.bounds[index]
+        if isinstance(self.source, PayloadIndex):
+            return self.source.records(start, stop)
+        return self.source[start:stop]
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
+def payload_batches(payload: Union[Dict, PayloadIndex], batch_size: int) -> PayloadBatches:
+    """
+    Découpe un payload en lots de taille fixe
+
+    Args:
+        payload: Payload DHIS2 ({'dataValues': liste ou DataValues}) ou son PayloadIndex
+        batch_size: Nombre de valeurs par lot
+
+    Returns:
+        PayloadBatches (lots construits à la demande)
+    """
+    if isinstance(payload, PayloadIndex):
+        return PayloadBatches(payload, batch_size)
+    return PayloadBatches(payload.get('dataValues', []), batch_size)
+
+
+def extract_import_summary(response: Dict) -> Dict:
+    """
+    Extrait le résumé d'import d'une réponse dataValueSets
+
+    DHIS2 >= 2.38 encapsule le résumé dans 'response', les versions
+    antérieures le renvoient à la racine.
+
+    Args:
+        response: Réponse JSON de DHIS2
+
+    Returns:
+        Dict {status, importCount, conflicts}
+    """
+    summary = response.get('response', response) if isinstance(response, dict) else {}
+    import_count = summary.get('importCount', {}) or {}
+    return {
+        'status': summary.get('status') or response.get('status'),
+        'importCount': {
+            key: int(import_count.get(key, 0) or 0)
+            for key in ('imported', 'updated', 'ignored', 'deleted')
+        },
+        'conflicts': (summary.get('conflicts') or [])[:MAX_CONFLICTS_PER_BATCH]
+    }
+
+
+def classify_conflict(conflict: Dict) -> str:
+    """
+    Classe un conflit d'import DHIS2 par type (org unit inconnue, DE hors dataset, période verrouillée...)
+
+    Args:
+        conflict: Conflit DHIS2 ({object, value} ou {errorCode, value, objects})
+
+    Returns:
+        Type de conflit ('other' si non reconnu)
+    """
+    code = conflict.get('errorCode')
+    text = f"{conflict.get('object', '')} {conflict.get('value', '')}".lower()
+    if code:
+        for conflict_type, codes, _ in CONFLICT_TYPES:
+            if code in codes:
+                return conflict_type
+    for conflict_type, _, keywords in CONFLICT_TYPES:
+        if any(keyword in text for keyword in keywords):
+            return conflict_type
+    return 'other'
+
+
+@dataclass
+class PushCheckpoint:
+    """
+    Checkpoint d'un envoi par lots, persisté en JSON dans le dossier de session
+
+    Un checkpoint n'est valable que pour le payload qui l'a produit
+    (même fichier, même taille, même date de modification) et la même
+    taille de lot.
+    """
+    path: str
+    payload_file: str = ''
+    payload_signature: str = ''
+    batch_size: int = DEFAULT_BATCH_SIZE
+    total_batches: int = 0
+    batches: Dict[str, Dict] = field(default_factory=dict)  # {index: résumé d'import}
+    updated_at: str = ''
+
+    @staticmethod
+    def payload_signature_of(payload_file: str) -> str:
+        """Signature d'un fichier payload (taille + mtime)"""
+        stat = os.stat(payload_file)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    @classmethod
+    def for_payload(cls, session_dir: Path, payload_file: str, batch_size: int, total_batches: int) -> 'PushCheckpoint':
+        """Crée un checkpoint vierge pour un payload"""
+        return cls(
+            path=str(Path(session_dir) / CHECKPOINT_FILENAME),
+            payload_file=str(payload_file),
+            payload_signature=cls.payload_signature_of(payload_file),
+            batch_size=batch_size,
+            total_batches=total_batches
+        )
+
+    @classmethod
+    def load(cls, session_dir: Path) -> Optional['PushCheckpoint']:
+        """
+        Charge le checkpoint du dossier de session
+
+        Returns:
+            Instance ou None si absent/illisible
+        """
+        path = Path(session_dir) / CHECKPOINT_FILENAME
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data['path'] = str(path)
+            return cls(**data)
+        except Exception as e:
+            logger.warning(f"Checkpoint illisible, ignoré: {e}")
+            return None
+
+    def matches(self, payload_file: str, batch_size: int) -> bool:
+        """Vérifie que le checkpoint correspond au payload et à la taille de lot"""
+        try:
+            return (
+                self.payload_file == str(payload_file)
+                and self.payload_signature == self.payload_signature_of(payload_file)
+                and self.batch_size == batch_size
+            )
+        except OSError:
+            return False
+
+    def is_done(self, index: int) -> bool:
+        return str(index) in self.batches
+
+    def mark_done(self, index: int, summary: Dict):
+        """Enregistre un lot accusé par DHIS2 et persiste le checkpoint"""
+        self.batches[str(index)] = summary
+        self.save()
+
+    @property
+    def done_count(self) -> int:
+        return len(self.batches)
+
+    @property
+    def complete(self) -> bool:
+        return self.total_batches > 0 and self.done_count >= self.total_batches
+
+    def save(self):
+        """Écrit le checkpoint de manière atomique"""
+        self.updated_at = datetime.now().isoformat()
+        data = asdict(self)
+        data.pop('path')
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        """Supprime le fichier de checkpoint"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def aggregate(self) -> Dict:
+        """
+        Agrège les résumés d'import des lots accusés
+
+        Returns:
+            Dict au format d'un résumé d'import DHIS2 (status, importCount, conflicts)
+        """
+        import_count = {'imported': 0, 'updated': 0, 'ignored': 0, 'deleted': 0}
+        conflicts = []
+        status = 'SUCCESS'
+        for summary in self.batches.values():
+            for key in import_count:
+                import_count[key] += summary.get('importCount', {}).get(key, 0)
+            conflicts.extend(summary.get('conflicts', []))
+            if summary.get('status') == 'ERROR':
+                status = 'ERROR'
+            elif summary.get('status') == 'WARNING' and status != 'ERROR':
+                status = 'WARNING'
+        return {
+            'status': status,
+            'importCount': import_count,
+            'conflicts': conflicts[:MAX_CONFLICTS_PER_BATCH],
+            'batches_total': self.total_batches,
+            'batches_done': self.done_count
+        }
+
+
+class PushEngine:
+    """
+    Envoi d'un payload DHIS2 par lots avec reprise sur checkpoint
+
+    Un lot est considéré comme accusé dès que DHIS2 a renvoyé un résumé
+    d'import (même en statut ERROR): le renvoyer produirait le même résultat.
+    Une erreur réseau ou HTTP sans résumé interrompt l'envoi; les lots
+    restants seront envoyés par une reprise.
+    """
+
+    def __init__(
+        self,
+        client: DHIS2Client,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        throttle: Optional[PushThrottle] = None,
+        ticket: Optional[str] = None
+    ):
+        """
+        Args:
+            client: Client DHIS2 authentifié (sa session HTTP est réutilisée pour tous les lots)
+            batch_size: Nombre de dataValues par requête
+            throttle: Limiteur partagé par instance DHIS2 (optionnel)
+            ticket: Identifiant de l'envoi dans la file du limiteur
+        """
+        self.client = client
+        self.batch_size = max(1, int(batch_size))
+        self.throttle = throttle
+        self.ticket = ticket or uuid.uuid4().hex
+
+    def _slot(self, slots: int = 1):
+        """Créneau(x) d'import auprès du limiteur (no-op sans limiteur)"""
+        if self.throttle is None:
+            return nullcontext()
+        return self.throttle.slot(self.client.url, self.ticket, slots)
+
+    def _consume(self, count: int):
+        """Consomme des jetons de débit avant l'envoi d'un lot"""
+        if self.throttle is not None:
+            self.throttle.consume(self.client.url, self.ticket, count)
+
+    def push(
+        self,
+        payload: Union[Dict, PayloadIndex],
+        session_dir: Path,
+        payload_file: str,
+        resume: bool = False
+    ) -> Tuple[bool, Dict, Optional[str]]:
+        """
+        Envoie le payload lot par lot en mettant à jour le checkpoint
+
+        Args:
+            payload: Payload DHIS2 ({'dataValues': [...]}) ou son PayloadIndex
+            session_dir: Dossier de session (emplacement du checkpoint)
+            payload_file: Fichier du payload (sert à valider le checkpoint)
+            resume: Reprendre depuis le checkpoint existant s'il correspond
+
+        Returns:
+            Tuple (succès, résumé agrégé, message d'erreur)
+        """
+        if not isinstance(payload, PayloadIndex) and 'dataValues' not in payload:
+            return False, {}, "Payload must contain 'dataValues'"
+
+        batches = payload_batches(payload, self.batch_size)
+
+        checkpoint = PushCheckpoint.load(session_dir) if resume else None
+        if checkpoint and not checkpoint.matches(payload_file, self.batch_size):
+            logger.info("Checkpoint obsolète (payload modifié), envoi complet")
+            checkpoint = None
+        if checkpoint is None:
+            checkpoint = PushCheckpoint.for_payload(session_dir, payload_file, self.batch_size, len(batches))
+            checkpoint.save()
+        else:
+            logger.info(f"Reprise de l'envoi: {checkpoint.done_count}/{checkpoint.total_batches} lots déjà accusés")
+
+        with self._slot():
+            for index in range(len(batches)):
+                if checkpoint.is_done(index):
+                    continue
+
+                batch = batches[index]
+                self._consume(len(batch))
+                logger.info(f"Envoi lot {index + 1}/{len(batches)} ({len(batch)} valeurs)")
+                success, response, error = self.client.push_data_values({'dataValues': batch})
+
+                if not response:
+                    # Pas de résumé d'import: le lot n'a pas été accusé
+                    logger.error(f"Lot {index + 1}/{len(batches)} non accusé: {error}")
+                    summary = checkpoint.aggregate()
+                    summary['resumable'] = True
+                    return False, summary, error
+
+                checkpoint.mark_done(index, extract_import_summary(response))
+
+        summary = checkpoint.aggregate()
+        summary['resumable'] = False
+        if summary['status'] == 'ERROR':
+            return False, summary, "Import returned ERROR status"
+        return True, summary, None
+
+    def preflight(self, payload: Union[Dict, PayloadIndex], workers: int = DEFAULT_PREFLIGHT_WORKERS) -> Dict:
+        """
+        Envoie le payload en dryRun, lot par lot sur plusieurs connexions,
+        et regroupe les conflits par type sans rien importer
+
+        Utilise le même découpage en lots et la même session HTTP que push();
+        chaque lot n'est construit qu'au moment de son envoi.
+
+        Args:
+            payload: Payload DHIS2 ({'dataValues': [...]}) ou son PayloadIndex
+            workers: Nombre de requêtes simultanées
+
+        Returns:
+            Rapport {ok, batches_total, batches_checked, failed_batches, importCount, conflicts_by_type}
+        """
+        batches = payload_batches(payload, self.batch_size)
+        import_count = {'imported': 0, 'updated': 0, 'ignored': 0, 'deleted': 0}
+        conflicts_by_type: Dict[str, Dict] = {}
+        failed_batches = []
+
+        def check(index: int):
+            batch = batches[index]
+            self._consume(len(batch))
+            return index, self.client.push_data_values({'dataValues': batch}, dry_run=True)
+
+        # Chaque connexion simultanée compte comme un import pour le limiteur
+        workers = max(1, int(workers))
+        if self.throttle is not None:
+            workers = min(workers, self.throttle.max_concurrent)
+
+        logger.info(f"Preflight: {len(batches)} lots, {workers} connexions")
+        with self._slot(workers), ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(check, index) for index in range(len(batches))]
+            for future in as_completed(futures):
+                index, (success, response, error) = future.result()
+                if not response:
+                    failed_batches.append({'batch': index + 1, 'error': error})
+                    continue
+
+                summary = response.get('response', response)
+                for key in import_count:
+                    import_count[key] += int((summary.get('importCount') or {}).get(key, 0) or 0)
+
+                for conflict in summary.get('conflicts') or []:
+                    group = conflicts_by_type.setdefault(
+                        classify_conflict(conflict), {'count': 0, 'samples': []}
+                    )
+                    group['count'] += 1
+                    if len(group['samples']) < MAX_CONFLICT_SAMPLES:
+                        group['samples'].append({
+                            'object': conflict.get('object') or ', '.join(conflict.get('objects', {}).values()),
+                            'value': conflict.get('value'),
+                            'errorCode': conflict.get('errorCode')
+                        })
+
+        failed_batches.sort(key=lambda b: b['batch'])
+        report = {
+            'ok': not conflicts_by_type and not failed_batches,
+            'batches_total': len(batches),
+            'batches_checked': len(batches) - len(failed_batches),
+            'failed_batches': failed_batches,
+            'importCount': import_count,
+            'conflicts_by_type': conflicts_by_type,
+            'conflicts_total': sum(group['count'] for group in conflicts_by_type.values())
+        }
+        logger.info(f"Preflight terminé: {report['conflicts_total']} conflits, {len(failed_batches)} lots en échec")
+        return report
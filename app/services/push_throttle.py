@@ -0,0 +1,257 @@
+"""
+Limitation des envois vers DHIS2
+================================
+File d'attente et seau à jetons partagés par tous les workers (SQLite),
+par instance DHIS2:
+- nombre maximum d'imports simultanés
+- débit maximum en dataValues par seconde
+- file d'attente FIFO avec position consultable par l'interface
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de scrutation de la file d'attente (secondes)
+POLL_INTERVAL = 0.5
+
+
+class PushQueueTimeout(Exception):
+    """Levée quand un envoi attend trop longtemps son tour dans la file"""
+
+
+class PushTicketInUse(Exception):
+    """Levée quand le ticket d'un envoi est déjà présent dans la file (ticket réutilisé)"""
+
+
+class PushThrottle:
+    """
+    Limiteur inter-processus des envois DHIS2, indexé par URL d'instance
+
+    L'état est stocké dans une base SQLite partagée: chaque envoi prend un
+    ticket dans la file, attend d'être en tête et qu'un créneau soit libre,
+    puis consomme des jetons (un par dataValue) avant chaque lot.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_concurrent: int = 2,
+        values_per_second: float = 0,
+        queue_timeout: float = 600,
+        stale_after: float = 300
+    ):
+        """
+        Args:
+            db_path: Fichier SQLite partagé entre les workers
+            max_concurrent: Imports simultanés autorisés par instance DHIS2
+            values_per_second: Débit maximum en dataValues/s par instance (0 = illimité)
+            queue_timeout: Attente maximale dans la file (secondes)
+            stale_after: Délai sans activité après lequel un ticket est considéré abandonné
+        """
+        self.db_path = db_path
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.values_per_second = float(values_per_second or 0)
+        self.queue_timeout = queue_timeout
+        self.stale_after = stale_after
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS push_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    ticket TEXT NOT NULL UNIQUE,
+                    status TEXT NOT NULL,
+                    heartbeat REAL NOT NULL,
+                    slots INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            # Bases créées avant la colonne slots
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(push_queue)')}
+            if 'slots' not in columns:
+                conn.execute('ALTER TABLE push_queue ADD COLUMN slots INTEGER NOT NULL DEFAULT 1')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS push_buckets (
+                    url TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    @classmethod
+    def from_config(cls, config) -> 'PushThrottle':
+        """Crée le limiteur depuis la configuration Flask"""
+        return cls(
+            db_path=config.get('PUSH_THROTTLE_DB', 'instance/push_throttle.sqlite3'),
+            max_concurrent=config.get('PUSH_MAX_CONCURRENT', 2),
+            values_per_second=config.get('PUSH_VALUES_PER_SECOND', 0),
+            queue_timeout=config.get('PUSH_QUEUE_TIMEOUT', 600)
+        )
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return url.rstrip('/').lower()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction exclusive en écriture (sérialise les workers)"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def heartbeat(self, ticket: str):
+        """Signale que l'envoi du ticket est toujours actif (évite sa purge)"""
+        with self._transaction() as conn:
+            conn.execute('UPDATE push_queue SET heartbeat = ? WHERE ticket = ?', (time.time(), ticket))
+
+    def _purge_stale(self, conn):
+        conn.execute('DELETE FROM push_queue WHERE heartbeat < ?', (time.time() - self.stale_after,))
+
+    def queue_position(self, url: str, ticket: str) -> Optional[int]:
+        """
+        Position d'un ticket dans la file
+
+        Returns:
+            0 si l'envoi est en cours, n >= 1 s'il attend derrière n-1 envois,
+            None si le ticket est inconnu
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, status FROM push_queue WHERE ticket = ? AND url = ?',
+                (ticket, self._key(url))
+            ).fetchone()
+            if row is None:
+                return None
+            ticket_id, status = row
+            if status == 'running':
+                return 0
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM push_queue WHERE url = ? AND status = 'waiting' AND id < ?",
+                (self._key(url), ticket_id)
+            ).fetchone()[0]
+            return ahead + 1
+
+    def acquire(self, url: str, ticket: str, slots: int = 1):
+        """
+        Entre dans la file et attend un créneau d'import libre (FIFO)
+
+        Args:
+            url: URL de l'instance DHIS2
+            ticket: Identifiant de l'envoi
+            slots: Créneaux occupés (imports simultanés de l'envoi, plafonné à max_concurrent)
+
+        Raises:
+            PushTicketInUse: si le ticket est déjà dans la file (sa ligne n'est pas écrasée)
+            PushQueueTimeout: si le créneau n'est pas obtenu dans queue_timeout
+        """
+        key = self._key(url)
+        slots = min(max(1, int(slots)), self.max_concurrent)
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO push_queue (url, ticket, status, heartbeat, slots) VALUES (?, ?, 'waiting', ?, ?)",
+                    (key, ticket, time.time(), slots)
+                )
+        except sqlite3.IntegrityError:
+            raise PushTicketInUse(f"Ticket d'envoi déjà utilisé: {ticket}") from None
+
+        deadline = time.time() + self.queue_timeout
+        while True:
+            with self._transaction() as conn:
+                self._purge_stale(conn)
+                now = time.time()
+                conn.execute('UPDATE push_queue SET heartbeat = ? WHERE ticket = ?', (now, ticket))
+                running = conn.execute(
+                    "SELECT COALESCE(SUM(slots), 0) FROM push_queue WHERE url = ? AND status = 'running'", (key,)
+                ).fetchone()[0]
+                first = conn.execute(
+                    "SELECT ticket FROM push_queue WHERE url = ? AND status = 'waiting' ORDER BY id LIMIT 1", (key,)
+                ).fetchone()
+                if running + slots <= self.max_concurrent and first and first[0] == ticket:
+                    conn.execute("UPDATE push_queue SET status = 'running' WHERE ticket = ?", (ticket,))
+                    logger.info(f"Créneau d'import obtenu pour {key} ({running + slots}/{self.max_concurrent})")
+                    return
+
+            if time.time() > deadline:
+                self.release(url, ticket)
+                raise PushQueueTimeout(f"File d'attente DHIS2 saturée pour {key}")
+            time.sleep(POLL_INTERVAL)
+
+    def release(self, url: str, ticket: str):
+        """Libère le créneau (ou retire le ticket de la file)"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM push_queue WHERE ticket = ?', (ticket,))
+
+    def consume(self, url: str, ticket: str, count: int):
+        """
+        Réserve `count` jetons dans le seau de l'instance et attend si nécessaire
+
+        Le seau peut passer en négatif: la dette est remboursée par l'attente,
+        ce qui laisse passer des lots plus gros que la capacité du seau.
+        """
+        if self.values_per_second <= 0:
+            self.heartbeat(ticket)
+            return
+
+        key = self._key(url)
+        capacity = self.values_per_second  # Rafale maximale: une seconde de débit
+        with self._transaction() as conn:
+            now = time.time()
+            conn.execute('UPDATE push_queue SET heartbeat = ? WHERE ticket = ?', (now, ticket))
+            row = conn.execute('SELECT tokens, updated FROM push_buckets WHERE url = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * self.values_per_second)
+            tokens -= count
+            conn.execute(
+                'INSERT OR REPLACE INTO push_buckets (url, tokens, updated) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+
+        wait = -tokens / self.values_per_second if tokens < 0 else 0
+        if wait > 0:
+            logger.debug(f"Limitation débit {key}: attente {wait:.2f}s pour {count} valeurs")
+            time.sleep(wait)
+
+    def _keep_alive(self, ticket: str, stop: threading.Event):
+        """Rafraîchit le heartbeat du ticket jusqu'à stop (lots plus longs que stale_after)"""
+        while not stop.wait(self.stale_after / 3):
+            try:
+                self.heartbeat(ticket)
+            except sqlite3.Error as e:
+                logger.warning(f"Heartbeat du ticket {ticket} impossible: {e}")
+
+    @contextmanager
+    def slot(self, url: str, ticket: str, slots: int = 1):
+        """
+        Context manager: acquire() puis release() en sortie; le heartbeat est
+        rafraîchi en tâche de fond tant que le créneau est tenu
+        """
+        self.acquire(url, ticket, slots)
+        stop = threading.Event()
+        keeper = threading.Thread(target=self._keep_alive, args=(ticket, stop), daemon=True)
+        keeper.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            keeper.join()
+            self.release(url, ticket)
@@ -0,0 +1,458 @@
+"""
+Cache des onglets Excel parsés
+==============================
+Chaque onglet d'un fichier uploadé n'est parsé depuis le XLSX qu'une seule
+fois: le DataFrame est ensuite sérialisé dans le dossier de session
+(.sheet_cache/) et relu depuis ce cache par tous les traitements suivants.
+
+Clé du cache: (hash du contenu du fichier, onglet, header, skiprows).
+Les copies d'un fichier dont le contenu a changé sont supprimées.
+
+Le format de stockage est le pickle pandas (blocs numpy sérialisés tels
+quels): contrairement à Parquet/Feather, il restitue à l'identique les
+colonnes de types mixtes, les en-têtes non textuels et les NaN des
+colonnes objet que produisent les classeurs Excel.
+
+Les objets calculés à partir d'un fichier (ex: index d'un template) sont
+mis en cache de la même façon par cached_derived, et gardés en mémoire par
+worker.
+
+La conversion peut être lancée en tâche de fond dès l'upload
+(preload_workbook). Les copies qu'elle va produire sont annoncées dès
+l'appel (un Event par copie): une lecture demandée avant ou pendant la
+conversion de son onglet attend celle-ci au lieu de re-parser. Chaque copie
+est en outre protégée par un verrou (thread et fichier, partagé entre les
+workers).
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from app.services.excel_stream import is_large_sheet
+from app.services.sheet_reader import is_csv, open_workbook, read_sheet, sheet_names, sheet_row_count
+
+try:
+    import fcntl
+except ImportError:  # Windows: verrou limité au processus courant
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRNAME = '.sheet_cache'
+
+# Taille des blocs lus pour le hash du contenu
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# {(chemin, taille, mtime_ns): hash} pour éviter de re-hasher un fichier inchangé
+_hash_memo = {}
+_lock = threading.Lock()
+
+# Verrous par copie en cache (chemin -> Lock) pour les threads du processus
+_entry_locks = {}
+
+# Objets dérivés gardés en mémoire par worker (chemin de la copie -> objet), les plus récents
+DERIVED_MEMORY_ENTRIES = 4
+_derived_memory = OrderedDict()
+
+# Conversions en tâche de fond lancées à l'upload
+PRELOAD_WORKERS = 2
+_preload_executor = ThreadPoolExecutor(max_workers=PRELOAD_WORKERS, thread_name_prefix='sheet-preload')
+
+# Copies annoncées par preload_workbook et pas encore produites (chemin -> Event)
+_pending_preloads: Dict[str, threading.Event] = {}
+
+# Attente maximale d'une conversion en tâche de fond par read_excel_cached (secondes)
+PRELOAD_WAIT_TIMEOUT = 600
+
+
+def file_hash(filepath: str) -> str:
+    """
+    Calcule le hash SHA-1 du contenu d'un fichier (mémorisé tant qu'il ne change pas)
+
+    Args:
+        filepath: Chemin du fichier
+
+    Returns:
+        Hash hexadécimal
+    """
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+
+    sha = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _lock:
+        _hash_memo[memo_key] = digest
+    _purge_stale_entries(filepath, digest)
+    return digest
+
+
+def _cache_dir(filepath: str) -> Path:
+    cache_dir = Path(filepath).parent / CACHE_DIRNAME
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def _entry_prefix(filepath: str) -> str:
+    return Path(filepath).name
+
+
+def _purge_stale_entries(filepath: str, digest: str):
+    """Supprime les copies en cache d'une version précédente du fichier"""
+    try:
+        cache_dir = Path(filepath).parent / CACHE_DIRNAME
+        if not cache_dir.exists():
+            return
+        prefix = _entry_prefix(filepath)
+        for entry in cache_dir.glob(f"{prefix}.*"):
+            if not entry.name.startswith(f"{prefix}.{digest[:16]}."):
+                entry.unlink(missing_ok=True)
+                logger.debug(f"Cache obsolète supprimé: {entry.name}")
+    except Exception as e:
+        logger.warning(f"Erreur nettoyage cache onglets: {e}")
+
+
+def _entry_path(filepath: str, digest: str, *key_parts, suffix: str = 'pkl') -> Path:
+    key_digest = hashlib.sha1(repr(key_parts).encode('utf-8')).hexdigest()[:16]
+    return _cache_dir(filepath) / f"{_entry_prefix(filepath)}.{digest[:16]}.{key_digest}.{suffix}"
+
+
+@contextmanager
+def _entry_lock(path: Path):
+    """Verrou exclusif sur une copie en cache (threads + workers via flock)"""
+    with _lock:
+        thread_lock = _entry_locks.setdefault(str(path), threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path.with_name(f"{path.name}.lock"), 'a+b') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _load_sheet(path: Path) -> Optional[pd.DataFrame]:
+    """Relit une copie en cache, onglet ou objet dérivé (None si absente ou illisible)"""
+    if not path.exists():
+        return None
+    try:
+        return pd.read_pickle(path)
+    except Exception as e:
+        logger.warning(f"Copie en cache illisible ({path.name}), relecture du fichier: {e}")
+        return None
+
+
+def _store_sheet(path: Path, df: pd.DataFrame, filepath: str, sheet_name: Union[str, int]):
+    try:
+        _atomic_write(path, lambda tmp_path: df.to_pickle(tmp_path))
+        logger.info(f"Onglet '{sheet_name}' de {Path(filepath).name} mis en cache ({len(df)} lignes)")
+    except Exception as e:
+        logger.warning(f"Impossible de mettre en cache l'onglet '{sheet_name}': {e}")
+
+
+def _atomic_write(path: Path, write):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def get_sheet_names(filepath: str) -> List[str]:
+    """
+    Retourne la liste des onglets d'un classeur (depuis le cache si possible)
+
+    Args:
+        filepath: Chemin du fichier Excel
+
+    Returns:
+        Liste des noms d'onglets
+    """
+    digest = file_hash(filepath)
+    path = _entry_path(filepath, digest, 'sheet_names', suffix='json')
+    if path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Cache onglets illisible ({path.name}): {e}")
+
+    sheets = sheet_names(filepath)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(sheets, f, ensure_ascii=False)
+
+    _atomic_write(path, write)
+    return sheets
+
+
+def _sheet_key(filepath: str, sheet_name: Union[str, int]) -> str:
+    """Nom de l'onglet pour la clé du cache (un index et le nom désignent la même copie)"""
+    if isinstance(sheet_name, int):
+        try:
+            return get_sheet_names(filepath)[sheet_name]
+        except Exception:
+            return f"#{sheet_name}"
+    return sheet_name
+
+
+def read_excel_cached(
+    filepath: str,
+    sheet_name: Union[str, int] = 0,
+    header: int = 0,
+    skiprows: Optional[int] = None,
+    nrows: Optional[int] = None,
+    engine: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Équivalent de pd.read_excel servi depuis le cache des onglets parsés
+
+    Le premier appel pour un (fichier, onglet, header, skiprows) parse le
+    XLSX et enregistre le résultat; les appels suivants relisent la copie.
+    Avec nrows, une copie complète déjà en cache est tronquée; sinon seules
+    les nrows premières lignes sont parsées (sans mise en cache).
+
+    Args:
+        filepath: Chemin du fichier Excel
+        sheet_name: Nom ou index de l'onglet
+        header: Ligne d'en-tête (index 0)
+        skiprows: Nombre de lignes à ignorer avant l'en-tête
+        nrows: Nombre maximum de lignes de données
+        engine: Moteur de lecture imposé (cf. sheet_reader, choix automatique par défaut)
+
+    Returns:
+        DataFrame (nouvel objet à chaque appel, modifiable par l'appelant)
+    """
+    digest = file_hash(filepath)
+    path = _entry_path(filepath, digest, 'sheet', _sheet_key(filepath, sheet_name), header, skiprows)
+
+    df = _load_sheet(path)
+    if df is not None:
+        logger.debug(f"Onglet '{sheet_name}' servi depuis le cache ({len(df)} lignes)")
+        return df.head(nrows).copy() if nrows is not None else df
+
+    if nrows is not None:
+        return read_sheet(filepath, sheet_name=sheet_name, header=header, skiprows=skiprows, nrows=nrows, engine=engine)
+
+    # Attendre une conversion en tâche de fond annoncée pour cet onglet (en file ou en cours)
+    with _lock:
+        pending = _pending_preloads.get(str(path))
+    if pending is not None:
+        logger.debug(f"Onglet '{sheet_name}': attente de la conversion en tâche de fond")
+        if not pending.wait(PRELOAD_WAIT_TIMEOUT):
+            logger.warning(f"Conversion en tâche de fond de '{sheet_name}' trop longue, lecture directe")
+
+    # Verrou de la copie: conversion en cours dans un autre worker
+    with _entry_lock(path):
+        df = _load_sheet(path)
+        if df is not None:
+            logger.debug(f"Onglet '{sheet_name}' servi depuis le cache après conversion ({len(df)} lignes)")
+            return df
+        df = read_sheet(filepath, sheet_name=sheet_name, header=header, skiprows=skiprows, engine=engine)
+        _store_sheet(path, df, filepath, sheet_name)
+    return df
+
+
+def cached_derived(filepath: str, key_parts: Tuple, build: Callable[[], Any]) -> Any:
+    """
+    Objet calculé à partir d'un fichier, construit une seule fois par contenu
+
+    L'objet est enregistré (pickle) dans le cache du dossier du fichier et
+    gardé en mémoire par worker; il est partagé entre les appels et ne doit
+    pas être modifié par l'appelant.
+
+    Args:
+        filepath: Chemin du fichier source
+        key_parts: Paramètres de la construction (nature de l'objet, onglet, ...)
+        build: Construction de l'objet (appelée si absent des caches)
+
+    Returns:
+        Objet construit ou relu depuis le cache
+    """
+    digest = file_hash(filepath)
+    path = _entry_path(filepath, digest, 'derived', *key_parts)
+    memory_key = str(path)
+
+    with _lock:
+        if memory_key in _derived_memory:
+            _derived_memory.move_to_end(memory_key)
+            return _derived_memory[memory_key]
+
+    with _entry_lock(path):
+        obj = _load_sheet(path)
+        if obj is None:
+            obj = build()
+            try:
+                _atomic_write(path, lambda tmp_path: pd.to_pickle(obj, tmp_path))
+                logger.info(f"{key_parts[0]} de {Path(filepath).name} mis en cache")
+            except Exception as e:
+                logger.warning(f"Impossible de mettre en cache {key_parts[0]}: {e}")
+
+    with _lock:
+        _derived_memory[memory_key] = obj
+        _derived_memory.move_to_end(memory_key)
+        while len(_derived_memory) > DERIVED_MEMORY_ENTRIES:
+            _derived_memory.popitem(last=False)
+    return obj
+
+
+def probe_workbook(filepath: str, header: int = 0, nrows: int = 100) -> List[Dict]:
+    """
+    Lit en une passe l'en-tête et les premières lignes de chaque onglet
+
+    Le classeur n'est ouvert qu'une seule fois (au lieu d'une ouverture par
+    onglet avec read_excel); les onglets déjà en cache sont servis depuis
+    leur copie.
+
+    Args:
+        filepath: Chemin du fichier Excel
+        header: Ligne d'en-tête (index 0)
+        nrows: Nombre de lignes de données à lire par onglet
+
+    Returns:
+        Liste de dicts {'name', 'df' (nrows premières lignes), 'total_rows' (dimension, None si inconnue)}
+    """
+    digest = file_hash(filepath)
+    sheets = get_sheet_names(filepath)
+    probes = []
+    excel_file = None
+    try:
+        for sheet in sheets:
+            df = _load_sheet(_entry_path(filepath, digest, 'sheet', sheet, header, None))
+            if df is not None:
+                probes.append({'name': sheet, 'df': df.head(nrows).copy(), 'total_rows': len(df)})
+                continue
+            if is_csv(filepath):
+                probes.append({'name': sheet, 'df': read_sheet(filepath, header=header, nrows=nrows), 'total_rows': None})
+                continue
+            if excel_file is None:
+                excel_file = open_workbook(filepath)
+            probes.append({
+                'name': sheet,
+                'df': excel_file.parse(sheet_name=sheet, header=header, nrows=nrows),
+                'total_rows': sheet_row_count(filepath, sheet, book=excel_file.book)
+            })
+    finally:
+        if excel_file is not None:
+            excel_file.close()
+    return probes
+
+
+def _preload_paths(filepath: str, digest: str, sheets: List[str], variants: List[Dict]) -> List[Tuple[str, Dict, Path]]:
+    """Copies à produire par une conversion en tâche de fond: (onglet, variante, chemin)"""
+    entries = []
+    for sheet in sheets:
+        for variant in variants:
+            if variant.get('sheets') is not None and sheet not in variant['sheets']:
+                continue
+            path = _entry_path(filepath, digest, 'sheet', sheet, variant.get('header', 0), variant.get('skiprows'))
+            entries.append((sheet, variant, path))
+    return entries
+
+
+def _release_pending(pending: Dict[str, threading.Event], path: Optional[Path] = None):
+    """Signale les copies annoncées comme produites (toutes si path est None)"""
+    keys = list(pending) if path is None else [str(path)]
+    with _lock:
+        for key in keys:
+            event = pending.pop(key, None)
+            if event is None:
+                continue
+            if _pending_preloads.get(key) is event:
+                del _pending_preloads[key]
+            event.set()
+
+
+def _preload(filepath: str, variants: List[Dict], pending: Dict[str, threading.Event]):
+    if is_csv(filepath):
+        # Les CSV sont lus par blocs par les traitements, rien à convertir
+        return
+    try:
+        digest = file_hash(filepath)
+        sheets = get_sheet_names(filepath)
+        with open_workbook(filepath) as excel_file:
+            large_sheets = set()
+            for sheet, variant, path in _preload_paths(filepath, digest, sheets, variants):
+                if sheet in large_sheets or is_large_sheet(filepath, sheet, book=excel_file.book):
+                    # Les gros exports sont lus en flux par les traitements (cf. excel_stream)
+                    if sheet not in large_sheets:
+                        logger.info(f"Onglet '{sheet}' volumineux: non converti en tâche de fond")
+                        large_sheets.add(sheet)
+                    _release_pending(pending, path)
+                    continue
+                with _entry_lock(path):
+                    if not path.exists():
+                        df = excel_file.parse(sheet_name=sheet, header=variant.get('header', 0),
+                                              skiprows=variant.get('skiprows'))
+                        _store_sheet(path, df, filepath, sheet)
+                _release_pending(pending, path)
+        logger.info(f"Conversion en tâche de fond terminée: {Path(filepath).name} ({len(sheets)} onglets)")
+    except Exception as e:
+        # Non bloquant: les lectures suivantes parseront le fichier elles-mêmes
+        logger.warning(f"Conversion en tâche de fond échouée pour {Path(filepath).name}: {e}")
+    finally:
+        _release_pending(pending)
+
+
+def preload_workbook(filepath: str, variants: Optional[Iterable[Dict]] = None) -> Future:
+    """
+    Lance en tâche de fond la mise en cache de tous les onglets d'un classeur
+
+    Les copies à produire sont annoncées avant le lancement: read_excel_cached
+    attend la conversion de l'onglet demandé, même encore en file d'attente,
+    au lieu de le parser une seconde fois. Le classeur n'est ouvert qu'une
+    fois et chaque onglet est converti sous le verrou de sa copie.
+
+    Args:
+        filepath: Chemin du fichier Excel
+        variants: Lectures à préparer, ex. [{'header': 0}, {'skiprows': 5, 'sheets': ['Données']}]
+            (clés: header, skiprows, sheets = onglets concernés, tous par défaut)
+
+    Returns:
+        Future de la conversion
+    """
+    variants = list(variants) if variants is not None else [{'header': 0}]
+
+    pending: Dict[str, threading.Event] = {}
+    try:
+        entries = [] if is_csv(filepath) else _preload_paths(
+            filepath, file_hash(filepath), get_sheet_names(filepath), variants
+        )
+    except Exception as e:
+        # Annonce impossible: la conversion signalera l'erreur
+        logger.warning(f"Onglets de {Path(filepath).name} non annoncés: {e}")
+        entries = []
+    with _lock:
+        for _, _, path in entries:
+            key = str(path)
+            if key not in _pending_preloads and not path.exists():
+                pending[key] = _pending_preloads[key] = threading.Event()
+
+    try:
+        return _preload_executor.submit(_preload, filepath, variants, pending)
+    except Exception:
+        _release_pending(pending)
+        raise
@@ -0,0 +1,301 @@
+"""
+Lecteurs de classeurs
+=====================
+Point d'entrée unique pour lire un onglet (DataFrame, noms d'onglets ou
+lignes en flux), avec un moteur choisi selon le type et la taille du fichier:
+
+- openpyxl: lecteur par défaut des XLSX (mode read-only), seul moteur
+  capable de parcourir les lignes en flux (iter_rows)
+- calamine: lecteur compilé (python-calamine), utilisé pour les gros
+  classeurs quand il est installé
+- xlrd: anciens fichiers .xls
+- csv: lecture directe des fichiers CSV/TSV par pd.read_csv, séparateur et
+  encodage détectés sur le début du fichier; iter_csv_chunks les lit par
+  blocs de lignes pour les traitements à mémoire bornée
+"""
+
+import os
+import csv
+import logging
+import importlib.util
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ENGINE_OPENPYXL = 'openpyxl'
+ENGINE_CALAMINE = 'calamine'
+ENGINE_XLRD = 'xlrd'
+ENGINE_CSV = 'csv'
+
+OPENPYXL_EXTENSIONS = ('.xlsx', '.xlsm')
+CSV_EXTENSIONS = ('.csv', '.tsv')
+
+# Taille à partir de laquelle le lecteur compilé est préféré (s'il est installé)
+COMPILED_READER_MIN_BYTES = 2 * 1024 * 1024
+
+# Détection CSV: taille de l'échantillon, séparateurs et encodages candidats
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_DELIMITERS = ',;\t|'
+CSV_ENCODINGS = ('utf-8', 'cp1252', 'latin-1')
+
+# Nombre de lignes par bloc pour la lecture par blocs des CSV
+CSV_CHUNK_ROWS = 100_000
+
+# {(chemin, taille, mtime_ns): (séparateur, encodage)}
+_csv_format_memo = {}
+
+
+def calamine_available() -> bool:
+    """Indique si le lecteur compilé python-calamine est installé"""
+    return importlib.util.find_spec('python_calamine') is not None
+
+
+def is_csv(filepath: str) -> bool:
+    return str(filepath).lower().endswith(CSV_EXTENSIONS)
+
+
+def is_streamable(filepath: str) -> bool:
+    """Indique si les lignes du fichier peuvent être lues en flux (iter_rows)"""
+    return str(filepath).lower().endswith(OPENPYXL_EXTENSIONS) or is_csv(filepath)
+
+
+def available_engines(filepath: str) -> List[str]:
+    """Moteurs capables de lire ce fichier dans l'environnement courant"""
+    if is_csv(filepath):
+        return [ENGINE_CSV]
+    engines = [ENGINE_XLRD] if str(filepath).lower().endswith('.xls') else [ENGINE_OPENPYXL]
+    if calamine_available():
+        engines.append(ENGINE_CALAMINE)
+    return engines
+
+
+def select_engine(filepath: str) -> str:
+    """
+    Choisit le moteur de lecture d'un fichier
+
+    CSV/TSV -> csv; classeurs de plus de COMPILED_READER_MIN_BYTES -> calamine
+    s'il est installé; sinon openpyxl (xlsx) ou xlrd (xls).
+    """
+    engines = available_engines(filepath)
+    if ENGINE_CALAMINE in engines:
+        try:
+            if os.path.getsize(filepath) >= COMPILED_READER_MIN_BYTES:
+                return ENGINE_CALAMINE
+        except OSError:
+            pass
+    return engines[0]
+
+
+def sniff_csv(filepath: str) -> Tuple[str, str]:
+    """
+    Détecte le séparateur et l'encodage d'un fichier CSV/TSV (mémorisé tant qu'il ne change pas)
+
+    Args:
+        filepath: Chemin du fichier
+
+    Returns:
+        Tuple (séparateur, encodage)
+    """
+    stat = os.stat(filepath)
+    memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _csv_format_memo:
+        return _csv_format_memo[memo_key]
+
+    with open(filepath, 'rb') as f:
+        sample = f.read(CSV_SNIFF_BYTES)
+
+    if sample.startswith(b'\xef\xbb\xbf'):
+        encoding = 'utf-8-sig'
+        text = sample[3:].decode('utf-8', errors='ignore')
+    else:
+        encoding, text = CSV_ENCODINGS[-1], None
+        for candidate in CSV_ENCODINGS:
+            try:
+                text = sample.decode(candidate)
+                encoding = candidate
+                break
+            except UnicodeDecodeError as e:
+                # Caractère multi-octets coupé en fin d'échantillon
+                if candidate == 'utf-8' and e.start >= len(sample) - 3:
+                    text = sample[:e.start].decode(candidate)
+                    encoding = candidate
+                    break
+        if text is None:
+            text = sample.decode(encoding, errors='ignore')
+
+    default_sep = '\t' if str(filepath).lower().endswith('.tsv') else ','
+    lines = text.splitlines()[:50]
+    try:
+        sep = csv.Sniffer().sniff('\n'.join(lines), delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        sep = default_sep
+
+    logger.info(f"Format CSV détecté pour {Path(filepath).name}: séparateur={sep!r}, encodage={encoding}")
+    _csv_format_memo[memo_key] = (sep, encoding)
+    return sep, encoding
+
+
+def sheet_names(filepath: str, engine: Optional[str] = None) -> List[str]:
+    """
+    Liste des onglets d'un classeur (un onglet unique, nommé comme le fichier, pour un CSV)
+
+    Args:
+        filepath: Chemin du fichier
+        engine: Moteur imposé (choix automatique par défaut)
+    """
+    engine = engine or select_engine(filepath)
+    if engine == ENGINE_CSV:
+        return [Path(filepath).stem]
+    with pd.ExcelFile(filepath, engine=engine) as excel_file:
+        return list(excel_file.sheet_names)
+
+
+def open_workbook(filepath: str, engine: Optional[str] = None) -> pd.ExcelFile:
+    """Ouvre un classeur une seule fois pour en lire plusieurs onglets (ExcelFile.parse)"""
+    return pd.ExcelFile(filepath, engine=engine or select_engine(filepath))
+
+
+def read_sheet(
+    filepath: str,
+    sheet_name: Union[str, int] = 0,
+    header: int = 0,
+    skiprows: Optional[int] = None,
+    nrows: Optional[int] = None,
+    engine: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Lit un onglet en DataFrame (équivalent de pd.read_excel)
+
+    Args:
+        filepath: Chemin du fichier
+        sheet_name: Nom ou index de l'onglet (ignoré pour un CSV)
+        header: Ligne d'en-tête (index 0)
+        skiprows: Nombre de lignes à ignorer avant l'en-tête
+        nrows: Nombre maximum de lignes de données
+        engine: Moteur imposé (choix automatique par défaut)
+
+    Returns:
+        DataFrame
+    """
+    engine = engine or select_engine(filepath)
+    if engine == ENGINE_CSV:
+        sep, encoding = sniff_csv(filepath)
+        return pd.read_csv(
+            filepath, sep=sep, encoding=encoding, header=header,
+            skiprows=skiprows, nrows=nrows
+        )
+    return pd.read_excel(
+        filepath, sheet_name=sheet_name, header=header,
+        skiprows=skiprows, nrows=nrows, engine=engine
+    )
+
+
+def _worksheet(book, sheet_name: Optional[Union[str, int]]):
+    if sheet_name is None or isinstance(sheet_name, int):
+        return book.worksheets[sheet_name or 0]
+    return book[sheet_name]
+
+
+def sheet_row_count(filepath: str, sheet_name: Optional[Union[str, int]] = None, book=None) -> Optional[int]:
+    """
+    Nombre de lignes déclaré par un onglet (dimension du XML, sans lecture des cellules)
+
+    Args:
+        filepath: Chemin du fichier Excel
+        sheet_name: Nom ou index de l'onglet (premier par défaut)
+        book: Classeur déjà ouvert, ExcelFile.book (optionnel)
+
+    Returns:
+        Nombre de lignes, ou None si inconnu (format non supporté, dimension absente)
+    """
+    try:
+        if book is not None:
+            if hasattr(book, 'worksheets'):  # openpyxl
+                return _worksheet(book, sheet_name).max_row
+            if hasattr(book, 'get_sheet_by_name'):  # python-calamine
+                if sheet_name is None or isinstance(sheet_name, int):
+                    return book.get_sheet_by_index(sheet_name or 0).total_height
+                return book.get_sheet_by_name(sheet_name).total_height
+            return None
+        if not str(filepath).lower().endswith(OPENPYXL_EXTENSIONS):
+            return None
+        from openpyxl import load_workbook
+        wb = load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            return _worksheet(wb, sheet_name).max_row
+        finally:
+            wb.close()
+    except Exception as e:
+        logger.debug(f"Dimension de l'onglet '{sheet_name}' inconnue: {e}")
+        return None
+
+
+def iter_rows(filepath: str, sheet_name: Optional[Union[str, int]] = None) -> Iterator[Tuple]:
+    """
+    Itère sur les lignes brutes d'un onglet (en-tête compris) sans charger la feuille
+
+    XLSX: openpyxl en mode read-only, les nombres entiers étant rendus en int
+    comme le fait pd.read_excel. CSV/TSV: valeurs texte, cellules vides à None.
+
+    Args:
+        filepath: Chemin du fichier XLSX ou CSV
+        sheet_name: Nom ou index de l'onglet (premier par défaut, ignoré pour un CSV)
+
+    Yields:
+        Tuple des valeurs de la ligne (None pour une cellule vide)
+    """
+    if is_csv(filepath):
+        sep, encoding = sniff_csv(filepath)
+        with open(filepath, 'r', encoding=encoding, newline='') as f:
+            for row in csv.reader(f, delimiter=sep):
+                yield tuple(v if v != '' else None for v in row)
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        ws = _worksheet(wb, sheet_name)
+        ws.reset_dimensions()
+        for row in ws.iter_rows(values_only=True):
+            yield tuple(
+                int(v) if isinstance(v, float) and v.is_integer() else v
+                for v in row
+            )
+    finally:
+        wb.close()
+
+
+def iter_csv_chunks(
+    filepath: str,
+    chunksize: int = CSV_CHUNK_ROWS,
+    skiprows: Optional[int] = None,
+    usecols: Optional[Sequence] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Lit un CSV/TSV par blocs de lignes (mémoire bornée quelle que soit la taille)
+
+    Toutes les cellules sont lues comme texte (NA pour les cellules vides):
+    le type d'une colonne ne dépend ainsi pas du bloc, et les codes tels que
+    "001" sont conservés.
+
+    Args:
+        filepath: Chemin du fichier
+        chunksize: Nombre de lignes par bloc
+        skiprows: Nombre de lignes à ignorer avant l'en-tête
+        usecols: Colonnes à lire (toutes par défaut)
+
+    Yields:
+        DataFrame de chaque bloc (index continu d'un bloc à l'autre)
+    """
+    sep, encoding = sniff_csv(filepath)
+    with pd.read_csv(
+        filepath, sep=sep, encoding=encoding, skiprows=skiprows,
+        usecols=list(dict.fromkeys(usecols)) if usecols is not None else None,
+        dtype=str, chunksize=chunksize
+    ) as reader:
+        for chunk in reader:
+            yield chunk
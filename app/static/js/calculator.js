@@ -120,7 +120,9 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     }
     const btnSend = document.getElementById('btn-send-dhis2');
-    if (btnSend) btnSend.addEventListener('click', sendToDhis2);
+    if (btnSend) btnSend.addEventListener('click', () => sendToDhis2());
+    const btnPreflight = document.getElementById('btn-preflight-dhis2');
+    if (btnPreflight) btnPreflight.addEventListener('click', preflightDhis2);
 
     // AI Analysis
     document.getElementById('btn-analyze-ai').addEventListener('click', analyzeWithAI);
@@ -196,23 +198,44 @@ function toggleOrgMode() {
     }
 }
 
+const ORG_UNITS_LOAD_MORE = '__more__';
+
 function updateOrgUnitList() {
+    const select = document.getElementById('map-org-fixed');
+    select.innerHTML = '<option value="">Chargement...</option>';
+    loadOrgUnitPage(0);
+}
+
+// Charge une page d'organisations filtrées (triées par nom) dans la liste
+function loadOrgUnitPage(offset) {
     const groupId = document.getElementById('filter-org-group').value;
     const level = document.getElementById('filter-org-level').value;
     const select = document.getElementById('map-org-fixed');
     const hint = document.getElementById('org-count-hint');
 
-    select.innerHTML = '<option value="">Chargement...</option>';
+    if (!select.dataset.pagination) {
+        select.dataset.pagination = 'true';
+        select.addEventListener('change', () => {
+            if (select.value === ORG_UNITS_LOAD_MORE) {
+                loadOrgUnitPage(Number(select.selectedOptions[0].dataset.offset));
+            }
+        });
+    }
     select.disabled = true;
 
     fetch('/calculator/api/get-filtered-org-units', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ group_id: groupId, level: level })
+        body: JSON.stringify({ group_id: groupId, level: level, offset: offset })
     })
         .then(r => r.json())
         .then(data => {
-            select.innerHTML = '<option value="">-- Sélectionnez une organisation --</option>';
+            if (offset === 0) {
+                select.innerHTML = '<option value="">-- Sélectionnez une organisation --</option>';
+            } else {
+                select.querySelector(`option[value="${ORG_UNITS_LOAD_MORE}"]`)?.remove();
+                select.value = '';
+            }
             if (data.success) {
                 data.org_units.forEach(ou => {
                     const opt = document.createElement('option');
@@ -220,9 +243,15 @@ function updateOrgUnitList() {
                     opt.textContent = ou.name;
                     select.appendChild(opt);
                 });
-                hint.textContent = `${data.count} organisation(s) trouvée(s)`;
-                if (data.count >= 1000) {
-                    hint.textContent += ' (Limité à 1000)';
+                const loaded = offset + data.count;
+                hint.textContent = `${data.total} organisation(s) trouvée(s)`;
+                if (data.has_more) {
+                    hint.textContent += ` (${loaded} affichées)`;
+                    const more = document.createElement('option');
+                    more.value = ORG_UNITS_LOAD_MORE;
+                    more.dataset.offset = loaded;
+                    more.textContent = `… Afficher les suivantes (${data.total - loaded} restantes)`;
+                    select.appendChild(more);
                 }
             }
         })
@@ -241,7 +270,7 @@ function initializeDropzone() {
         url: window.CalculatorConfig.uploadUrl,
         maxFiles: 1,
         maxFilesize: 50,
-        acceptedFiles: '.xlsx,.xls',
+        acceptedFiles: '.xlsx,.xls,.csv,.tsv',
         addRemoveLinks: true,
         dictDefaultMessage: '',
 
@@ -271,7 +300,7 @@ function initializeDropzone() {
         url: window.CalculatorConfig.uploadUrl,
         maxFiles: 1,
         maxFilesize: 50,
-        acceptedFiles: '.xlsx,.xls',
+        acceptedFiles: '.xlsx,.xls,.csv,.tsv',
         addRemoveLinks: true,
         dictDefaultMessage: '',
 
@@ -929,7 +958,7 @@ function previewJson() {
                 summary.className = 'flex justify-between items-center mt-3 text-sm text-gray-500 px-1';
                 summary.innerHTML = `
                         <span><i class="fas fa-table mr-2"></i>Tableau de données</span>
-                        <span class="font-bold">Total: ${data.dataValues.length} enregistrements</span>
+                        <span class="font-bold">${data.dataValues.length} affichés sur ${data.total ?? data.dataValues.length} enregistrements</span>
                     `;
                 content.appendChild(summary);
 
@@ -959,14 +988,39 @@ function downloadJson() {
     window.location.href = '/calculator/api/download-json';
 }
 
-function sendToDhis2() {
-    NotificationManager.warning('Envoi vers DHIS2 en cours...', 'Confirmation');
+// Suivi de la position dans la file d'attente DHIS2 pendant un envoi
+function watchPushQueue(ticket, baseMessage) {
+    const timer = setInterval(() => {
+        fetch(`/calculator/api/push-queue-status?ticket=${encodeURIComponent(ticket)}`)
+            .then(r => r.json())
+            .then(data => {
+                if (!data.success || data.position === null) return;
+                LoadingOverlay.show(data.position > 0
+                    ? `En attente: position ${data.position} dans la file DHIS2...`
+                    : baseMessage);
+            })
+            .catch(() => { });
+    }, 2000);
+    return () => clearInterval(timer);
+}
+
+function newPushTicket() {
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
+function sendToDhis2(resume = false) {
+    const message = resume ? 'Reprise de l\'envoi vers DHIS2...' : 'Envoi vers DHIS2 en cours...';
+    NotificationManager.warning(message, 'Confirmation');
 
     setTimeout(() => {
-        LoadingOverlay.show('Envoi vers DHIS2 en cours...');
+        LoadingOverlay.show(message);
+        const ticket = newPushTicket();
+        const stopWatching = watchPushQueue(ticket, message);
 
         fetch('/calculator/api/send-to-dhis2', {
-            method: 'POST'
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ resume: resume === true, ticket: ticket })
         })
             .then(r => r.json())
             .then(data => {
@@ -982,13 +1036,73 @@ function sendToDhis2() {
                     }
                 } else {
                     NotificationManager.error(data.error || 'Erreur lors de l\'envoi');
+                    // Envoi interrompu: proposer de reprendre avec les lots restants
+                    if (data.resumable && data.details) {
+                        const done = data.details.batches_done;
+                        const total = data.details.batches_total;
+                        if (confirm(`Envoi interrompu (${done}/${total} lots accusés par DHIS2). Reprendre avec les lots restants ?`)) {
+                            sendToDhis2(true);
+                        }
+                    }
                 }
             })
             .catch(e => NotificationManager.error('Erreur réseau'))
-            .finally(() => LoadingOverlay.hide());
+            .finally(() => {
+                stopWatching();
+                LoadingOverlay.hide();
+            });
     }, 100);
 }
 
+const CONFLICT_TYPE_LABELS = {
+    org_unit: 'Organisation inconnue',
+    data_element_not_in_dataset: 'DE hors dataset',
+    data_element: 'Data element inconnu',
+    category_option_combo: 'COC invalide',
+    period_locked: 'Période verrouillée',
+    period: 'Période invalide',
+    value: 'Valeur invalide',
+    other: 'Autre'
+};
+
+function preflightDhis2() {
+    const message = 'Vérification (dry run) auprès de DHIS2...';
+    LoadingOverlay.show(message);
+    const ticket = newPushTicket();
+    const stopWatching = watchPushQueue(ticket, message);
+
+    fetch('/calculator/api/preflight-dhis2', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ticket: ticket })
+    })
+        .then(r => r.json())
+        .then(data => {
+            if (!data.success) {
+                NotificationManager.error(data.error || 'Erreur lors de la vérification');
+                return;
+            }
+            const report = data.report;
+            if (report.ok) {
+                NotificationManager.success(`Aucun conflit détecté sur ${report.batches_total} lots`, 'Vérification DHIS2');
+                return;
+            }
+            const lines = Object.entries(report.conflicts_by_type).map(([type, group]) => {
+                const sample = group.samples.length ? ` (ex: ${group.samples[0].object || ''} ${group.samples[0].value || ''})` : '';
+                return `${CONFLICT_TYPE_LABELS[type] || type}: ${group.count}${sample}`;
+            });
+            if (report.failed_batches.length) {
+                lines.push(`Lots non vérifiés: ${report.failed_batches.length}/${report.batches_total}`);
+            }
+            NotificationManager.warning(lines.join(' | '), `${report.conflicts_total} conflit(s) détecté(s)`);
+        })
+        .catch(e => NotificationManager.error('Erreur réseau'))
+        .finally(() => {
+            stopWatching();
+            LoadingOverlay.hide();
+        });
+}
+
 // Load Excel sheets
 async function loadExcelSheets() {
     try {
@@ -0,0 +1,74 @@
+"""
+Benchmark de la normalisation des colonnes de catégories (Normalizer,
+app/services/auto_processor.py): normalisation cellule par cellule comparée
+à Normalizer.normaliser_serie (une normalisation par valeur distincte,
+mémorisée par colonne et mappings)
+
+Les deux approches doivent produire les mêmes valeurs; le script s'arrête
+sinon. Le second passage de normaliser_serie mesure le cache.
+
+Usage:
+    python benchmark_normalizer.py                  # 1M lignes
+    python benchmark_normalizer.py --rows 100000 1000000
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from app.services.auto_processor import Normalizer
+
+
+SEXES = ['F', 'M', 'Garçon', ' Fille ', np.nan]
+AGES = ['[ 15 - 17 [', '[ 18 - 20 [', '[ 20 - 22 [', '40 ans et plus', '- 18 ans', 'ND', 'Non défini', np.nan]
+VALUE_MAPPINGS = {'SEXE': {'Garçon': 'M', 'Fille': 'F'}}
+
+
+def category_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Colonnes de catégories d'un TCD: peu de valeurs distinctes, quelques vides"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'SEXE': rng.choice(np.array(SEXES, dtype=object), rows),
+        'GROUP_AGE': rng.choice(np.array(AGES, dtype=object), rows),
+    })
+
+
+def rowwise_normalize(values: pd.Series, column_name: str) -> list:
+    """Implémentation de référence (normalize_value sur chaque cellule)"""
+    return [Normalizer.normalize_value(v, column_name, VALUE_MAPPINGS) for v in values.tolist()]
+
+
+def _timed(func) -> tuple:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def benchmark_column(df: pd.DataFrame, column_name: str) -> tuple:
+    Normalizer._cache.clear()
+    rowwise, reference = _timed(lambda: rowwise_normalize(df[column_name], column_name))
+    first, result = _timed(lambda: Normalizer.normaliser_serie(df[column_name], column_name, VALUE_MAPPINGS))
+    cached, _ = _timed(lambda: Normalizer.normaliser_serie(df[column_name], column_name, VALUE_MAPPINGS))
+
+    if result.tolist() != reference:
+        raise SystemExit(f"❌ Résultats différents pour la colonne {column_name}")
+    return rowwise, first, cached
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de la normalisation des catégories')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000])
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("   BENCHMARK NORMALIZER (colonnes de catégories)")
+    print("=" * 78)
+    print(f"{'Lignes':>10} {'Colonne':>10} {'Cellule (s)':>12} {'Distinctes (s)':>15} {'Cache (s)':>10} {'Gain':>8}")
+    print("-" * 78)
+    for rows in args.rows:
+        df = category_frame(rows)
+        for column_name in df.columns:
+            rowwise, first, cached = benchmark_column(df, column_name)
+            print(f"{rows:>10} {column_name:>10} {rowwise:>12.2f} {first:>15.3f} {cached:>10.3f} {rowwise / first:>7.0f}x")
@@ -0,0 +1,121 @@
+"""
+Benchmark des moteurs de lecture de classeurs (app/services/sheet_reader.py)
+sur des fichiers au format du template DHIS2 généré par l'application
+
+Usage:
+    python benchmark_readers.py                    # 10k, 100k et 1M lignes
+    python benchmark_readers.py --rows 10000 50000 --output-dir /tmp/bench
+"""
+
+import os
+import csv
+import time
+import argparse
+import tempfile
+
+from openpyxl import Workbook
+
+from app.services import sheet_reader
+
+# Colonnes du template (cf. ExcelService.create_template_excel)
+TEMPLATE_COLUMNS = [
+    'section',
+    'dataElementName', 'dataElement',
+    'orgUnitName', 'orgUnitCode', 'orgUnit',
+    'categoryOptionComboName', 'categoryOptionCombo',
+    'attributeOptionComboName', 'attributeOptionCombo',
+    'period', 'value'
+]
+HEADER_ROWS = 5  # Lignes de métadonnées au-dessus de l'en-tête
+
+
+def _template_row(i: int) -> list:
+    return [
+        f"Section {i % 7}",
+        f"Effectif inscrits {i % 40}", f"DE{i % 40:09d}",
+        f"Etablissement {i % 2500}", f"ETB{i % 2500:05d}", f"OU{i % 2500:09d}",
+        ('Masculin', 'Féminin')[i % 2], ('COCM0000001', 'COCF0000001')[i % 2],
+        'default', 'HllvX50cXC0',
+        '2024', i % 500 if i % 9 else None
+    ]
+
+
+def create_template_files(rows: int, output_dir: str) -> dict:
+    """Crée un template XLSX et son équivalent CSV avec `rows` lignes de données"""
+    xlsx_path = os.path.join(output_dir, f"template_{rows}.xlsx")
+    csv_path = os.path.join(output_dir, f"template_{rows}.csv")
+
+    if not os.path.exists(xlsx_path):
+        print(f"📝 Génération {xlsx_path}...")
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Données')
+        ws.append(['Template DHIS2 - Benchmark'])
+        ws.append(['Période: 2024'])
+        ws.append([f"Organisations: 2500 | Lignes: {rows}"])
+        ws.append([])
+        ws.append([])
+        ws.append(TEMPLATE_COLUMNS)
+        for i in range(rows):
+            ws.append(_template_row(i))
+        wb.save(xlsx_path)
+
+    if not os.path.exists(csv_path):
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(TEMPLATE_COLUMNS)
+            for i in range(rows):
+                writer.writerow(['' if v is None else v for v in _template_row(i)])
+
+    return {'xlsx': xlsx_path, 'csv': csv_path}
+
+
+def _timed(func) -> tuple:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def benchmark(rows: int, output_dir: str) -> list:
+    files = create_template_files(rows, output_dir)
+    results = []
+
+    for engine in sheet_reader.available_engines(files['xlsx']):
+        elapsed, df = _timed(lambda: sheet_reader.read_sheet(
+            files['xlsx'], sheet_name='Données', skiprows=HEADER_ROWS, engine=engine
+        ))
+        results.append((rows, f"{engine} (DataFrame)", elapsed, len(df)))
+
+    elapsed, count = _timed(lambda: sum(1 for _ in sheet_reader.iter_rows(files['xlsx'], 'Données')))
+    results.append((rows, 'openpyxl read-only (flux)', elapsed, count - HEADER_ROWS - 1))
+
+    elapsed, df = _timed(lambda: sheet_reader.read_sheet(files['csv']))
+    results.append((rows, 'csv (DataFrame)', elapsed, len(df)))
+
+    auto = sheet_reader.select_engine(files['xlsx'])
+    print(f"   Moteur choisi automatiquement pour {rows} lignes: {auto}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark des moteurs de lecture Excel/CSV')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--output-dir', default=os.path.join(tempfile.gettempdir(), 'dhis2_reader_bench'))
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print("=" * 72)
+    print("   BENCHMARK DES MOTEURS DE LECTURE")
+    print("=" * 72)
+    if not sheet_reader.calamine_available():
+        print("ℹ️  python-calamine non installé: moteur compilé non mesuré")
+
+    all_results = []
+    for rows in args.rows:
+        all_results.extend(benchmark(rows, args.output_dir))
+
+    print()
+    print(f"{'Lignes':>10}  {'Moteur':<28} {'Temps (s)':>10} {'Lignes lues':>12}")
+    print("-" * 72)
+    for rows, engine, elapsed, count in all_results:
+        print(f"{rows:>10}  {engine:<28} {elapsed:>10.2f} {count:>12}")
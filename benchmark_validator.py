@@ -0,0 +1,97 @@
+"""
+Benchmark de la validation complète des payloads (PayloadValidator,
+app/services/payload_validator.py) sur des métadonnées synthétiques:
+1 dataset mensuel, 200 éléments de données (combo Sexe x Âge), 5000 unités
+d'organisation dont 4000 assignées.
+
+Usage:
+    python benchmark_validator.py                  # 1M valeurs
+    python benchmark_validator.py --values 100000 1000000
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from app.services.data_values import DataValues
+from app.services.metadata_manager import MetadataManager
+from app.services.payload_validator import PayloadValidator
+
+
+SEXES = ['M', 'F']
+AGES = ['0-4', '5-14', '15-49', '50+']
+VALUE_TYPES = ['INTEGER_ZERO_OR_POSITIVE', 'NUMBER', 'PERCENTAGE', 'TEXT']
+
+
+def synthetic_metadata(data_elements: int = 200, org_units: int = 5000) -> MetadataManager:
+    """Métadonnées d'un dataset mensuel, combo Sexe x Âge"""
+    options = [{'id': f'o_{name}', 'name': name} for name in SEXES + AGES + ['default']]
+    cocs = [{'id': 'COC_default', 'name': 'default', 'categoryOptions': [{'id': 'o_default'}]}]
+    cocs += [
+        {'id': f'COC_{sex}_{age}', 'name': f'{sex}, {age}', 'categoryOptions': [{'id': f'o_{sex}'}, {'id': f'o_{age}'}]}
+        for sex in SEXES for age in AGES
+    ]
+    metadata = MetadataManager()
+    metadata.load_from_dict({
+        'organisationUnits': [{'id': f'OU{i}', 'name': f'Org {i}'} for i in range(org_units)],
+        'dataSets': [{
+            'id': 'DS', 'name': 'Dataset', 'periodType': 'Monthly',
+            'dataSetElements': [{'dataElement': {'id': f'DE{i}'}} for i in range(data_elements)],
+            'organisationUnits': [{'id': f'OU{i}'} for i in range(org_units * 4 // 5)],
+        }],
+        'dataElements': [
+            {'id': f'DE{i}', 'name': f'DE {i}', 'valueType': VALUE_TYPES[i % len(VALUE_TYPES)], 'categoryCombo': {'id': 'CC'}}
+            for i in range(data_elements)
+        ],
+        'categoryOptions': options,
+        'categories': [
+            {'id': 'SEXE', 'name': 'Sexe', 'categoryOptions': [{'id': f'o_{s}'} for s in SEXES]},
+            {'id': 'AGE', 'name': 'Âge', 'categoryOptions': [{'id': f'o_{a}'} for a in AGES]},
+        ],
+        'categoryCombos': [
+            {'id': 'CC', 'name': 'Sexe x Âge', 'categories': [{'id': 'SEXE'}, {'id': 'AGE'}]},
+            {'id': 'CC_default', 'name': 'default', 'categories': []},
+        ],
+        'categoryOptionCombos': cocs,
+    })
+    return metadata
+
+
+def synthetic_values(count: int, seed: int = 0) -> DataValues:
+    """dataValues aléatoires, dont environ 1% d'unités non assignées et de valeurs invalides"""
+    rng = np.random.default_rng(seed)
+    cocs = [f'COC_{sex}_{age}' for sex in SEXES for age in AGES]
+    values = rng.integers(0, 500, count).astype(str).astype(object)
+    values[rng.random(count) < 0.01] = 'N/A'
+    data_values = DataValues()
+    data_values.extend(
+        values.tolist(),
+        dataElement=[f'DE{i}' for i in rng.integers(0, 200, count)],
+        period='202401',
+        orgUnit=[f'OU{i}' for i in rng.integers(0, 5000, count)],
+        categoryOptionCombo=[cocs[i] for i in rng.integers(0, len(cocs), count)],
+        attributeOptionCombo='',
+    )
+    return data_values
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de la validation complète des payloads')
+    parser.add_argument('--values', type=int, nargs='+', default=[1_000_000])
+    args = parser.parse_args()
+
+    metadata = synthetic_metadata()
+
+    print("=" * 70)
+    print("   BENCHMARK PAYLOAD VALIDATOR")
+    print("=" * 70)
+    print(f"{'Valeurs':>10} {'Durée (s)':>10} {'En erreur':>10}  Types d'erreurs")
+    print("-" * 70)
+    for count in args.values:
+        data_values = synthetic_values(count)
+        start = time.perf_counter()
+        report = PayloadValidator.for_payload(metadata, data_values, 'DS').validate(data_values)
+        elapsed = time.perf_counter() - start
+        types = ', '.join(f"{e['type']}={e['count']}" for e in report['errors'])
+        print(f"{count:>10} {elapsed:>10.3f} {report['invalid_values']:>10}  {types}")
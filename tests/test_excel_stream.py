@@ -0,0 +1,55 @@
+"""
+Comptage en flux (excel_stream.count_combinations) comparé au chemin en
+mémoire (pd.read_excel -> ffill -> fillna/astype(str) -> groupby)
+"""
+
+import openpyxl
+import pytest
+
+from app.services.excel_stream import EMPTY_LABEL, count_combinations
+from app.services.sheet_reader import read_sheet
+
+
+def _write_sheet(path, columns):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(list(columns))
+    for row in zip(*columns.values()):
+        sheet.append(list(row))
+    workbook.save(path)
+
+
+def _in_memory_counts(path, group_columns, fill_columns=()):
+    df = read_sheet(str(path), sheet_name=0)[list(group_columns)]
+    if fill_columns:
+        df[list(fill_columns)] = df[list(fill_columns)].ffill()
+    df = df.fillna(EMPTY_LABEL).astype(str).apply(lambda column: column.str.strip())
+    counts = df.groupby(list(group_columns)).size()
+    return sorted((key if isinstance(key, tuple) else (key,), count) for key, count in counts.items())
+
+
+def _streamed_counts(path, group_columns, fill_columns=()):
+    aggregated, _ = count_combinations(str(path), 0, list(group_columns), list(fill_columns))
+    return sorted((tuple(row[:-1]), row[-1]) for row in aggregated.values.tolist())
+
+
+@pytest.mark.parametrize('fill_columns', [(), ('Etablissement',)])
+def test_mixed_column_with_bool_matches_in_memory_path(tmp_path, fill_columns):
+    # Colonnes objet: True, 1 et 1.0 sont égaux, pandas garde la première occurrence
+    path = tmp_path / 'mixte.xlsx'
+    _write_sheet(path, {
+        'Etablissement': ['CSI A', None, 'CSI B', None, 'CSI C', 'CSI A'],
+        'Sexe': ['M', True, 1, 'F', False, 0],
+        'Age': [True, '15-49', 1, 1.5, None, 1],
+    })
+
+    group_columns = ('Etablissement', 'Sexe', 'Age')
+    assert _streamed_counts(path, group_columns, fill_columns) == _in_memory_counts(path, group_columns, fill_columns)
+
+
+def test_numeric_column_with_bool_matches_in_memory_path(tmp_path):
+    # Colonne numérique: les booléens deviennent 1/0
+    path = tmp_path / 'numerique.xlsx'
+    _write_sheet(path, {'Valeur': [1, True, 2, False, 3]})
+
+    assert _streamed_counts(path, ('Valeur',)) == _in_memory_counts(path, ('Valeur',))